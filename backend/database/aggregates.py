@@ -0,0 +1,191 @@
+"""
+Materialized Statistics
+Row counts and rating sums kept up to date as rows are written, so the
+statistics endpoint reads a handful of small rows instead of running
+COUNT(*)/AVG over the raw tables.
+
+  - stat_counters:      total_prompts, total_outputs, total_feedback,
+                        total_users, learning_patterns, rating_sum, rating_count
+  - rating_aggregates:  output_count / rating_sum / rating_count per
+                        model, per language and per day
+
+An after_flush hook applies the deltas of every ORM flush inside the same
+transaction. Writes that bypass the ORM (bulk SQL, manual edits) and
+rating changes on existing feedback are not tracked; rebuild_statistics()
+recomputes everything from the raw tables.
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from backend.models.database_models import (
+    Prompt, ModelOutput, Feedback, UserProfile, LearningPattern,
+    StatCounter, RatingAggregate
+)
+
+# Counter name for each counted table
+COUNTED_MODELS = {
+    Prompt: "total_prompts",
+    ModelOutput: "total_outputs",
+    Feedback: "total_feedback",
+    UserProfile: "total_users",
+    LearningPattern: "learning_patterns",
+}
+
+RATING_COLUMNS = ("output_count", "rating_sum", "rating_count")
+
+
+def _day(value: Optional[datetime]) -> str:
+    return (value or datetime.utcnow()).strftime("%Y-%m-%d")
+
+
+def _upsert(conn, table, keys: Dict, deltas: Dict):
+    """Add deltas to the row identified by keys, creating it if needed"""
+    dialect = conn.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table).values(**keys, **deltas).on_conflict_do_update(
+            index_elements=list(keys),
+            set_={name: table.c[name] + delta for name, delta in deltas.items()}
+        )
+        conn.execute(statement)
+        return
+
+    condition = [table.c[name] == value for name, value in keys.items()]
+    result = conn.execute(
+        update(table).where(*condition).values(
+            **{name: table.c[name] + delta for name, delta in deltas.items()}
+        )
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(table).values(**keys, **deltas))
+
+
+def _collect_deltas(session: Session):
+    """(counter deltas, rating aggregate deltas) for the rows being flushed"""
+    counters = Counter()
+    ratings = defaultdict(Counter)
+
+    for obj in session.new:
+        name = COUNTED_MODELS.get(type(obj))
+        if name:
+            counters[name] += 1
+    for obj in session.deleted:
+        name = COUNTED_MODELS.get(type(obj))
+        if name:
+            counters[name] -= 1
+
+    for obj in session.new:
+        if isinstance(obj, ModelOutput):
+            ratings[("model", obj.model_name)]["output_count"] += 1
+            ratings[("language", obj.language)]["output_count"] += 1
+            ratings[("day", _day(obj.created_at))]["output_count"] += 1
+
+    new_feedback = [obj for obj in session.new if isinstance(obj, Feedback)]
+    if new_feedback:
+        output_ids = {f.output_id for f in new_feedback}
+        # Core query on the flush connection: no autoflush, same transaction
+        outputs = {
+            row.id: row for row in session.connection().execute(
+                select(ModelOutput.id, ModelOutput.model_name, ModelOutput.language)
+                .where(ModelOutput.id.in_(output_ids))
+            )
+        }
+        for f in new_feedback:
+            counters["rating_sum"] += f.rating
+            counters["rating_count"] += 1
+            scopes = [("day", _day(f.created_at))]
+            output = outputs.get(f.output_id)
+            if output is not None:
+                scopes += [("model", output.model_name), ("language", output.language)]
+            for scope in scopes:
+                ratings[scope]["rating_sum"] += f.rating
+                ratings[scope]["rating_count"] += 1
+
+    return counters, ratings
+
+
+def _apply_aggregates(session: Session, flush_context):
+    counters, ratings = _collect_deltas(session)
+    if not counters and not ratings:
+        return
+
+    conn = session.connection()
+    for name, delta in counters.items():
+        if delta:
+            _upsert(conn, StatCounter.__table__, {"name": name}, {"value": delta})
+    for (scope, key), deltas in ratings.items():
+        _upsert(
+            conn, RatingAggregate.__table__,
+            {"scope": scope, "key": key or "unknown"},
+            {column: deltas[column] for column in RATING_COLUMNS}
+        )
+
+
+def register_aggregate_hooks():
+    """Maintain the aggregates on every ORM flush (sync and async sessions)"""
+    if not event.contains(Session, "after_flush", _apply_aggregates):
+        event.listen(Session, "after_flush", _apply_aggregates)
+
+
+def rebuild_statistics(db: Session) -> Dict:
+    """
+    Reconciliation job: recompute stat_counters and rating_aggregates from
+    the raw tables. The aggregate tables are cleared first, which takes the
+    write lock, so no concurrent insert can slip between the scan and the
+    rewrite. The caller commits.
+    """
+    db.execute(delete(StatCounter))
+    db.execute(delete(RatingAggregate))
+
+    counters = {
+        name: db.scalar(select(func.count()).select_from(model))
+        for model, name in COUNTED_MODELS.items()
+    }
+    rating_sum, rating_count = db.execute(
+        select(func.coalesce(func.sum(Feedback.rating), 0), func.count(Feedback.id))
+    ).one()
+    counters.update(rating_sum=rating_sum, rating_count=rating_count)
+    db.execute(insert(StatCounter), [{"name": k, "value": v} for k, v in counters.items()])
+
+    ratings = defaultdict(lambda: dict.fromkeys(RATING_COLUMNS, 0))
+    for scope, column in (("model", ModelOutput.model_name), ("language", ModelOutput.language)):
+        for key, count in db.execute(select(column, func.count(ModelOutput.id)).group_by(column)):
+            ratings[(scope, key or "unknown")]["output_count"] = count
+        for key, total, count in db.execute(
+            select(column, func.sum(Feedback.rating), func.count(Feedback.id))
+            .join(ModelOutput, ModelOutput.id == Feedback.output_id)
+            .group_by(column)
+        ):
+            ratings[(scope, key or "unknown")].update(rating_sum=total, rating_count=count)
+
+    output_day = func.date(ModelOutput.created_at)
+    for key, count in db.execute(select(output_day, func.count(ModelOutput.id)).group_by(output_day)):
+        ratings[("day", str(key))]["output_count"] = count
+    feedback_day = func.date(Feedback.created_at)
+    for key, total, count in db.execute(
+        select(feedback_day, func.sum(Feedback.rating), func.count(Feedback.id)).group_by(feedback_day)
+    ):
+        ratings[("day", str(key))].update(rating_sum=total, rating_count=count)
+
+    if ratings:
+        db.execute(insert(RatingAggregate), [
+            {"scope": scope, "key": key, **values}
+            for (scope, key), values in ratings.items()
+        ])
+
+    return {**counters, "aggregate_rows": len(ratings)}
+
+
+def statistics_need_rebuild(db: Session) -> bool:
+    """True for a database with data but no counters yet (e.g. just migrated)"""
+    has_counters = db.scalar(select(func.count()).select_from(StatCounter)) > 0
+    has_rows = db.scalar(select(ModelOutput.id).limit(1)) is not None
+    return has_rows and not has_counters
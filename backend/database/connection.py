@@ -2,41 +2,275 @@
 Database Connection and Session Management
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool, QueuePool
+from concurrent.futures import Future
 from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Dict, TypeVar
+import asyncio
 import os
+import queue
+import threading
 from pathlib import Path
 
-from backend.models.database_models import Base
+from backend.models.database_models import Base, StatCounter
+from backend.database.aggregates import (
+    COUNTED_MODELS, register_aggregate_hooks, rebuild_statistics, statistics_need_rebuild
+)
+
+T = TypeVar("T")
 
 # Database configuration
 DATABASE_DIR = Path(__file__).parent.parent.parent / "data"
 DATABASE_DIR.mkdir(exist_ok=True)
 
-DATABASE_URL = f"sqlite:///{DATABASE_DIR}/code_generator.db"
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DATABASE_DIR}/code_generator.db")
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
 
-# Create engine with connection pooling
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},  # Needed for SQLite
-    poolclass=StaticPool,
-    echo=False  # Set to True for SQL debugging
-)
+# Async drivers for the request path
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its async driver (sqlite -> aiosqlite, postgresql -> asyncpg)"""
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect in ASYNC_DRIVERS:
+        return f"{ASYNC_DRIVERS[dialect]}{sep}{rest}"
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# "default": one shared connection (simple, fine for local use)
+# "production": WAL journaling, a pool of reader connections and one writer connection
+DATABASE_MODE = os.getenv("DATABASE_MODE", "default").lower()
+PRODUCTION_MODE = DATABASE_MODE == "production"
 
-# Create session factory
+# SQLite tuning used in production mode
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",  # Readers never block behind the writer
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # fsync at checkpoints, not every commit
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),  # Negative = KiB per connection
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+}
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply the production pragmas to every new SQLite connection"""
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _create_engines():
+    """Build (reader engine, writer engine) for the configured mode"""
+    if not IS_SQLITE:
+        shared = create_engine(DATABASE_URL, pool_pre_ping=True, echo=False)
+        return shared, shared
+
+    connect_args = {"check_same_thread": False}  # Needed for SQLite
+
+    if not PRODUCTION_MODE:
+        shared = create_engine(
+            DATABASE_URL,
+            connect_args=connect_args,
+            poolclass=StaticPool,
+            echo=False  # Set to True for SQL debugging
+        )
+        return shared, shared
+
+    reader = create_engine(
+        DATABASE_URL,
+        connect_args=connect_args,
+        poolclass=QueuePool,
+        pool_size=int(os.getenv("DATABASE_POOL_SIZE", "8")),
+        max_overflow=int(os.getenv("DATABASE_MAX_OVERFLOW", "8")),
+        echo=False
+    )
+    writer = create_engine(
+        DATABASE_URL,
+        connect_args=connect_args,
+        poolclass=QueuePool,
+        pool_size=1,
+        max_overflow=0,
+        echo=False
+    )
+    event.listen(reader, "connect", _set_sqlite_pragmas)
+    event.listen(writer, "connect", _set_sqlite_pragmas)
+    return reader, writer
+
+
+def _create_async_engine():
+    """
+    Build the async engine for request-path reads. Writes never use it:
+    every write runs on db_writer, the one connection that writes.
+    """
+    if not IS_SQLITE:
+        return create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True, echo=False)
+
+    pool_size = int(os.getenv("DATABASE_POOL_SIZE", "8")) if PRODUCTION_MODE else 5
+    max_overflow = int(os.getenv("DATABASE_MAX_OVERFLOW", "8")) if PRODUCTION_MODE else 5
+    reader = create_async_engine(
+        ASYNC_DATABASE_URL,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        echo=False
+    )
+    if PRODUCTION_MODE:
+        event.listen(reader.sync_engine, "connect", _set_sqlite_pragmas)
+    return reader
+
+
+# Create engines with connection pooling
+engine, writer_engine = _create_engines()
+async_engine = _create_async_engine()
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+WriterSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=writer_engine
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Keep stat_counters / rating_aggregates in step with every ORM write
+register_aggregate_hooks()
+
+
+class DatabaseWriter:
+    """
+    Dedicated writer thread. Write jobs are queued and run one at a time on
+    the writer connection, each in its own transaction, so request handlers
+    never contend for the SQLite write lock.
+    
+    This is the only place the application writes: request handlers,
+    the write-behind queue, the ID allocator, the SQLite response cache,
+    the learning scheduler and the statistics rebuild all submit jobs here.
+    
+    Jobs are callables taking a Session; they should return plain values
+    (IDs, counts), not ORM instances.
+    """
+    
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="db-writer", daemon=True
+                    )
+                    self._thread.start()
+    
+    def submit(self, job: Callable[[Session], T]) -> "Future[T]":
+        """Queue a write job; returns a Future with its result"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((job, future))
+        return future
+    
+    def run(self, job: Callable[[Session], T]) -> T:
+        """Run a write job and wait for it (sync callers)"""
+        return self.submit(job).result()
+    
+    async def run_async(self, job: Callable[[Session], T]) -> T:
+        """Run a write job without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(job))
+    
+    def pending(self) -> int:
+        return self._queue.qsize()
+    
+    def _run(self):
+        while True:
+            job, future = self._queue.get()
+            if job is None:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            
+            db = self.session_factory()
+            try:
+                result = job(db)
+                db.commit()
+                future.set_result(result)
+            except BaseException as e:
+                db.rollback()
+                future.set_exception(e)
+            finally:
+                db.close()
+    
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put((None, None))
+            self._thread.join()
+            self._thread = None
+
+
+# Singleton writer
+db_writer = DatabaseWriter(WriterSessionLocal)
 
 
 def init_database():
     """Initialize database - create all tables"""
     print("🗄️  Initializing database...")
-    Base.metadata.create_all(bind=engine)
-    print(f"✅ Database initialized at: {DATABASE_URL}")
+    Base.metadata.create_all(bind=writer_engine)
+    upgrade_schema()
+    
+    # First start after the statistics tables were added: backfill them
+    with get_db_session() as db:
+        needs_rebuild = statistics_need_rebuild(db)
+    if needs_rebuild:
+        print(f"🔧 Rebuilt statistics: {reconcile_statistics()}")
+    print(f"✅ Database initialized at: {DATABASE_URL} ({DATABASE_MODE} mode)")
     print(f"📊 Tables created: {', '.join(Base.metadata.tables.keys())}")
 
 
+def upgrade_schema():
+    """
+    Add columns and indexes that exist on the ORM models but are missing
+    from an existing database (create_all only creates missing tables)
+    """
+    created_indexes = False
+    with writer_engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+                print(f"🔧 Added column {table.name}.{column.name}")
+            
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                index.create(conn)
+                created_indexes = True
+                print(f"🔧 Added index {index.name}")
+        
+        # Refresh planner statistics so the new indexes are picked up
+        if created_indexes and IS_SQLITE:
+            conn.execute(text("ANALYZE"))
+
+
 def get_db() -> Session:
     """
     Dependency for FastAPI to get database session
@@ -68,6 +302,20 @@ def get_db_session():
         db.close()
 
 
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Async dependency for read-only endpoints
+    Usage: db: AsyncSession = Depends(get_async_db)
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def close_async_engines():
+    """Release pooled async connections (on shutdown)"""
+    await async_engine.dispose()
+
+
 def reset_database():
     """Drop all tables and recreate - USE WITH CAUTION"""
     print("⚠️  Resetting database - all data will be lost!")
@@ -76,22 +324,30 @@ def reset_database():
     print("✅ Database reset complete")
 
 
+_COUNTER_QUERY = select(StatCounter.name, StatCounter.value).where(
+    StatCounter.name.in_(list(COUNTED_MODELS.values()))
+)
+
+
+def _counter_stats(rows) -> Dict[str, int]:
+    values = dict(rows.all())
+    return {name: values.get(name) or 0 for name in COUNTED_MODELS.values()}
+
+
 def get_database_stats():
-    """Get database statistics"""
+    """Get database statistics (from the materialized counters)"""
     with get_db_session() as db:
-        from backend.models.database_models import (
-            Prompt, ModelOutput, Feedback, UserProfile, LearningPattern
-        )
-        
-        stats = {
-            "total_prompts": db.query(Prompt).count(),
-            "total_outputs": db.query(ModelOutput).count(),
-            "total_feedback": db.query(Feedback).count(),
-            "total_users": db.query(UserProfile).count(),
-            "learning_patterns": db.query(LearningPattern).count(),
-        }
-        
-        return stats
+        return _counter_stats(db.execute(_COUNTER_QUERY))
+
+
+async def get_database_stats_async(db: AsyncSession):
+    """Get database statistics on an async session"""
+    return _counter_stats(await db.execute(_COUNTER_QUERY))
+
+
+def reconcile_statistics() -> Dict:
+    """Rebuild the materialized statistics from the raw tables (on the writer)"""
+    return db_writer.run(rebuild_statistics)
 
 
 if __name__ == "__main__":
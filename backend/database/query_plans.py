@@ -0,0 +1,154 @@
+"""
+Query Plan Check
+The hot read paths of the API (statistics, patterns, learning engine
+queries, including the batch read of a learning cycle), run against a
+SQLite database while every SELECT they issue is captured together with
+its EXPLAIN QUERY PLAN. Shared by benchmarks/query_plans.py (timing
+budgets at 1M rows) and tests/test_query_plans.py (no full table scans).
+"""
+
+import random
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+LANGUAGES = ["python", "javascript", "java", "cpp", "go", "rust", "typescript", "csharp"]
+MODELS = ["llama-3.3-70b-versatile", "llama-3.1-8b-instant", "gpt-4o-mini", "mixtral-8x7b"]
+
+
+def seed(db_path: Path, rows: int, pattern_rows: int):
+    """Bulk insert prompts/outputs/feedback/patterns with raw sqlite3 (fast)"""
+    now = datetime.utcnow()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    rng = random.Random(42)
+
+    conn.executemany(
+        "INSERT INTO prompts (id, prompt_text, detected_language, created_at) VALUES (?, ?, ?, ?)",
+        ((i, f"write function {i}", LANGUAGES[i % len(LANGUAGES)], now - timedelta(minutes=i))
+         for i in range(1, rows + 1))
+    )
+    conn.executemany(
+        "INSERT INTO model_outputs (id, prompt_id, model_name, generated_code, language, "
+        "generation_time_ms, created_at, success) VALUES (?, ?, ?, ?, ?, ?, ?, 1)",
+        ((i, i, MODELS[i % len(MODELS)], f"def f{i}(): pass", LANGUAGES[i % len(LANGUAGES)],
+          rng.randint(100, 3000), now - timedelta(minutes=i))
+         for i in range(1, rows + 1))
+    )
+    # Roughly one output in three gets feedback
+    conn.executemany(
+        "INSERT INTO feedback (output_id, rating, feedback_type, created_at) VALUES (?, ?, ?, ?)",
+        ((i, rating, "positive" if rating >= 4 else "negative" if rating <= 2 else "neutral",
+          now - timedelta(minutes=i))
+         for i in range(1, rows + 1, 3)
+         for rating in [rng.randint(1, 5)])
+    )
+    conn.executemany(
+        "INSERT INTO learning_patterns (language, pattern_type, signature, pattern_description, avg_rating, "
+        "occurrence_count, last_updated, confidence_score) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((LANGUAGES[i % len(LANGUAGES)], ("successful", "failed")[i % 2], f"{i:016x}", f"pattern {i}",
+          rng.uniform(1, 5), rng.randint(1, 50), now - timedelta(minutes=i), rng.random())
+         for i in range(pattern_rows))
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def full_scans(statement, plan_rows):
+    """Plan lines that read a whole table without an index"""
+    # A bare COUNT(*) of a table reads every row whatever the indexes
+    if re.fullmatch(r"SELECT count\(\*\) AS \w+\s+FROM \w+", statement.strip()):
+        return []
+    return [
+        detail for *_, detail in plan_rows
+        if detail.startswith("SCAN ") and "INDEX" not in detail and "CONSTANT ROW" not in detail
+    ]
+
+
+def hot_read_paths() -> Dict[str, Callable[[], Awaitable[None]]]:
+    """Name -> coroutine function running one hot read path"""
+    from backend.database.connection import SessionLocal, AsyncSessionLocal
+    from backend.learning.feedback_engine import FeedbackLearningEngine
+    import backend.main as api
+
+    async def statistics():
+        async with AsyncSessionLocal() as db:
+            await api.get_statistics(db=db)
+
+    async def patterns():
+        async with AsyncSessionLocal() as db:
+            await api.get_learning_patterns(language="python", pattern_type="successful", db=db)
+
+    def with_engine(method, *method_args):
+        async def run():
+            db = SessionLocal()
+            try:
+                getattr(FeedbackLearningEngine(db), method)(*method_args)
+            finally:
+                db.close()
+        return run
+
+    async def learning_batch():
+        # One batch of a learning cycle: rated feedback above the watermark,
+        # then the lookup of the patterns it updates (rolled back, never written)
+        db = SessionLocal()
+        try:
+            engine = FeedbackLearningEngine(db)
+            rows = engine._rated_feedback(0, 2 ** 62, 1000)
+            engine._upsert_patterns(db, rows)
+        finally:
+            db.rollback()
+            db.close()
+
+    return {
+        "statistics": statistics,
+        "patterns": patterns,
+        "successful_patterns": with_engine("extract_successful_patterns"),
+        "problematic_patterns": with_engine("extract_problematic_patterns"),
+        "language_suggestions": with_engine("get_language_suggestions", "python"),
+        "feedback_trends": with_engine("analyze_feedback_trends"),
+        "feedback_trend_buckets": with_engine("feedback_trend_buckets", 30, "hour"),
+        "learning_batch": learning_batch,
+    }
+
+
+async def collect_plans(db_path: Path) -> List[Tuple[str, float, List[Tuple[str, list]]]]:
+    """
+    Run each hot read path twice (the first run warms the page cache) and
+    return (name, ms of the second run, [(SELECT, its query plan rows)])
+    """
+    from sqlalchemy import event
+    from backend.database.connection import engine, async_engine
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    results = []
+    event.listen(engine, "before_cursor_execute", capture)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    plan_conn = sqlite3.connect(db_path)
+    try:
+        for name, run in hot_read_paths().items():
+            await run()
+            captured.clear()
+            start = time.perf_counter()
+            await run()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            plans = [
+                (statement, plan_conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall())
+                for statement, parameters in captured
+            ]
+            results.append((name, elapsed_ms, plans))
+    finally:
+        plan_conn.close()
+        event.remove(engine, "before_cursor_execute", capture)
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+    return results
@@ -0,0 +1,309 @@
+"""
+Write-Behind Persistence
+Request handlers get their row IDs immediately and the rows are written
+later, grouped with other requests' rows into one transaction.
+
+  - IDs come from blocks reserved in the `id_allocations` table, so several
+    API processes can allocate concurrently without colliding
+  - queued rows are flushed every WRITE_BEHIND_INTERVAL_MS (or as soon as
+    WRITE_BEHIND_MAX_BATCH rows are waiting) in a single transaction
+  - callers that need the row committed before they answer pass
+    durable=True and wait for the flush that carries their rows
+  - a failed batch is never thrown away: on a transient error (e.g.
+    "database is locked") it goes back to the front of the queue and is
+    retried with exponential back-off; any other error (or retries running
+    out) commits the batch row by row, so only the row that cannot be
+    written is dropped
+  - block reservations and batches are committed on db_writer, the one
+    connection the application writes through
+"""
+
+import os
+import time
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from backend.database.connection import db_writer
+from backend.models.database_models import IdAllocation
+
+
+class IdAllocator:
+    """Hands out primary keys from blocks reserved in `id_allocations`"""
+
+    def __init__(self, block_size: int = 1000):
+        self.block_size = block_size
+        self._ranges: Dict[str, Tuple[int, int]] = {}  # table -> (next, end exclusive)
+        self._lock = asyncio.Lock()
+
+    async def _reserve(self, model, count: int) -> Tuple[int, int]:
+        """Reserve a fresh block of at least `count` IDs for model's table"""
+        table = model.__tablename__
+        size = max(self.block_size, count)
+
+        def reserve(db) -> int:
+            row = db.scalar(
+                select(IdAllocation).where(IdAllocation.table_name == table).with_for_update()
+            )
+            if row is None:
+                # First reservation: start above the rows that already exist
+                highest = db.scalar(select(func.max(model.id))) or 0
+                row = IdAllocation(table_name=table, next_id=highest + 1)
+                db.add(row)
+            start = row.next_id
+            row.next_id = start + size
+            return start
+
+        start = await db_writer.run_async(reserve)
+        return start, start + size
+
+    async def allocate(self, model, count: int = 1) -> List[int]:
+        """Return `count` unused primary keys for model"""
+        table = model.__tablename__
+        async with self._lock:
+            start, end = self._ranges.get(table, (0, 0))
+            if end - start < count:
+                start, end = await self._reserve(model, count)
+            self._ranges[table] = (start + count, end)
+        return list(range(start, start + count))
+
+    def reset(self):
+        """Forget reserved blocks (e.g. after the database was replaced)"""
+        self._ranges.clear()
+
+
+class WriteBehindQueue:
+    """Buffers ORM rows and commits them in batches on a short timer"""
+
+    def __init__(
+        self,
+        interval_ms: float = 50,
+        max_batch: int = 500,
+        enabled: bool = True,
+        durable: bool = False,
+        allocator: Optional[IdAllocator] = None,
+        max_retries: int = 5,
+        retry_backoff_ms: float = 100
+    ):
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self.durable = durable  # Default for callers that do not choose
+        self.ids = allocator or IdAllocator()
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff_ms / 1000
+
+        self._pending: List = []
+        self._waiters: List[Tuple[asyncio.Future, tuple]] = []  # (future, rows it waits for)
+        self._attempts = 0       # consecutive failed flushes of the rows at the front
+        self._retry_at = 0.0     # monotonic time before which the timer does not retry
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+        self.rows_written = 0
+        self.flushes = 0
+        self.failed_rows = 0
+        self.retries = 0
+        self.last_flush_ms = 0.0
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def allocate(self, model, count: int = 1) -> List[int]:
+        return await self.ids.allocate(model, count)
+
+    async def _write_now(self, records: tuple):
+        await self._commit(list(records))
+        self.rows_written += len(records)
+
+    def _queue(self, records: tuple, durable: bool) -> Optional[asyncio.Future]:
+        """Queue rows; returns a future for their commit if durable"""
+        if not self.enabled:
+            task = asyncio.ensure_future(self._write_now(records))
+            return task if durable else None
+
+        self._ensure_started()
+        self._pending.extend(records)
+        waiter = None
+        if durable:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append((waiter, records))
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+        return waiter
+
+    async def add(self, *records, durable: Optional[bool] = None):
+        """
+        Queue rows for insertion. Returns immediately unless durable, in
+        which case it waits until the rows are committed (and raises if
+        the flush failed).
+        """
+        durable = self.durable if durable is None else durable
+        if not self.enabled:
+            await self._write_now(records)
+            return
+
+        waiter = self._queue(records, durable)
+        if waiter is not None:
+            await waiter
+
+    def enqueue(self, *records) -> asyncio.Future:
+        """
+        Queue rows without awaiting (they are queued even if the caller is
+        cancelled right after) and return a future that resolves once they
+        are committed
+        """
+        return self._queue(records, durable=True)
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def _commit(self, records: List):
+        await db_writer.run_async(lambda db: db.add_all(records))
+
+    def _requeue(self, records: List, waiters: List, reason: str):
+        """Put rows back at the front of the queue; the timer retries them after a back-off"""
+        self._attempts += 1
+        self.retries += 1
+        self._pending = records + self._pending
+        self._waiters = waiters + self._waiters
+        self._retry_at = time.monotonic() + self.retry_backoff * 2 ** (self._attempts - 1)
+        print(f"⚠️ Write-behind flush of {len(records)} rows failed ({reason}); "
+              f"retry {self._attempts}/{self.max_retries} queued")
+
+    def _can_retry(self, error: Exception) -> bool:
+        return isinstance(error, OperationalError) and self._attempts < self.max_retries
+
+    async def _commit_rows(self, records: List) -> Tuple[List, List]:
+        """
+        Commit rows one at a time so only a row that cannot be written is
+        dropped. Returns (dropped rows, rows still to write after a transient error).
+        """
+        dropped = []
+        for index, record in enumerate(records):
+            try:
+                await self._commit([record])
+            except Exception as e:
+                if self._can_retry(e):
+                    return dropped, records[index:]
+                dropped.append(record)
+                self.failed_rows += 1
+                print(f"❌ Write-behind dropped {type(record).__name__} id={getattr(record, 'id', None)}: {e}")
+                continue
+            self.rows_written += 1
+            self._attempts = 0
+        return dropped, []
+
+    async def flush(self):
+        """Commit everything queued so far (waits for a flush already running)"""
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            records, self._pending = self._pending, []
+            waiters, self._waiters = self._waiters, []
+            if not records:
+                for waiter, _ in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+                return
+
+            start = time.perf_counter()
+            try:
+                await self._commit(records)
+                dropped, retry = [], []
+                self.rows_written += len(records)
+                self._attempts = 0
+            except Exception as e:
+                if self._can_retry(e):
+                    self._requeue(records, waiters, str(e))
+                    return
+                # A bad row (or a database that stays busy): isolate it
+                print(f"⚠️ Write-behind flush of {len(records)} rows failed ({e}); writing rows one by one")
+                dropped, retry = await self._commit_rows(records)
+
+            self.flushes += 1
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            dropped_ids = {id(record) for record in dropped}
+            retry_ids = {id(record) for record in retry}
+            waiting = []
+            for waiter, rows in waiters:
+                if waiter.done():
+                    continue
+                if any(id(record) in dropped_ids for record in rows):
+                    waiter.set_exception(RuntimeError("Write-behind row could not be written"))
+                elif any(id(record) in retry_ids for record in rows):
+                    waiting.append((waiter, rows))
+                else:
+                    waiter.set_result(None)
+            if retry:
+                self._requeue(retry, waiting, "database busy while writing rows one by one")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if time.monotonic() < self._retry_at:
+                continue  # Backing off after a failed flush
+            if self._pending or self._waiters:
+                await self.flush()
+
+    async def close(self):
+        """Flush outstanding rows (retrying with back-off) and stop the timer (on shutdown)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        while self._pending:
+            await asyncio.sleep(max(0.0, self._retry_at - time.monotonic()))
+            await self.flush()
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "rows_per_flush": round(self.rows_written / self.flushes, 2) if self.flushes else 0.0,
+            "failed_rows": self.failed_rows,
+            "retries": self.retries,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+        }
+
+
+def create_write_behind_queue() -> WriteBehindQueue:
+    """
+    Build the queue from environment settings:
+        WRITE_BEHIND_ENABLED       false = write each call in its own transaction
+        WRITE_BEHIND_INTERVAL_MS   flush timer (default 50)
+        WRITE_BEHIND_MAX_BATCH     flush early once this many rows wait (default 500)
+        WRITE_BEHIND_DURABLE       default for callers: wait for the commit (default false)
+        WRITE_BEHIND_ID_BLOCK      IDs reserved per allocation round-trip (default 1000)
+        WRITE_BEHIND_MAX_RETRIES   transient failures retried before rows are written one by one (default 5)
+        WRITE_BEHIND_RETRY_BACKOFF_MS  first retry delay, doubled per attempt (default 100)
+    """
+    return WriteBehindQueue(
+        interval_ms=float(os.getenv("WRITE_BEHIND_INTERVAL_MS", "50")),
+        max_batch=int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500")),
+        enabled=os.getenv("WRITE_BEHIND_ENABLED", "true").lower() != "false",
+        durable=os.getenv("WRITE_BEHIND_DURABLE", "false").lower() == "true",
+        allocator=IdAllocator(int(os.getenv("WRITE_BEHIND_ID_BLOCK", "1000"))),
+        max_retries=int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5")),
+        retry_backoff_ms=float(os.getenv("WRITE_BEHIND_RETRY_BACKOFF_MS", "100"))
+    )
+
+
+# Singleton instance
+write_behind = create_write_behind_queue()
@@ -0,0 +1,388 @@
+"""
+Feedback Analytics
+Columnar, in-memory snapshot of outputs and feedback for dashboard slices.
+
+The snapshot loads the few columns the dashboards need into NumPy arrays
+once, then appends only new rows on each refresh. Output ids come from the
+write-behind block allocator and are committed out of id order, so a
+refresh also re-reads outputs created shortly before the previous refresh
+and skips the ids it already holds; feedback whose output is not in the
+snapshot yet is kept aside and joined again on the next refresh. Every slice
+(overall, per model, per language, model x language matrix, daily buckets
+with a rolling average, generation time percentiles) is computed from the
+arrays in a single vectorized pass, instead of one SQL aggregate per slice.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, or_, select
+
+from backend.database.connection import engine
+from backend.models.database_models import Feedback, ModelOutput
+
+DAY_SECONDS = 86400
+PERCENTILES = (50, 90, 99)
+
+
+def _epoch(column):
+    """created_at as integer Unix seconds, computed by the database"""
+    if engine.dialect.name == "sqlite":
+        return cast(func.strftime("%s", column), Integer)
+    return cast(func.extract("epoch", column), Integer)
+
+
+class _Columns:
+    """
+    Growable set of equally long NumPy columns (capacity doubles on append).
+    Rows below `size` are never written in place (appends fill spare
+    capacity, growing and take() build new arrays), so the views returned
+    by `columns()` stay a consistent snapshot after the lock is released.
+    """
+
+    def __init__(self, dtypes: Dict[str, str]):
+        self.dtypes = dtypes
+        self.size = 0
+        self._data = {name: np.empty(0, dtype=dtype) for name, dtype in dtypes.items()}
+
+    def append(self, chunk: Dict[str, np.ndarray]):
+        count = len(next(iter(chunk.values())))
+        needed = self.size + count
+        capacity = len(next(iter(self._data.values())))
+        if needed > capacity:
+            capacity = max(needed, capacity * 2, 1024)
+            for name, column in self._data.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                self._data[name] = grown
+        for name, values in chunk.items():
+            self._data[name][self.size:needed] = values
+        self.size = needed
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._data[name][:self.size]
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {name: self[name] for name in self._data}
+
+    def take(self, index: np.ndarray):
+        """Keep only the rows at `index`, in that order"""
+        for name in self._data:
+            self._data[name] = self._data[name][:self.size][index]
+        self.size = len(index)
+
+
+def _group_mean(groups: np.ndarray, values: np.ndarray, size: int):
+    """(count, mean) per group id in [0, size)"""
+    counts = np.bincount(groups, minlength=size)
+    sums = np.bincount(groups, weights=values, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+    return counts, means
+
+
+def _group_percentiles(groups: np.ndarray, values: np.ndarray, size: int, qs: Sequence[float]) -> np.ndarray:
+    """Linear-interpolated percentiles per group, shape (size, len(qs)); NaN for empty groups"""
+    result = np.full((size, len(qs)), np.nan)
+    if len(values) == 0:
+        return result
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    starts = np.searchsorted(groups[order], np.arange(size), side="left")
+    ends = np.searchsorted(groups[order], np.arange(size), side="right")
+    counts = ends - starts
+    present = counts > 0
+    for i, q in enumerate(qs):
+        position = starts[present] + (counts[present] - 1) * (q / 100.0)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        fraction = position - low
+        result[present, i] = sorted_values[low] * (1 - fraction) + sorted_values[high] * fraction
+    return result
+
+
+class FeedbackAnalytics:
+    """Incrementally refreshed columnar snapshot plus vectorized slices"""
+
+    def __init__(self, refresh_seconds: float = 30, chunk_size: int = 200_000, late_row_seconds: float = 300):
+        self.refresh_seconds = refresh_seconds
+        self.chunk_size = chunk_size
+        self.late_row_seconds = late_row_seconds
+        self._lock = threading.Lock()
+        self._refreshed_at = 0.0
+        self.reset()
+
+    def reset(self):
+        self.models: List[str] = []
+        self.languages: List[str] = []
+        self._model_codes: Dict[str, int] = {}
+        self._language_codes: Dict[str, int] = {}
+        self._last_output_id = 0
+        self._last_feedback_id = 0
+        self._loaded_at: Optional[float] = None
+        self.outputs = _Columns({
+            "id": "int64", "model": "int32", "language": "int32",
+            "created": "int64", "time_ms": "float64", "success": "bool",
+        })
+        # Feedback rows carry their output's model/language (denormalized on load)
+        self.feedback = _Columns({
+            "rating": "int8", "model": "int32", "language": "int32", "created": "int64",
+        })
+        # Feedback whose output has not been loaded yet (still in the write-behind queue)
+        self.unmatched = _Columns({"output_id": "int64", "rating": "int8", "created": "int64"})
+
+    def _encode(self, values: Sequence[Optional[str]], codes: Dict[str, int], names: List[str]) -> np.ndarray:
+        """Dictionary-encode a chunk of category values into int32 codes"""
+        uniques, inverse = np.unique(np.array([v or "unknown" for v in values], dtype=object), return_inverse=True)
+        for value in uniques:
+            if value not in codes:
+                codes[value] = len(names)
+                names.append(value)
+        return np.array([codes[value] for value in uniques], dtype=np.int32)[inverse]
+
+    def _fetch(self, conn, statement):
+        """
+        Yield row chunks straight from the DBAPI cursor: building a
+        SQLAlchemy Row per record costs more than the columnar conversion.
+        """
+        compiled = statement.compile(dialect=conn.dialect)
+        params = compiled.construct_params()
+        if compiled.positional:
+            params = tuple(params[name] for name in compiled.positiontup)
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(str(compiled), params)
+            while rows := cursor.fetchmany(self.chunk_size):
+                yield rows
+        finally:
+            cursor.close()
+
+    def _load_outputs(self, conn) -> int:
+        statement = select(
+            ModelOutput.id, ModelOutput.model_name, ModelOutput.language,
+            _epoch(ModelOutput.created_at), ModelOutput.generation_time_ms, ModelOutput.success
+        )
+        if self._loaded_at is None:
+            statement = statement.order_by(ModelOutput.id)
+        else:
+            # Also rows created before the last refresh but committed after it.
+            # No ORDER BY, so SQLite can answer the OR from the primary key and
+            # the created_at index instead of scanning the table.
+            late_since = datetime.utcfromtimestamp(self._loaded_at - self.late_row_seconds)
+            statement = statement.where(or_(
+                ModelOutput.id > self._last_output_id, ModelOutput.created_at >= late_since
+            ))
+        loaded = 0
+        for rows in self._fetch(conn, statement):
+            ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            known = self.outputs["id"]
+            if len(known):
+                index = np.minimum(np.searchsorted(known, ids), len(known) - 1)
+                new = known[index] != ids
+            else:
+                new = np.ones(len(rows), dtype=bool)
+            rows = [row for row, keep in zip(rows, new) if keep]
+            if not rows:
+                continue
+            ids = ids[new]
+            in_order = (not len(known) or ids[0] > known[-1]) and bool(np.all(ids[1:] > ids[:-1]))
+            _, models, languages, created, time_ms, success = zip(*rows)
+            self.outputs.append({
+                "id": ids,
+                "model": self._encode(models, self._model_codes, self.models),
+                "language": self._encode(languages, self._language_codes, self.languages),
+                "created": np.array(created, dtype=np.float64).astype(np.int64),
+                "time_ms": np.array(time_ms, dtype=np.float64),  # None -> nan
+                "success": np.array([bool(s) for s in success], dtype=bool),
+            })
+            if not in_order:
+                # Keep the ids sorted for the binary searches above and in the feedback join
+                self.outputs.take(np.argsort(self.outputs["id"], kind="stable"))
+            self._last_output_id = max(self._last_output_id, int(ids.max()))
+            loaded += len(rows)
+        return loaded
+
+    def _join_feedback(self, output_ids: np.ndarray, ratings: np.ndarray, created: np.ndarray):
+        """Append feedback whose output is in the snapshot; keep the rest for the next refresh"""
+        known = self.outputs["id"]
+        if len(known):
+            index = np.minimum(np.searchsorted(known, output_ids), len(known) - 1)
+            found = known[index] == output_ids
+        else:
+            index = np.zeros(len(output_ids), dtype=np.int64)
+            found = np.zeros(len(output_ids), dtype=bool)
+        self.feedback.append({
+            "rating": ratings[found],
+            "model": self.outputs["model"][index][found],
+            "language": self.outputs["language"][index][found],
+            "created": created[found],
+        })
+        return {"output_id": output_ids[~found], "rating": ratings[~found], "created": created[~found]}
+
+    def _load_feedback(self, conn) -> int:
+        # Retry the feedback that arrived before its output
+        waiting = {name: self.unmatched[name].copy() for name in self.unmatched.dtypes}
+        self.unmatched = _Columns(self.unmatched.dtypes)
+        self.unmatched.append(self._join_feedback(waiting["output_id"], waiting["rating"], waiting["created"]))
+
+        statement = select(
+            Feedback.id, Feedback.output_id, Feedback.rating, _epoch(Feedback.created_at)
+        ).where(Feedback.id > self._last_feedback_id).order_by(Feedback.id)
+        loaded = 0
+        for rows in self._fetch(conn, statement):
+            ids, fb_output_ids, ratings, created = zip(*rows)
+            # Output ids are kept in ascending order, so a binary search joins them
+            self.unmatched.append(self._join_feedback(
+                np.fromiter(fb_output_ids, dtype=np.int64, count=len(rows)),
+                np.fromiter(ratings, dtype=np.int8, count=len(rows)),
+                np.array(created, dtype=np.float64).astype(np.int64),
+            ))
+            self._last_feedback_id = ids[-1]
+            loaded += len(rows)
+        return loaded
+
+    def refresh(self, force: bool = False) -> Dict:
+        """Append rows written since the last refresh (at most every refresh_seconds)"""
+        with self._lock:
+            if not force and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+                return {"outputs": 0, "feedback": 0, "unmatched_feedback": self.unmatched.size}
+            started = time.time()
+            with engine.connect() as conn:
+                outputs = self._load_outputs(conn)
+                feedback = self._load_feedback(conn)
+            self._loaded_at = started
+            self._refreshed_at = time.monotonic()
+            return {"outputs": outputs, "feedback": feedback, "unmatched_feedback": self.unmatched.size}
+
+    def compute(self, days: int = 30, rolling_days: int = 7, now: Optional[float] = None) -> Dict:
+        """All dashboard slices for the last `days` days, from the current snapshot"""
+        now = now or time.time()
+        cutoff = now - days * DAY_SECONDS
+        # Consistent views: a refresh on another thread may grow or re-sort the columns
+        with self._lock:
+            models, languages = list(self.models), list(self.languages)
+            outputs, feedback = self.outputs.columns(), self.feedback.columns()
+            unmatched_count = self.unmatched.size
+        n_models, n_languages = len(models), len(languages)
+
+        fb_created = feedback["created"]
+        recent = fb_created >= cutoff
+        ratings = feedback["rating"][recent].astype(np.float64)
+        fb_model = feedback["model"][recent]
+        fb_language = feedback["language"][recent]
+        positive = ratings >= 4
+        negative = ratings <= 2
+
+        # Per model / language / model x language in one bincount each
+        model_count, model_avg = _group_mean(fb_model, ratings, n_models)
+        model_positive = np.bincount(fb_model, weights=positive, minlength=n_models)
+        model_negative = np.bincount(fb_model, weights=negative, minlength=n_models)
+        language_count, language_avg = _group_mean(fb_language, ratings, n_languages)
+        cell = fb_model * max(n_languages, 1) + fb_language
+        matrix_count, matrix_avg = _group_mean(cell, ratings, n_models * n_languages)
+
+        # Daily buckets on UTC calendar days (the last `days` dates up to today,
+        # oldest first) and a trailing rolling average
+        first_day = (int(now) // DAY_SECONDS - days + 1) * DAY_SECONDS
+        day_index = fb_created[recent] // DAY_SECONDS - first_day // DAY_SECONDS
+        in_series = (day_index >= 0) & (day_index < days)
+        day_index, day_ratings = day_index[in_series], ratings[in_series]
+        day_count, day_avg = _group_mean(day_index, day_ratings, days)
+        day_sum = np.bincount(day_index, weights=day_ratings, minlength=days)
+        window_sum = np.convolve(day_sum, np.ones(rolling_days))[:days]
+        window_count = np.convolve(day_count, np.ones(rolling_days))[:days]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rolling_avg = np.where(window_count > 0, window_sum / np.maximum(window_count, 1), 0.0)
+
+        # Generation time percentiles and success rate per model
+        out_recent = outputs["created"] >= cutoff
+        out_model = outputs["model"][out_recent]
+        time_ms = outputs["time_ms"][out_recent]
+        timed = ~np.isnan(time_ms)
+        overall_pct = np.percentile(time_ms[timed], PERCENTILES) if timed.any() else [None] * len(PERCENTILES)
+        model_pct = _group_percentiles(out_model[timed], time_ms[timed], n_models, PERCENTILES)
+        output_count, success_rate = _group_mean(out_model, outputs["success"][out_recent], n_models)
+
+        def percentiles(values) -> Dict:
+            return {
+                f"p{q}": (None if v is None or np.isnan(v) else round(float(v), 1))
+                for q, v in zip(PERCENTILES, values)
+            }
+
+        return {
+            "window_days": days,
+            "overall": {
+                "avg_rating": float(ratings.mean()) if len(ratings) else 0.0,
+                "total_feedback": int(len(ratings)),
+                "positive_count": int(positive.sum()),
+                "negative_count": int(negative.sum()),
+                "generation_time_ms": percentiles(overall_pct),
+            },
+            "by_model": [
+                {
+                    "model": name,
+                    "avg_rating": float(model_avg[i]),
+                    "count": int(model_count[i]),
+                    "positive_count": int(model_positive[i]),
+                    "negative_count": int(model_negative[i]),
+                    "outputs": int(output_count[i]),
+                    "success_rate": float(success_rate[i]),
+                    "generation_time_ms": percentiles(model_pct[i]),
+                }
+                for i, name in enumerate(models)
+                if model_count[i] or output_count[i]
+            ],
+            "by_language": [
+                {"language": name, "avg_rating": float(language_avg[i]), "count": int(language_count[i])}
+                for i, name in enumerate(languages)
+                if language_count[i]
+            ],
+            "model_language_matrix": {
+                "models": models,
+                "languages": languages,
+                "avg_rating": matrix_avg.reshape(n_models, n_languages).round(3).tolist(),
+                "count": matrix_count.reshape(n_models, n_languages).tolist(),
+            },
+            "daily": [
+                {
+                    "day": time.strftime("%Y-%m-%d", time.gmtime(first_day + i * DAY_SECONDS)),
+                    "count": int(day_count[i]),
+                    "avg_rating": float(day_avg[i]),
+                    f"rolling_{rolling_days}d_avg": float(rolling_avg[i]),
+                }
+                for i in range(days)
+            ],
+            "snapshot": {
+                "outputs": len(outputs["id"]),
+                "feedback": len(feedback["rating"]),
+                "unmatched_feedback": unmatched_count,
+            },
+        }
+
+    def report(self, days: int = 30, rolling_days: int = 7) -> Dict:
+        """Refresh if stale, then compute (blocking; run off the event loop)"""
+        self.refresh()
+        return self.compute(days=days, rolling_days=rolling_days)
+
+
+def create_feedback_analytics() -> FeedbackAnalytics:
+    """
+    Build the analytics snapshot from environment settings:
+        ANALYTICS_REFRESH_SECONDS    minimum age before new rows are loaded (default 30)
+        ANALYTICS_CHUNK_SIZE         rows fetched per round trip while loading (default 200000)
+        ANALYTICS_LATE_ROW_SECONDS   how long before a refresh a row may be created and still
+                                     be committed after it (write-behind delay; default 300)
+    """
+    return FeedbackAnalytics(
+        refresh_seconds=float(os.getenv("ANALYTICS_REFRESH_SECONDS", "30")),
+        chunk_size=int(os.getenv("ANALYTICS_CHUNK_SIZE", "200000")),
+        late_row_seconds=float(os.getenv("ANALYTICS_LATE_ROW_SECONDS", "300"))
+    )
+
+
+# Singleton instance
+feedback_analytics = create_feedback_analytics()
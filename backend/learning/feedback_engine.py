@@ -3,88 +3,156 @@ Feedback Learning Engine
 Analyzes feedback trends and improves code generation
 """
 
-from typing import Dict, List, Optional
-from sqlalchemy import func, and_, desc
+from collections import defaultdict
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+from sqlalchemy import func, and_, or_, desc, case
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+import hashlib
 import json
 
 from backend.models.database_models import (
-    Feedback, ModelOutput, Prompt, LearningPattern
+    Feedback, ModelOutput, Prompt, LearningPattern, LearningState
 )
+from backend.learning.vector_index import prompt_index, WORD_PATTERN, STOPWORDS
+
+LEARNING_STATE_NAME = "feedback_learning"
+
+T = TypeVar("T")
+
+# Trend bucket sizes and their SQLite strftime formats (date_trunc elsewhere)
+TREND_BUCKETS = {"hour": "%Y-%m-%d %H:00", "day": "%Y-%m-%d"}
+
+
+def prompt_keywords(prompt_text: str, language: Optional[str] = None, limit: int = 8) -> List[str]:
+    """First distinct content words of a prompt, sorted so word order does not matter"""
+    keywords = []
+    for word in WORD_PATTERN.findall((prompt_text or "").lower()):
+        if word in STOPWORDS or word == language or word in keywords:
+            continue
+        keywords.append(word)
+        if len(keywords) == limit:
+            break
+    return sorted(keywords)
+
+
+def pattern_signature(keywords: List[str]) -> str:
+    """Stable key for prompts with the same keywords"""
+    return hashlib.sha1(" ".join(keywords).encode("utf-8")).hexdigest()[:16]
 
 
 class FeedbackLearningEngine:
     """Background service to analyze feedback and improve generation"""
     
-    def __init__(self, db_session: Session):
+    def __init__(self, db_session: Session, write: Optional[Callable[[Callable[[Session], T]], T]] = None):
+        """
+        db_session serves the reads. Pattern updates are handed to write as
+        jobs taking a Session, one per batch (e.g. db_writer.run); without
+        it they run on db_session and are committed there.
+        """
         self.db = db_session
+        self._write = write or self._write_here
+    
+    def _write_here(self, job: Callable[[Session], T]) -> T:
+        result = job(self.db)
+        self.db.commit()
+        return result
+    
+    def _trend_columns(self):
+        """Conditional aggregates shared by the trend queries"""
+        return (
+            func.count(Feedback.id).label('count'),
+            func.coalesce(func.sum(Feedback.rating), 0).label('rating_sum'),
+            func.sum(case((Feedback.rating >= 4, 1), else_=0)).label('positive_count'),
+            func.sum(case((Feedback.rating <= 2, 1), else_=0)).label('negative_count')
+        )
+    
+    @staticmethod
+    def _trend_stats(count: int, rating_sum: int, positive: int, negative: int) -> Dict:
+        return {
+            "avg_rating": rating_sum / count if count else 0.0,
+            "count": count,
+            "positive_count": positive or 0,
+            "negative_count": negative or 0
+        }
     
     def analyze_feedback_trends(self, days: int = 30) -> Dict:
-        """Analyze feedback trends over the past N days"""
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        """
+        Analyze feedback trends over the past N days.
         
-        # Get feedback statistics
-        feedback_stats = self.db.query(
-            func.avg(Feedback.rating).label('avg_rating'),
-            func.count(Feedback.id).label('total_feedback'),
-            func.sum(func.cast(Feedback.rating >= 4, type_=func.Integer)).label('positive_count'),
-            func.sum(func.cast(Feedback.rating <= 2, type_=func.Integer)).label('negative_count')
-        ).filter(
-            Feedback.created_at >= cutoff_date
-        ).first()
+        One grouped query returns counts, rating sums and positive/negative
+        counts per (model, language); the overall, per-language and
+        per-model figures are rolled up from those few rows. The outer join
+        keeps feedback whose output was deleted in the overall figures.
+        """
+        cutoff_date = datetime.utcnow() - timedelta(days=days)
         
-        # Get language-specific performance
-        language_stats = self.db.query(
+        rows = self.db.query(
+            ModelOutput.model_name,
             ModelOutput.language,
-            func.avg(Feedback.rating).label('avg_rating'),
-            func.count(Feedback.id).label('count')
-        ).join(
-            Feedback, ModelOutput.id == Feedback.output_id
+            *self._trend_columns()
+        ).select_from(Feedback).outerjoin(
+            ModelOutput, ModelOutput.id == Feedback.output_id
         ).filter(
             Feedback.created_at >= cutoff_date
         ).group_by(
-            ModelOutput.language
+            ModelOutput.model_name, ModelOutput.language
         ).all()
         
-        # Get model performance
-        model_stats = self.db.query(
-            ModelOutput.model_name,
-            func.avg(Feedback.rating).label('avg_rating'),
-            func.count(Feedback.id).label('count')
-        ).join(
-            Feedback, ModelOutput.id == Feedback.output_id
-        ).filter(
-            Feedback.created_at >= cutoff_date
-        ).group_by(
-            ModelOutput.model_name
-        ).all()
+        overall = [0, 0, 0, 0]
+        by_language = defaultdict(lambda: [0, 0, 0, 0])
+        by_model = defaultdict(lambda: [0, 0, 0, 0])
+        for model, language, *totals in rows:
+            targets = [overall]
+            if model is not None:
+                targets += [by_model[model], by_language[language]]
+            for target in targets:
+                for i, value in enumerate(totals):
+                    target[i] += value or 0
         
+        overall_stats = self._trend_stats(*overall)
         return {
             "overall": {
-                "avg_rating": float(feedback_stats.avg_rating or 0),
-                "total_feedback": feedback_stats.total_feedback or 0,
-                "positive_count": feedback_stats.positive_count or 0,
-                "negative_count": feedback_stats.negative_count or 0
+                "avg_rating": overall_stats["avg_rating"],
+                "total_feedback": overall_stats["count"],
+                "positive_count": overall_stats["positive_count"],
+                "negative_count": overall_stats["negative_count"]
             },
             "by_language": [
-                {
-                    "language": lang,
-                    "avg_rating": float(avg_rating),
-                    "count": count
-                }
-                for lang, avg_rating, count in language_stats
+                {"language": language, **self._trend_stats(*totals)}
+                for language, totals in by_language.items()
             ],
             "by_model": [
-                {
-                    "model": model,
-                    "avg_rating": float(avg_rating),
-                    "count": count
-                }
-                for model, avg_rating, count in model_stats
+                {"model": model, **self._trend_stats(*totals)}
+                for model, totals in by_model.items()
             ]
         }
     
+    def feedback_trend_buckets(self, days: int = 30, bucket: str = "day") -> List[Dict]:
+        """Feedback count, average rating and positive/negative counts per hour or day"""
+        if bucket not in TREND_BUCKETS:
+            raise ValueError(f"bucket must be one of {', '.join(TREND_BUCKETS)}")
+        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        
+        if self.db.get_bind().dialect.name == "sqlite":
+            period = func.strftime(TREND_BUCKETS[bucket], Feedback.created_at)
+        else:
+            period = func.date_trunc(bucket, Feedback.created_at)
+        period = period.label('period')
+        
+        rows = self.db.query(
+            period,
+            *self._trend_columns()
+        ).filter(
+            Feedback.created_at >= cutoff_date
+        ).group_by(period).order_by(period).all()
+        
+        return [
+            {"period": str(row.period), **self._trend_stats(*row[1:])}
+            for row in rows
+        ]
+    
     def extract_successful_patterns(self, min_rating: int = 4) -> List[Dict]:
         """Extract patterns from highly-rated code"""
         successful_outputs = self.db.query(
@@ -140,58 +208,218 @@ class FeedbackLearningEngine:
         
         return patterns
     
-    def update_learning_patterns(self):
-        """Update learning patterns based on feedback analysis"""
+    def update_learning_patterns(self, batch_size: int = 1000, full: bool = False) -> Dict:
+        """
+        Fold feedback received since the last run into the learning patterns.
+        
+        Only feedback above the stored watermark (last processed Feedback.id)
+        is read, in batches. Each rated output is upserted into the pattern
+        keyed by (language, pattern_type, prompt signature) with rolling
+        averages, and the watermark advances in the same write job, so the
+        cost of a cycle follows the amount of new feedback and no write job
+        covers more than one batch.
+        
+        full=True drops all patterns and replays every feedback row.
+        """
         print("📚 Updating learning patterns...")
         
-        # Get successful patterns
-        successful = self.extract_successful_patterns()
+        watermark = self.db.query(LearningState.last_feedback_id).filter(
+            LearningState.name == LEARNING_STATE_NAME
+        ).scalar()
+        # No state yet: replace rows written by the old full-rescan cycle.
+        # Watermark 0 with patterns left means an interrupted full run.
+        if full or not watermark:
+            self._clear_patterns(batch_size)
+            full, watermark = True, 0
         
-        for pattern_data in successful:
-            # Check if pattern exists
-            existing = self.db.query(LearningPattern).filter(
-                and_(
-                    LearningPattern.language == pattern_data['language'],
-                    LearningPattern.pattern_type == 'successful'
-                )
-            ).first()
+        # Everything up to the newest feedback now is covered by this run,
+        # including neutral ratings that never become patterns
+        high_water = self.db.query(func.max(Feedback.id)).scalar() or 0
+        
+        # The prompt index is rebuilt alongside the patterns, or backfilled
+        # up to the watermark when its files are missing
+        if full:
+            prompt_index.clear()
+        elif prompt_index.count == 0:
+            self._backfill_prompt_index(watermark, batch_size)
+        
+        summary = {"processed": 0, "created": 0, "updated": 0, "indexed": 0}
+        while True:
+            rows = self._rated_feedback(watermark, high_water, batch_size)
+            if not rows:
+                break
             
-            if existing:
-                existing.occurrence_count += 1
-                existing.last_updated = datetime.utcnow()
-                existing.confidence_score = min(existing.confidence_score + 0.05, 1.0)
-            else:
-                new_pattern = LearningPattern(
-                    language=pattern_data['language'],
-                    pattern_type='successful',
-                    pattern_description=f"High-rated {pattern_data['language']} code pattern",
-                    prompt_keywords=pattern_data['prompt'][:200],
-                    code_snippet=pattern_data['code_snippet'],
-                    avg_rating=pattern_data['rating'],
-                    confidence_score=0.6
-                )
-                self.db.add(new_pattern)
+            watermark = rows[-1].id
+            created, updated = self._write(partial(self._apply_batch, rows, watermark))
+            summary["indexed"] += self._index_prompts(rows)
+            summary["processed"] += len(rows)
+            summary["created"] += created
+            summary["updated"] += updated
+            
+            if len(rows) < batch_size:
+                break
         
-        # Get problematic patterns
-        problematic = self.extract_problematic_patterns()
+        watermark = max(watermark, high_water)
+        self._write(partial(self._save_watermark, watermark))
+        prompt_index.save()
+        summary["watermark"] = watermark
+        print(
+            f"✅ Updated learning patterns from {summary['processed']} new feedback: "
+            f"{summary['created']} created, {summary['updated']} updated"
+        )
+        return summary
+    
+    @staticmethod
+    def _save_watermark(last_feedback_id: int, db: Session):
+        state = db.get(LearningState, LEARNING_STATE_NAME)
+        if state is None:
+            db.add(LearningState(name=LEARNING_STATE_NAME, last_feedback_id=last_feedback_id))
+        else:
+            state.last_feedback_id = last_feedback_id
+    
+    def _clear_patterns(self, batch_size: int):
+        """
+        Reset the watermark, then drop the patterns a batch per write job
+        (per-row deletes so the materialized pattern counter stays right)
+        """
+        self._write(partial(self._save_watermark, 0))
+        while ids := [
+            row.id for row in self.db.query(LearningPattern.id).order_by(LearningPattern.id).limit(batch_size)
+        ]:
+            self._write(partial(self._delete_patterns, ids))
+    
+    @staticmethod
+    def _delete_patterns(ids: List[int], db: Session):
+        for pattern in db.query(LearningPattern).filter(LearningPattern.id.in_(ids)):
+            db.delete(pattern)
+    
+    def _apply_batch(self, rows, last_feedback_id: int, db: Session) -> Tuple[int, int]:
+        """Write job: merge one batch into the patterns and advance the watermark"""
+        result = self._upsert_patterns(db, rows)
+        self._save_watermark(last_feedback_id, db)
+        return result
+    
+    def _rated_feedback(self, after_id: int, up_to: int, limit: int):
+        """Next batch of clearly good or bad feedback with its output and prompt"""
+        return self.db.query(
+            Feedback.id, Feedback.rating, Feedback.comments, Feedback.output_id,
+            ModelOutput.language, ModelOutput.generated_code, Prompt.prompt_text
+        ).join(
+            ModelOutput, ModelOutput.id == Feedback.output_id
+        ).join(
+            Prompt, ModelOutput.prompt_id == Prompt.id
+        ).filter(
+            Feedback.id > after_id,
+            Feedback.id <= up_to,
+            or_(Feedback.rating >= 4, Feedback.rating <= 2)
+        ).order_by(
+            Feedback.id
+        ).limit(limit).all()
+    
+    @staticmethod
+    def _index_prompts(rows) -> int:
+        return prompt_index.add_many(
+            (row.output_id, row.prompt_text, row.language, row.rating) for row in rows
+        )
+    
+    def _backfill_prompt_index(self, up_to: int, batch_size: int):
+        """Index the prompts of feedback the patterns already cover"""
+        after_id = 0
+        while rows := self._rated_feedback(after_id, up_to, batch_size):
+            self._index_prompts(rows)
+            after_id = rows[-1].id
+        prompt_index.save()
+    
+    @staticmethod
+    def _upsert_patterns(db: Session, rows) -> Tuple[int, int]:
+        """Merge one batch of rated outputs into their patterns"""
+        groups: Dict[Tuple[str, str, str], List] = {}
+        keywords_by_key = {}
+        for row in rows:
+            pattern_type = 'successful' if row.rating >= 4 else 'failed'
+            keywords = prompt_keywords(row.prompt_text, row.language)
+            key = (row.language, pattern_type, pattern_signature(keywords))
+            groups.setdefault(key, []).append(row)
+            keywords_by_key[key] = keywords
         
-        for pattern_data in problematic:
-            new_pattern = LearningPattern(
-                language=pattern_data['language'],
-                pattern_type='failed',
-                pattern_description=f"Low-rated pattern: {pattern_data.get('comments', 'No comment')[:100]}",
-                prompt_keywords=pattern_data['prompt'][:200],
-                code_snippet=pattern_data['code_snippet'],
-                avg_rating=pattern_data['rating'],
-                confidence_score=0.7
+        existing = {
+            (p.language, p.pattern_type, p.signature): p
+            # Every column of the unique key, so ux_learning_patterns_signature
+            # answers the lookup (a superset of the keys; matched by key below)
+            for p in db.query(LearningPattern).filter(
+                LearningPattern.language.in_({language for language, _, _ in groups}),
+                LearningPattern.pattern_type.in_({pattern_type for _, pattern_type, _ in groups}),
+                LearningPattern.signature.in_({sig for _, _, sig in groups})
             )
-            self.db.add(new_pattern)
+        }
         
-        self.db.commit()
-        print(f"✅ Updated learning patterns: {len(successful)} successful, {len(problematic)} problematic")
+        created = updated = 0
+        now = datetime.utcnow()
+        for key, group in groups.items():
+            language, pattern_type, signature = key
+            pattern = existing.get(key)
+            if pattern is None:
+                pattern = LearningPattern(
+                    language=language,
+                    pattern_type=pattern_type,
+                    signature=signature,
+                    prompt_keywords=json.dumps(keywords_by_key[key]),
+                    occurrence_count=0,
+                    avg_rating=0.0
+                )
+                db.add(pattern)
+                created += 1
+            else:
+                updated += 1
+            
+            for row in group:
+                count = pattern.occurrence_count or 0
+                previous_avg = pattern.avg_rating or 0.0
+                # Keep the best-rated example for successful patterns, the latest for failures
+                if pattern_type == 'failed' or pattern.code_snippet is None or row.rating >= previous_avg:
+                    pattern.code_snippet = row.generated_code[:500]
+                pattern.avg_rating = (previous_avg * count + row.rating) / (count + 1)
+                pattern.occurrence_count = count + 1
+            
+            base = 0.55 if pattern_type == 'successful' else 0.65
+            pattern.confidence_score = min(base + 0.05 * pattern.occurrence_count, 1.0)
+            pattern.last_updated = now
+            if pattern_type == 'successful':
+                pattern.pattern_description = (
+                    f"High-rated {language} code pattern: {' '.join(keywords_by_key[key])}"
+                )
+            else:
+                pattern.pattern_description = f"Low-rated pattern: {(group[-1].comments or 'No comment')[:100]}"
+        
+        return created, updated
     
-    def get_language_suggestions(self, language: str) -> List[str]:
-        """Get suggestions for improving code in a specific language"""
+    def similar_generations(self, prompt: str, language: str, k: int = 3, min_score: float = 0.2) -> List[Dict]:
+        """Highly rated past generations whose prompts are most similar to this one"""
+        matches = prompt_index.search(prompt, k=k, language=language, min_rating=4, min_score=min_score)
+        if not matches:
+            return []
+        prompts = dict(self.db.query(ModelOutput.id, Prompt.prompt_text).join(
+            Prompt, ModelOutput.prompt_id == Prompt.id
+        ).filter(
+            ModelOutput.id.in_([match["output_id"] for match in matches])
+        ).all())
+        return [
+            {**match, "prompt": prompts[match["output_id"]]}
+            for match in matches if match["output_id"] in prompts
+        ]
+    
+    def get_language_suggestions(self, language: str, prompt: Optional[str] = None) -> List[str]:
+        """Get suggestions for improving code in a specific language (and prompt, if given)"""
+        suggestions = []
+        
+        # Closest highly rated generations for this prompt
+        if prompt:
+            for match in self.similar_generations(prompt, language):
+                suggestions.append(
+                    f"✨ A similar request was rated {match['rating']:.1f}/5: "
+                    f"\"{match['prompt'][:100]}\""
+                )
+        
         # Get successful patterns for this language
         patterns = self.db.query(LearningPattern).filter(
             and_(
@@ -203,7 +431,6 @@ class FeedbackLearningEngine:
             desc(LearningPattern.confidence_score)
         ).limit(5).all()
         
-        suggestions = []
         for pattern in patterns:
             suggestions.append(
                 f"✨ Based on {pattern.occurrence_count} successful generations, "
@@ -245,13 +472,18 @@ class FeedbackLearningEngine:
         }
 
 
-def run_learning_cycle(db_session: Session):
-    """Run a complete learning cycle - call this periodically"""
+def run_learning_cycle(db_session: Session, full: bool = False,
+                       write: Optional[Callable[[Callable[[Session], T]], T]] = None):
+    """
+    Run a complete learning cycle - call this periodically.
+    Reads run on db_session; pattern writes go through write (see
+    FeedbackLearningEngine), one job per batch.
+    """
     print("\n" + "="*60)
     print("🧠 STARTING FEEDBACK LEARNING CYCLE")
     print("="*60)
     
-    engine = FeedbackLearningEngine(db_session)
+    engine = FeedbackLearningEngine(db_session, write=write)
     
     # Analyze trends
     trends = engine.analyze_feedback_trends()
@@ -261,11 +493,12 @@ def run_learning_cycle(db_session: Session):
     print(f"   Positive: {trends['overall']['positive_count']}")
     print(f"   Negative: {trends['overall']['negative_count']}")
     
-    # Update patterns
-    engine.update_learning_patterns()
+    # Update patterns (only feedback newer than the last run, unless full)
+    patterns_update = engine.update_learning_patterns(full=full)
     
     # Generate report
     report = engine.get_performance_report()
+    report["patterns_update"] = patterns_update
     
     print("\n✅ Learning cycle complete!")
     print("="*60 + "\n")
@@ -0,0 +1,212 @@
+"""
+Few-Shot Prompt Augmentation
+Packs highly rated past generations for similar prompts into the system
+prompt, under a fixed token budget.
+
+Examples come from the prompt vector index (4-5 star outputs in the same
+language, most similar prompt first). Each example block is rendered and
+token-counted once per output and kept in an LRU; the packed result is
+cached per (language, prompt) for a short TTL. A repeated prompt therefore
+costs one dictionary lookup, and a new prompt one index search plus at most
+one small query for snippets not seen before.
+"""
+
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+
+from backend.database.connection import SessionLocal
+from backend.learning.vector_index import prompt_index
+from backend.models.database_models import ModelOutput, Prompt
+
+HEADER = "Here are highly rated solutions to similar requests. Follow their style where it fits:"
+
+
+def count_tokens(text: str) -> int:
+    """Token estimate used for budgets (~4 characters per token, as for rate limiting)"""
+    return (len(text) + 3) // 4
+
+
+class _LRU:
+    """Small thread-safe LRU with an optional TTL"""
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self.ttl_seconds and entry[0] < time.monotonic()):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl_seconds or 0), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class FewShotAugmenter:
+    """Retrieves and packs few-shot examples for a generation request"""
+
+    def __init__(
+        self,
+        token_budget: int = 600,
+        max_examples: int = 3,
+        min_score: float = 0.3,
+        snippet_chars: int = 1200,
+        cache_entries: int = 2048,
+        cache_ttl_seconds: float = 300,
+        enabled: bool = False,
+        session_factory=None
+    ):
+        self.token_budget = token_budget
+        self.max_examples = max_examples
+        self.min_score = min_score
+        self.snippet_chars = snippet_chars
+        self.enabled = enabled
+        self.session_factory = session_factory or SessionLocal
+
+        self._packed = _LRU(cache_entries, cache_ttl_seconds)  # (language, prompt) -> augmentation
+        self._blocks = _LRU(cache_entries * 4)                 # output id -> (block, tokens)
+
+        self.requests = 0
+        self.augmented = 0
+        self.overhead_tokens = 0
+        self.retrieval_ms = 0.0
+
+    def should_use(self, requested: Optional[bool] = None) -> bool:
+        return requested if requested is not None else self.enabled
+
+    def _load_blocks(self, output_ids: List[int]) -> Dict[int, tuple]:
+        """Rendered example block and its token count per output (cached)"""
+        blocks, missing = {}, []
+        for output_id in output_ids:
+            cached = self._blocks.get(output_id)
+            if cached is None:
+                missing.append(output_id)
+            else:
+                blocks[output_id] = cached
+        if missing:
+            db = self.session_factory()
+            try:
+                rows = db.execute(
+                    select(ModelOutput.id, ModelOutput.generated_code, Prompt.prompt_text)
+                    .join(Prompt, ModelOutput.prompt_id == Prompt.id)
+                    .where(ModelOutput.id.in_(missing), ModelOutput.success.is_(True))
+                ).all()
+            finally:
+                db.close()
+            for output_id, code, prompt_text in rows:
+                if not code:
+                    continue
+                block = f"### Request: {prompt_text.strip()[:200]}\n{code.strip()[:self.snippet_chars]}"
+                blocks[output_id] = (block, count_tokens(block))
+                self._blocks.set(output_id, blocks[output_id])
+        return blocks
+
+    def _build(self, prompt: str, language: str) -> Dict:
+        matches = prompt_index.search(
+            prompt, k=self.max_examples * 2, language=language, min_rating=4, min_score=self.min_score
+        )
+        blocks = self._load_blocks([match["output_id"] for match in matches]) if matches else {}
+
+        # Greedy packing, most similar first; skip examples that do not fit
+        remaining = self.token_budget - count_tokens("\n\n" + HEADER)
+        chosen, used_ids = [], []
+        for match in matches:
+            block = blocks.get(match["output_id"])
+            if block is None or block[1] + 1 > remaining:
+                continue
+            chosen.append(block[0])
+            used_ids.append(match["output_id"])
+            remaining -= block[1] + 1
+            if len(chosen) == self.max_examples:
+                break
+
+        if not chosen:
+            return {"examples": None, "tokens": 0, "output_ids": []}
+        text = "\n\n".join([HEADER, *chosen])
+        return {"examples": text, "tokens": count_tokens("\n\n" + text), "output_ids": used_ids}
+
+    def _record(self, result: Dict, cached: bool, start: float) -> Dict:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.requests += 1
+        self.retrieval_ms += elapsed_ms
+        if result["examples"]:
+            self.augmented += 1
+            self.overhead_tokens += result["tokens"]
+        return {**result, "cached": cached, "retrieval_ms": round(elapsed_ms, 3)}
+
+    def augment(self, prompt: str, language: str) -> Dict:
+        """
+        Few-shot context for a request: {"examples", "tokens", "output_ids",
+        "cached", "retrieval_ms"}. "tokens" is the prompt-token overhead.
+        """
+        start = time.perf_counter()
+        result = self._packed.get((language, prompt))
+        cached = result is not None
+        if not cached:
+            result = self._build(prompt, language)
+            self._packed.set((language, prompt), result)
+        return self._record(result, cached, start)
+
+    async def augment_async(self, prompt: str, language: str) -> Dict:
+        """Like augment(); cache hits stay on the event loop, misses run in a thread"""
+        start = time.perf_counter()
+        result = self._packed.get((language, prompt))
+        cached = result is not None
+        if not cached:
+            result = await asyncio.to_thread(self._build, prompt, language)
+            self._packed.set((language, prompt), result)
+        return self._record(result, cached, start)
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "token_budget": self.token_budget,
+            "requests": self.requests,
+            "augmented": self.augmented,
+            "avg_overhead_tokens": self.overhead_tokens / self.augmented if self.augmented else 0.0,
+            "avg_retrieval_ms": self.retrieval_ms / self.requests if self.requests else 0.0,
+            "cache_hits": self._packed.hits,
+            "cache_misses": self._packed.misses,
+            "snippet_cache_hits": self._blocks.hits,
+        }
+
+
+def create_few_shot_augmenter() -> FewShotAugmenter:
+    """
+    Build the augmenter from environment settings:
+        FEW_SHOT_ENABLED         true = augment every request (per request: "few_shot")
+        FEW_SHOT_TOKEN_BUDGET    maximum prompt tokens added per request (default 600)
+        FEW_SHOT_MAX_EXAMPLES    examples per request (default 3)
+        FEW_SHOT_MIN_SCORE       minimum prompt similarity of an example (default 0.3)
+        FEW_SHOT_CACHE_TTL       seconds a packed result is reused (default 300)
+    """
+    return FewShotAugmenter(
+        token_budget=int(os.getenv("FEW_SHOT_TOKEN_BUDGET", "600")),
+        max_examples=int(os.getenv("FEW_SHOT_MAX_EXAMPLES", "3")),
+        min_score=float(os.getenv("FEW_SHOT_MIN_SCORE", "0.3")),
+        cache_ttl_seconds=float(os.getenv("FEW_SHOT_CACHE_TTL", "300")),
+        enabled=os.getenv("FEW_SHOT_ENABLED", "false").lower() == "true"
+    )
+
+
+# Singleton instance
+few_shot = create_few_shot_augmenter()
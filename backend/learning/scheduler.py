@@ -0,0 +1,293 @@
+"""
+Learning Scheduler
+Runs learning cycles in the background instead of inside a request.
+
+Cycles are started on a fixed interval, once enough new feedback has
+arrived, or on demand through the API. They run in a worker thread so the
+event loop keeps serving requests, reading on their own session and
+handing each batch of pattern updates to the writer as a short job. A
+lease row in `job_leases` makes sure only one cycle runs at a time across
+all uvicorn workers sharing the database; every batch job renews it and
+fails if another worker has taken it over. Every run is recorded in
+`learning_jobs` with its status, duration and report, so any worker can
+answer status queries.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from backend.database.connection import get_db_session, db_writer
+from backend.learning.feedback_engine import run_learning_cycle, LEARNING_STATE_NAME
+from backend.models.database_models import Feedback, JobLease, LearningJob, LearningState
+
+LEASE_NAME = "learning_cycle"
+
+
+class LearningScheduler:
+    """Interval / feedback-count triggered learning cycles with a cross-process lease"""
+
+    def __init__(
+        self,
+        interval_seconds: float = 3600,
+        feedback_threshold: int = 100,
+        poll_seconds: float = 30,
+        min_gap_seconds: float = 60,
+        lease_seconds: float = 900,
+        enabled: bool = True
+    ):
+        self.interval_seconds = interval_seconds
+        self.feedback_threshold = feedback_threshold
+        self.poll_seconds = poll_seconds
+        self.min_gap_seconds = min_gap_seconds  # Between automatic runs (e.g. after a failure)
+        self.lease_seconds = lease_seconds
+        self.enabled = enabled
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="learning")
+        self._task: Optional[asyncio.Task] = None
+        self._active_job: Optional[str] = None  # Queued or running in this process
+        self._last_run = time.monotonic()
+
+    # ------------------------------------------------------------------
+    # Lease
+    # ------------------------------------------------------------------
+
+    def _acquire_lease(self, db) -> bool:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        result = db.execute(
+            update(JobLease).where(
+                JobLease.name == LEASE_NAME,
+                (JobLease.expires_at < now) | (JobLease.owner == self.owner)
+            ).values(owner=self.owner, acquired_at=now, expires_at=expires_at)
+        )
+        if result.rowcount:
+            return True
+        try:
+            with db.begin_nested():
+                db.add(JobLease(name=LEASE_NAME, owner=self.owner, acquired_at=now, expires_at=expires_at))
+            return True
+        except IntegrityError:
+            return False  # Held by another worker
+
+    def _renew_lease(self, db) -> bool:
+        """Extend the lease if this worker still holds it"""
+        result = db.execute(
+            update(JobLease).where(
+                JobLease.name == LEASE_NAME, JobLease.owner == self.owner
+            ).values(expires_at=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+        )
+        return bool(result.rowcount)
+
+    def _release_lease(self, db):
+        db.execute(
+            update(JobLease).where(
+                JobLease.name == LEASE_NAME, JobLease.owner == self.owner
+            ).values(expires_at=datetime.utcnow())
+        )
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    def _record(self, job_id: str, **values):
+        def job(db):
+            db.execute(update(LearningJob).where(LearningJob.id == job_id).values(**values))
+        db_writer.run(job)
+
+    def _write_leased(self, job):
+        """
+        Run one batch of the cycle on the writer, renewing the lease in the
+        same transaction; a batch is never committed once the lease was lost
+        """
+        def leased(db):
+            if not self._renew_lease(db):
+                raise RuntimeError("Learning lease was taken over by another worker")
+            return job(db)
+        return db_writer.run(leased)
+
+    def _run_job(self, job_id: str, full: bool):
+        """Worker thread: take the lease, run the cycle, record the outcome"""
+        if not db_writer.run(self._acquire_lease):
+            self._record(job_id, status="skipped", finished_at=datetime.utcnow(),
+                         error="Another worker holds the learning lease")
+            return
+
+        started = time.perf_counter()
+        self._record(job_id, status="running", owner=self.owner, started_at=datetime.utcnow())
+        try:
+            with get_db_session() as db:
+                report = run_learning_cycle(db, full=full, write=self._write_leased)
+        except Exception as e:
+            self._record(job_id, status="failed", finished_at=datetime.utcnow(),
+                         duration_ms=int((time.perf_counter() - started) * 1000),
+                         error=f"{type(e).__name__}: {e}")
+            print(f"❌ Learning job {job_id} failed: {e}")
+        else:
+            self._record(job_id, status="succeeded", finished_at=datetime.utcnow(),
+                         duration_ms=int((time.perf_counter() - started) * 1000),
+                         report=json.dumps(report, default=str))
+        finally:
+            db_writer.run(self._release_lease)
+
+    async def enqueue(self, trigger: str = "manual", full: bool = False) -> Dict:
+        """
+        Queue a learning cycle and return its job record. While a job from
+        this process is still queued or running, that job is returned instead.
+        """
+        if self._active_job:
+            existing = await self.get_job(self._active_job)
+            if existing and existing["status"] in ("queued", "running"):
+                return existing
+
+        job_id = uuid.uuid4().hex[:16]
+        record = LearningJob(
+            id=job_id, status="queued", trigger=trigger, full=full,
+            created_at=datetime.utcnow()
+        )
+        await db_writer.run_async(lambda db: db.add(record))
+        self._active_job = job_id
+        self._last_run = time.monotonic()
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._run_job, job_id, full)
+        future.add_done_callback(lambda _: self._finish(job_id))
+        return self._to_dict(record)
+
+    def _finish(self, job_id: str):
+        if self._active_job == job_id:
+            self._active_job = None
+
+    # ------------------------------------------------------------------
+    # Triggers
+    # ------------------------------------------------------------------
+
+    def _new_feedback_count(self) -> int:
+        """Feedback rows above the learning watermark"""
+        with get_db_session() as db:
+            watermark = db.scalar(
+                select(LearningState.last_feedback_id).where(LearningState.name == LEARNING_STATE_NAME)
+            ) or 0
+            return db.scalar(select(func.count(Feedback.id)).where(Feedback.id > watermark)) or 0
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            if self._active_job:
+                continue
+            try:
+                trigger = None
+                since_last = time.monotonic() - self._last_run
+                if self.interval_seconds and since_last >= self.interval_seconds:
+                    trigger = "interval"
+                elif self.feedback_threshold and since_last >= self.min_gap_seconds:
+                    new_feedback = await asyncio.to_thread(self._new_feedback_count)
+                    if new_feedback >= self.feedback_threshold:
+                        trigger = "feedback"
+                if trigger:
+                    await self.enqueue(trigger)
+            except Exception as e:
+                print(f"⚠️ Learning scheduler check failed: {e}")
+
+    def start(self):
+        if self.enabled and (self._task is None or self._task.done()):
+            self._last_run = time.monotonic()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ------------------------------------------------------------------
+    # Status
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _to_dict(job: LearningJob) -> Dict:
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "trigger": job.trigger,
+            "full": bool(job.full),
+            "owner": job.owner,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+            "duration_ms": job.duration_ms,
+            "error": job.error,
+        }
+
+    def _load_job(self, job_id: str) -> Optional[Dict]:
+        with get_db_session() as db:
+            job = db.get(LearningJob, job_id)
+            if job is None:
+                return None
+            result = self._to_dict(job)
+            result["report"] = json.loads(job.report) if job.report else None
+            return result
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self._load_job, job_id)
+
+    def _load_status(self, limit: int) -> Dict:
+        with get_db_session() as db:
+            jobs = db.scalars(
+                select(LearningJob).order_by(LearningJob.created_at.desc()).limit(limit)
+            ).all()
+            lease = db.get(JobLease, LEASE_NAME)
+            return {
+                "scheduler": {
+                    "enabled": self.enabled,
+                    "interval_seconds": self.interval_seconds,
+                    "feedback_threshold": self.feedback_threshold,
+                    "owner": self.owner,
+                },
+                "lease": {
+                    "owner": lease.owner,
+                    "expires_at": lease.expires_at.isoformat(),
+                    "held": lease.expires_at > datetime.utcnow(),
+                } if lease else None,
+                "jobs": [self._to_dict(job) for job in jobs],
+            }
+
+    async def get_status(self, limit: int = 20) -> Dict:
+        return await asyncio.to_thread(self._load_status, limit)
+
+
+def create_learning_scheduler() -> LearningScheduler:
+    """
+    Build the scheduler from environment settings:
+        LEARNING_SCHEDULER_ENABLED        false = only API-triggered runs
+        LEARNING_INTERVAL_SECONDS         run at least this often (default 3600, 0 = off)
+        LEARNING_FEEDBACK_THRESHOLD       run once this much new feedback arrived (default 100, 0 = off)
+        LEARNING_POLL_SECONDS             how often triggers are checked (default 30)
+        LEARNING_MIN_GAP_SECONDS          minimum time between automatic runs (default 60)
+        LEARNING_LEASE_SECONDS            lease lifetime, renewed after every batch (default 900)
+    """
+    return LearningScheduler(
+        interval_seconds=float(os.getenv("LEARNING_INTERVAL_SECONDS", "3600")),
+        feedback_threshold=int(os.getenv("LEARNING_FEEDBACK_THRESHOLD", "100")),
+        poll_seconds=float(os.getenv("LEARNING_POLL_SECONDS", "30")),
+        min_gap_seconds=float(os.getenv("LEARNING_MIN_GAP_SECONDS", "60")),
+        lease_seconds=float(os.getenv("LEARNING_LEASE_SECONDS", "900")),
+        enabled=os.getenv("LEARNING_SCHEDULER_ENABLED", "true").lower() != "false"
+    )
+
+
+# Singleton instance
+learning_scheduler = create_learning_scheduler()
@@ -0,0 +1,280 @@
+"""
+Prompt Vector Index
+Local similarity search over the prompts of rated generations.
+
+Prompts are embedded as hashed TF-IDF vectors: content words and word
+bigrams are hashed into a fixed number of signed buckets, term counts are
+log-scaled and weighted by inverse document frequency, and the result is
+L2-normalized (stored rows keep the weights from when they were added).
+Search is a single float32 matrix-vector product (cosine
+similarity) followed by a top-k partition; no external service or model.
+
+The index lives in a directory of .npy files opened as memory maps, so a
+restart maps the existing vectors instead of rebuilding them:
+
+  vectors.npy   float32 (capacity, dim)
+  rows.npy      output id, language code, rating sum / count per row
+  df.npy        document frequency per bucket
+  index.json    row count, dimensions, language codes
+"""
+
+import os
+import re
+import json
+import zlib
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from backend.database.connection import DATABASE_DIR
+
+WORD_PATTERN = re.compile(r"[a-z][a-z0-9_+#]+")
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "to", "of", "in", "on", "for", "with", "that", "this",
+    "is", "are", "be", "it", "its", "as", "by", "from", "me", "my", "i", "you", "your",
+    "please", "write", "create", "make", "implement", "generate", "code", "function",
+    "program", "using", "use", "which", "should", "can", "will", "how", "what", "given",
+}
+
+ROW_DTYPE = np.dtype([
+    ("output_id", np.int64),
+    ("language", np.int16),
+    ("rating_sum", np.float32),
+    ("rating_count", np.float32),
+])
+
+
+def prompt_terms(text: str) -> List[str]:
+    """Content words and adjacent word bigrams of a prompt"""
+    words = [w for w in WORD_PATTERN.findall((text or "").lower()) if w not in STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+@lru_cache(maxsize=65536)
+def _bucket(term: str, dim: int) -> Tuple[int, float]:
+    """Stable (bucket, sign) for a term; crc32 is the same in every process"""
+    h = zlib.crc32(term.encode("utf-8"))
+    return h % dim, (1.0 if h & 0x80000000 else -1.0)
+
+
+class PromptVectorIndex:
+    """Append-only hashed TF-IDF index with top-k cosine search"""
+
+    def __init__(self, path: Path, dim: int = 512, initial_capacity: int = 4096):
+        self.path = Path(path)
+        self.dim = dim
+        self.initial_capacity = initial_capacity
+        self._lock = threading.RLock()
+        self._loaded_mtime = None
+        self._reset()
+
+    def _reset(self):
+        self.count = 0
+        self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self.rows = np.zeros(0, dtype=ROW_DTYPE)
+        self.df = np.zeros(self.dim, dtype=np.float64)
+        self.languages: List[str] = []
+        self._language_codes: Dict[str, int] = {}
+        self._positions: Dict[int, int] = {}
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _meta_path(self) -> Path:
+        return self.path / "index.json"
+
+    def _load(self):
+        """Map the files on disk (again if another process has saved since)"""
+        meta_path = self._meta_path()
+        try:
+            mtime = meta_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+
+        meta = json.loads(meta_path.read_text())
+        if meta["dim"] != self.dim:
+            raise ValueError(f"Index at {self.path} has dim {meta['dim']}, expected {self.dim}")
+        self.count = meta["count"]
+        self.languages = meta["languages"]
+        self._language_codes = {name: code for code, name in enumerate(self.languages)}
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r+")
+        self.rows = np.load(self.path / "rows.npy", mmap_mode="r+")
+        self.df = np.load(self.path / "df.npy")
+        self._positions = {int(i): n for n, i in enumerate(self.rows["output_id"][:self.count])}
+        self._loaded_mtime = mtime
+
+    def save(self):
+        """Flush the maps and publish the row count"""
+        with self._lock:
+            if not self.count:
+                return
+            self.vectors.flush()
+            self.rows.flush()
+            np.save(self.path / "df.npy", self.df)
+            meta_path = self._meta_path()
+            tmp_path = meta_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps({
+                "dim": self.dim, "count": self.count, "languages": self.languages
+            }))
+            os.replace(tmp_path, meta_path)
+            self._loaded_mtime = meta_path.stat().st_mtime_ns
+
+    def _grow(self, needed: int):
+        """Reallocate the memory-mapped files with doubled capacity"""
+        capacity = max(needed, 2 * len(self.rows), self.initial_capacity)
+        self.path.mkdir(parents=True, exist_ok=True)
+        for name, shape, dtype, current in (
+            ("vectors", (capacity, self.dim), np.float32, self.vectors),
+            ("rows", (capacity,), ROW_DTYPE, self.rows),
+        ):
+            tmp_path = self.path / f"{name}.tmp.npy"
+            grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+            grown[:self.count] = current[:self.count]
+            grown.flush()
+            del grown
+            os.replace(tmp_path, self.path / f"{name}.npy")
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r+")
+        self.rows = np.load(self.path / "rows.npy", mmap_mode="r+")
+
+    def clear(self):
+        with self._lock:
+            for name in ("index.json", "vectors.npy", "rows.npy", "df.npy"):
+                (self.path / name).unlink(missing_ok=True)
+            self._loaded_mtime = None
+            self._reset()
+
+    # ------------------------------------------------------------------
+    # Vectors
+    # ------------------------------------------------------------------
+
+    def _term_frequencies(self, text: str) -> np.ndarray:
+        tf = np.zeros(self.dim, dtype=np.float64)
+        for term in prompt_terms(text):
+            bucket, sign = _bucket(term, self.dim)
+            tf[bucket] += sign
+        return np.sign(tf) * np.log1p(np.abs(tf))
+
+    def _weighted(self, tf: np.ndarray) -> np.ndarray:
+        idf = np.log((1 + self.count) / (1 + self.df)) + 1
+        vector = (tf * idf).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, text: str) -> np.ndarray:
+        """Query vector with the current document frequencies"""
+        with self._lock:
+            self._load()
+            return self._weighted(self._term_frequencies(text))
+
+    # ------------------------------------------------------------------
+    # Updates and search
+    # ------------------------------------------------------------------
+
+    def add_many(self, items: Iterable[Tuple[int, str, Optional[str], float]]) -> int:
+        """
+        Add (output_id, prompt_text, language, rating) items. A rating for an
+        output that is already indexed is folded into its average instead.
+        Returns the number of new rows; call save() to publish them.
+        """
+        added = 0
+        with self._lock:
+            self._load()
+            for output_id, prompt_text, language, rating in items:
+                position = self._positions.get(output_id)
+                if position is not None:
+                    self.rows["rating_sum"][position] += rating
+                    self.rows["rating_count"][position] += 1
+                    continue
+
+                tf = self._term_frequencies(prompt_text)
+                if not tf.any():
+                    continue
+                if self.count >= len(self.rows):
+                    self._grow(self.count + 1)
+                self.df += tf != 0
+                language = language or "unknown"
+                code = self._language_codes.get(language)
+                if code is None:
+                    code = self._language_codes[language] = len(self.languages)
+                    self.languages.append(language)
+
+                self.vectors[self.count] = self._weighted(tf)
+                self.rows[self.count] = (output_id, code, rating, 1)
+                self._positions[output_id] = self.count
+                self.count += 1
+                added += 1
+        return added
+
+    def search(
+        self,
+        text: str,
+        k: int = 5,
+        language: Optional[str] = None,
+        min_rating: Optional[float] = None,
+        min_score: float = 0.0
+    ) -> List[Dict]:
+        """Top-k indexed outputs by cosine similarity of their prompts"""
+        with self._lock:
+            self._load()
+            if not self.count:
+                return []
+            query = self._weighted(self._term_frequencies(text))
+            if not query.any():
+                return []
+
+            scores = self.vectors[:self.count] @ query
+            rows = self.rows[:self.count]
+            if language is not None:
+                code = self._language_codes.get(language)
+                if code is None:
+                    return []
+                scores[rows["language"] != code] = -np.inf
+            if min_rating is not None:
+                scores[rows["rating_sum"] < min_rating * rows["rating_count"]] = -np.inf
+
+            k = min(k, self.count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {
+                    "output_id": int(rows[i]["output_id"]),
+                    "language": self.languages[rows[i]["language"]],
+                    "rating": float(rows[i]["rating_sum"] / rows[i]["rating_count"]),
+                    "score": float(scores[i]),
+                }
+                for i in top
+                if scores[i] >= min_score and np.isfinite(scores[i])
+            ]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            self._load()
+            return {
+                "path": str(self.path),
+                "dim": self.dim,
+                "rows": self.count,
+                "capacity": len(self.rows),
+                "languages": len(self.languages),
+            }
+
+
+def create_prompt_index() -> PromptVectorIndex:
+    """
+    Build the index from environment settings:
+        PROMPT_INDEX_PATH    directory of the memory-mapped files (default data/prompt_index)
+        PROMPT_INDEX_DIM     hashed dimensions per prompt (default 512)
+    """
+    return PromptVectorIndex(
+        path=Path(os.getenv("PROMPT_INDEX_PATH", str(DATABASE_DIR / "prompt_index"))),
+        dim=int(os.getenv("PROMPT_INDEX_DIM", "512"))
+    )
+
+
+# Singleton instance
+prompt_index = create_prompt_index()
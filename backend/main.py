@@ -3,21 +3,41 @@ FastAPI Backend API
 Main API endpoints for code generation, feedback, and statistics
 """
 
-from fastapi import FastAPI, Depends, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import Response
+from fastapi import FastAPI, Depends, Header, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from typing import Optional, List
-from datetime import datetime
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, ValidationError
+from typing import Dict, Optional, List
+from datetime import datetime, timedelta
 import asyncio
 import json
+import os
+import time
 
-from backend.database.connection import get_db, init_database, get_database_stats
-from backend.services.groq_service import groq_service
-from backend.learning.feedback_engine import FeedbackLearningEngine, run_learning_cycle
+from backend.database.connection import (
+    get_db_session, get_async_db, get_database_stats_async, db_writer,
+    init_database, close_async_engines, reconcile_statistics, AsyncSessionLocal
+)
+from backend.database.write_behind import write_behind
+from backend.services.provider_router import provider_router
+from backend.services.model_catalog import model_catalog
+from backend.services.response_cache import response_cache, make_cache_key
+from backend.services.single_flight import generation_flight, stream_flight, is_deterministic
+from backend.services.batch_scheduler import create_batch_scheduler
+from backend.services.stream_session import StreamSession, create_stream_session, stream_stats
+from backend.services.sse_stream import STREAM_EXPIRED, sse_replay
+from backend.services.rate_limiter import rate_limits
+from backend.services.language_detector import language_detector
+from backend.learning.feedback_engine import FeedbackLearningEngine
+from backend.learning.scheduler import learning_scheduler
+from backend.learning.analytics import feedback_analytics
+from backend.learning.vector_index import prompt_index
+from backend.learning.few_shot import few_shot
 from backend.models.database_models import (
-    Prompt, ModelOutput, Feedback, UserProfile, LearningPattern
+    Prompt, ModelOutput, Feedback, UserProfile, LearningPattern,
+    StatCounter, RatingAggregate
 )
 
 # Initialize FastAPI app
@@ -27,6 +47,12 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Upper bound on items accepted by /api/generate/batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+
+# Upper bound on the days / rolling_days window of /api/analytics
+ANALYTICS_MAX_DAYS = int(os.getenv("ANALYTICS_MAX_DAYS", "366"))
+
 # CORS middleware for frontend communication
 app.add_middleware(
     CORSMiddleware,
@@ -54,6 +80,10 @@ class CodeGenerationRequest(BaseModel):
     temperature: float = 0.3
     max_tokens: int = 1000
     user_id: Optional[int] = None
+    cache: Optional[bool] = None  # Default: cached only when temperature == 0
+    hedge: Optional[bool] = None  # Race a duplicate request when the primary is slow
+    durable: Optional[bool] = None  # Wait for the rows to be committed (default: WRITE_BEHIND_DURABLE)
+    few_shot: Optional[bool] = None  # Add rated examples for similar prompts (default: FEW_SHOT_ENABLED)
 
 
 class CodeGenerationResponse(BaseModel):
@@ -64,6 +94,17 @@ class CodeGenerationResponse(BaseModel):
     generation_time_ms: int
     prompt_id: int
     output_id: int
+    provider: Optional[str] = None
+    cached: bool = False
+    coalesced: bool = False  # Shared an in-flight upstream call with an identical request
+    hedged: bool = False
+    prompt_token_overhead: int = 0  # Estimated prompt tokens added by few-shot examples
+    few_shot_examples: List[int] = []  # Output ids used as examples
+
+
+class BatchGenerationRequest(BaseModel):
+    items: List[CodeGenerationRequest]
+    max_concurrency: Optional[int] = None  # Capped by BATCH_MAX_CONCURRENCY
 
 
 class FeedbackRequest(BaseModel):
@@ -86,6 +127,7 @@ class LanguageDetectionRequest(BaseModel):
 class LanguageDetectionResponse(BaseModel):
     detected_language: str
     confidence: float
+    scores: Dict[str, float] = {}
 
 
 class StatisticsResponse(BaseModel):
@@ -96,6 +138,8 @@ class StatisticsResponse(BaseModel):
     learning_patterns: int
     avg_rating: float
     model_performance: List[dict]
+    language_performance: List[dict] = []
+    daily: List[dict] = []
 
 
 # ============================================================================
@@ -104,35 +148,215 @@ class StatisticsResponse(BaseModel):
 
 def detect_language_from_prompt(prompt: str) -> str:
     """Detect programming language from prompt text"""
-    prompt_lower = prompt.lower()
-    
-    language_keywords = {
-        'python': ['python', 'django', 'flask', 'pandas', 'numpy', 'fastapi'],
-        'javascript': ['javascript', 'js', 'node', 'nodejs', 'react', 'vue', 'angular', 'express'],
-        'typescript': ['typescript', 'ts', 'angular', 'nest'],
-        'java': ['java', 'spring', 'maven', 'gradle'],
-        'cpp': ['c++', 'cpp'],
-        'csharp': ['c#', 'csharp', '.net', 'dotnet', 'asp.net'],
-        'rust': ['rust', 'cargo'],
-        'go': ['go', 'golang'],
-        'php': ['php', 'laravel', 'symfony'],
-        'ruby': ['ruby', 'rails'],
+    return language_detector.detect(prompt)["language"]
+
+
+async def find_near_duplicate(request: CodeGenerationRequest) -> Optional[dict]:
+    """Highly rated past generation for a near-identical prompt, as a cache hit"""
+    matches = await asyncio.to_thread(
+        prompt_index.search, request.prompt, 1, request.language, 4,
+        response_cache.near_duplicate_threshold
+    )
+    if not matches:
+        return None
+    
+    async with AsyncSessionLocal() as db:
+        output = await db.get(ModelOutput, matches[0]["output_id"])
+    if output is None or not output.success:
+        return None
+    
+    response_cache.near_hits += 1
+    return {
+        "code": output.generated_code,
+        "raw_output": output.raw_output,
+        "model": output.model_name,
+        "success": True,
+        "error": None,
+        "cached": True,
+        "near_duplicate_of": output.id
     }
+
+
+async def run_generation(request: CodeGenerationRequest) -> dict:
+    """
+    Produce a generation result for a request: response cache first, then
+    one shared upstream call per identical in-flight deterministic request
+    """
+    lookup_start = time.time()
+    model = provider_router.select_best_model()
+    use_few_shot = few_shot.should_use(request.few_shot)
+    hedge = provider_router.hedging if request.hedge is None else request.hedge
+    request_key = make_cache_key(
+        request.prompt, request.language, model, request.temperature, request.max_tokens,
+        few_shot=use_few_shot, hedge=hedge
+    )
+    
+    # Serve deterministic requests from the response cache when possible
+    use_cache = response_cache.should_use(request.temperature, request.cache)
+    if use_cache:
+        hit = await response_cache.get_async(request_key)
+        if hit:
+            return {
+                **hit,
+                "success": True,
+                "time_ms": int((time.time() - lookup_start) * 1000),
+                "error": None,
+                "cached": True
+            }
+        if response_cache.near_duplicate_threshold:
+            near = await find_near_duplicate(request)
+            if near:
+                return {**near, "time_ms": int((time.time() - lookup_start) * 1000)}
+    
+    async def generate():
+        # Optional few-shot context from highly rated generations for similar prompts
+        augmentation = None
+        if use_few_shot:
+            augmentation = await few_shot.augment_async(request.prompt, request.language)
+        
+        # Generate code on the fastest healthy provider (async, never blocks the event loop)
+        generated = await provider_router.generate_code_async(
+            prompt=request.prompt,
+            language=request.language,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens,
+            hedge=hedge,
+            examples=augmentation["examples"] if augmentation else None
+        )
+        if use_cache:
+            response_cache.set(request_key, generated)
+        if augmentation:
+            generated = {
+                **generated,
+                "prompt_token_overhead": augmentation["tokens"],
+                "few_shot_examples": augmentation["output_ids"]
+            }
+        return generated
+    
+    # Sampled requests each get their own answer; identical concurrent
+    # deterministic requests share one upstream call, cached or not
+    if not is_deterministic(request.temperature):
+        return {**await generate(), "coalesced": False}
+    result, coalesced = await generation_flight.do(request_key, generate)
+    return {**result, "coalesced": coalesced}
+
+
+async def insert_record(record) -> int:
+    """Insert one row in its own transaction (on the database writer) and return its primary key"""
+    def insert(db) -> int:
+        db.add(record)
+        db.flush()
+        return record.id
+    
+    return await db_writer.run_async(insert)
+
+
+def build_prompt_record(request: CodeGenerationRequest, prompt_id: Optional[int] = None) -> Prompt:
+    """Prompt row for a generation request"""
+    return Prompt(
+        id=prompt_id,
+        user_id=request.user_id,
+        prompt_text=request.prompt,
+        detected_language=request.language,
+        created_at=datetime.utcnow()
+    )
+
+
+def build_output_record(
+    prompt_id: Optional[int],
+    request: CodeGenerationRequest,
+    result: dict,
+    output_id: Optional[int] = None
+) -> ModelOutput:
+    """ModelOutput row for a generation result"""
+    return ModelOutput(
+        id=output_id,
+        prompt_id=prompt_id,
+        model_name=result['model'] or 'unknown',
+        generated_code=result['code'],
+        raw_output=result['raw_output'],
+        language=request.language,
+        generation_time_ms=result['time_ms'],
+        temperature=request.temperature,
+        created_at=datetime.utcnow(),
+        success=result['success'],
+        error_message=result['error'],
+        cached=result.get('cached', False),
+        hedged=result.get('hedged', False)
+    )
+
+
+async def persist_generation(request: CodeGenerationRequest, result: dict) -> Dict[str, int]:
+    """Write the Prompt/ModelOutput rows of a finished generation (write-behind, like /api/generate)"""
+    prompt_id, = await write_behind.allocate(Prompt)
+    output_id, = await write_behind.allocate(ModelOutput)
+    await write_behind.add(
+        build_prompt_record(request, prompt_id),
+        build_output_record(prompt_id, request, result, output_id),
+        durable=request.durable
+    )
+    return {"prompt_id": prompt_id, "output_id": output_id}
+
+
+def open_stream_session(request: CodeGenerationRequest) -> StreamSession:
+    """
+    Streaming session for a request (identical concurrent deterministic
+    streams share one upstream call; sampled streams get their own)
+    """
+    stream_key = None
+    if is_deterministic(request.temperature):
+        model = provider_router.select_best_model()
+        stream_key = make_cache_key(
+            request.prompt, request.language, model, request.temperature, request.max_tokens
+        )
     
-    for language, keywords in language_keywords.items():
-        if any(keyword in prompt_lower for keyword in keywords):
-            return language
+    def open_stream():
+        return provider_router.stream_generate_async(
+            request.prompt, request.language, temperature=request.temperature, max_tokens=request.max_tokens
+        )
     
-    return 'python'  # Default
+    return create_stream_session(stream_key, open_stream)
+
+
+async def persisted_frames(request: CodeGenerationRequest, session: StreamSession):
+    """
+    A session's frames (WebSocket and SSE). The rows are written before the
+    final frame, which carries their IDs and the stream timing.
+    """
+    async for frame in session.frames():
+        if session.done:
+            timing = session.timing()
+            frame = {
+                **frame,
+                "ttft_ms": timing["ttft_ms"],
+                "tokens": timing["tokens"],
+                "tokens_per_second": timing["tokens_per_second"],
+                **await persist_generation(request, session.result())
+            }
+        yield frame
 
 
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
 
+def report_providers():
+    """Log provider availability once the background warm-up has loaded the catalog"""
+    catalog = model_catalog.snapshot()
+    is_available, models = catalog["ready"], catalog["models"]
+    if is_available:
+        print(f"\n✅ Provider API is available! (warm-up {model_catalog.warm_up_ms} ms)")
+        if models:
+            print(f"📋 Available models: {', '.join(models)}")
+        best_model = provider_router.select_best_model()
+        print(f"🎯 Selected model: {best_model}")
+    else:
+        print("\n⚠️ No provider API is available! Check GROQ_API_KEY.")
+
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database and check OpenAI on startup"""
+    """Initialize database and start the background provider warm-up"""
     print("\n" + "="*60)
     print("🚀 STARTING AI CODE GENERATOR API")
     print("="*60)
@@ -140,22 +364,30 @@ async def startup_event():
     # Initialize database
     init_database()
     
-    # Check Groq
-    is_available, models = groq_service.check_availability()
-    if is_available:
-        print(f"\n✅ Groq API is available!")
-        if models:
-            print(f"📋 Available models: {', '.join(models)}")
-        best_model = groq_service.select_best_model()
-        print(f"🎯 Selected model: {best_model}")
-    else:
-        print("\n⚠️ Groq API is not available! Check GROQ_API_KEY.")
+    # Background learning cycles (interval / new feedback)
+    learning_scheduler.start()
+    
+    # Warm up providers and load the model catalog in the background (no
+    # network wait before the server accepts requests; /health/ready is 503 until loaded)
+    print(f"\n🔀 Providers: {', '.join(provider_router.providers) or 'none'}")
+    await model_catalog.start(on_loaded=report_providers)
     
     print("\n✅ API Server Ready!")
     print("📡 Swagger Docs: http://localhost:8000/docs")
     print("="*60 + "\n")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background work and release pooled database and provider connections"""
+    await model_catalog.stop()
+    await learning_scheduler.stop()
+    await write_behind.close()
+    await asyncio.to_thread(db_writer.stop)  # Finish queued writes
+    await close_async_engines()
+    await provider_router.aclose()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -173,72 +405,70 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    is_available, models = groq_service.check_availability()
+    """Health check endpoint (provider state from the in-memory model catalog)"""
+    catalog = model_catalog.snapshot()
     return {
         "status": "healthy",
-        "groq_available": is_available,
-        "models_available": models,
+        "providers_available": catalog["ready"],
+        "models_available": catalog["models"],
+        "providers": provider_router.get_stats()["providers"],
+        "catalog": catalog["providers"],
         "timestamp": datetime.utcnow().isoformat()
     }
 
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving (no I/O)"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: a provider was reachable at the last catalog refresh (no upstream calls)"""
+    catalog = model_catalog.snapshot()
+    ready = catalog["ready"] and bool(provider_router.rank())
+    return Response(
+        content=json.dumps({
+            "status": "ready" if ready else ("not_ready" if model_catalog.loaded else "warming_up"),
+            "providers": {name: entry["available"] for name, entry in catalog["providers"].items()},
+        }),
+        status_code=200 if ready else 503,
+        media_type="application/json"
+    )
+
+
 @app.post("/api/detect-language", response_model=LanguageDetectionResponse)
 async def detect_language(request: LanguageDetectionRequest):
     """Detect programming language from prompt"""
-    detected = detect_language_from_prompt(request.prompt)
+    detected = language_detector.detect(request.prompt)
     return {
-        "detected_language": detected,
-        "confidence": 0.8  # Simple keyword-based detection
+        "detected_language": detected["language"],
+        "confidence": detected["confidence"],
+        "scores": detected["scores"]
     }
 
 
 @app.post("/api/generate", response_model=CodeGenerationResponse)
-async def generate_code(
-    request: CodeGenerationRequest,
-    db: Session = Depends(get_db)
-):
+async def generate_code(request: CodeGenerationRequest):
     """Generate code from prompt"""
     
     # Detect language if not provided
     if not request.language:
         request.language = detect_language_from_prompt(request.prompt)
     
-    # Save prompt to database
-    prompt_record = Prompt(
-        user_id=request.user_id,
-        prompt_text=request.prompt,
-        detected_language=request.language,
-        created_at=datetime.utcnow()
-    )
-    db.add(prompt_record)
-    db.commit()
-    db.refresh(prompt_record)
+    # Save prompt to database (write-behind: IDs now, rows in the next batched flush)
+    prompt_id, = await write_behind.allocate(Prompt)
+    await write_behind.add(build_prompt_record(request, prompt_id), durable=False)
     
-    # Generate code using Groq Mistral
-    result = groq_service.generate_code(
-        prompt=request.prompt,
-        language=request.language,
-        temperature=request.temperature,
-        max_tokens=request.max_tokens
-    )
+    result = await run_generation(request)
     
-    # Save output to database
-    output_record = ModelOutput(
-        prompt_id=prompt_record.id,
-        model_name=result['model'] or 'unknown',
-        generated_code=result['code'],
-        raw_output=result['raw_output'],
-        language=request.language,
-        generation_time_ms=result['time_ms'],
-        temperature=request.temperature,
-        created_at=datetime.utcnow(),
-        success=result['success'],
-        error_message=result['error']
+    # Save output to database; durable requests wait for the commit
+    output_id, = await write_behind.allocate(ModelOutput)
+    await write_behind.add(
+        build_output_record(prompt_id, request, result, output_id),
+        durable=request.durable
     )
-    db.add(output_record)
-    db.commit()
-    db.refresh(output_record)
     
     if not result['success']:
         raise HTTPException(status_code=500, detail=result['error'])
@@ -249,20 +479,161 @@ async def generate_code(
         "language": request.language,
         "model": result['model'],
         "generation_time_ms": result['time_ms'],
-        "prompt_id": prompt_record.id,
-        "output_id": output_record.id
+        "prompt_id": prompt_id,
+        "output_id": output_id,
+        "provider": result.get('provider'),
+        "cached": result.get('cached', False),
+        "coalesced": result.get('coalesced', False),
+        "hedged": result.get('hedged', False),
+        "prompt_token_overhead": result.get('prompt_token_overhead', 0),
+        "few_shot_examples": result.get('few_shot_examples', [])
     }
 
 
+def sse_response(request: CodeGenerationRequest, last_event_id: Optional[str]) -> StreamingResponse:
+    """Start a streamed generation, or resume the one a Last-Event-ID points into"""
+    if last_event_id:
+        resume = sse_replay.resume_point(last_event_id)
+        if resume is None:
+            # 410 stops EventSource from reconnecting; the client starts a new generation
+            raise HTTPException(status_code=410, detail=STREAM_EXPIRED)
+        stream_id, after = resume
+    else:
+        if not request.language:
+            request.language = detect_language_from_prompt(request.prompt)
+        session = open_stream_session(request)
+        stream_id = sse_replay.start(persisted_frames(request, session), session.cancel)
+        after = -1
+    
+    return StreamingResponse(
+        sse_replay.stream(stream_id, after),
+        media_type="text/event-stream",
+        # No caching or proxy buffering: frames must reach the client as they are written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/generate/stream")
+async def generate_code_stream(
+    request: CodeGenerationRequest,
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Stream a generation as Server-Sent Events (HTTP-only clients).
+    
+    Events: start, content, replace, then complete / error / cancelled. The
+    final event carries prompt_id, output_id, ttft_ms and tokens_per_second.
+    Reconnecting with Last-Event-ID continues the same generation.
+    """
+    return sse_response(request, last_event_id)
+
+
+@app.get("/api/generate/stream")
+async def generate_code_stream_get(
+    request: CodeGenerationRequest = Depends(),
+    last_event_id: Optional[str] = Header(None)
+):
+    """Same as POST /api/generate/stream with query parameters (for EventSource)"""
+    return sse_response(request, last_event_id)
+
+
+@app.post("/api/generate/batch")
+async def generate_code_batch(request: BatchGenerationRequest):
+    """
+    Generate code for many prompts in one call.
+    
+    Items are fanned out with bounded concurrency and streamed back as
+    NDJSON, one line per item in completion order, each with its database
+    IDs. An item's Prompt/ModelOutput rows are queued on the write-behind
+    queue as soon as it finishes, so a client that disconnects mid-batch
+    does not lose the finished generations; the final summary line is sent
+    once every row is committed (or dropped: see persist_failed).
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+    
+    items = request.items
+    for item in items:
+        if not item.language:
+            item.language = detect_language_from_prompt(item.prompt)
+    
+    scheduler = create_batch_scheduler(request.max_concurrency)
+    
+    async def stream_results():
+        results = [None] * len(items)
+        prompt_ids = await write_behind.allocate(Prompt, len(items))
+        output_ids = await write_behind.allocate(ModelOutput, len(items))
+        commits = {}
+        
+        async for index, result in scheduler.run(items, run_generation):
+            if isinstance(result, Exception):
+                result = {
+                    "success": False, "code": "", "raw_output": "", "time_ms": 0,
+                    "model": None, "error": str(result)
+                }
+            results[index] = result
+            # Queued before the line is sent: a disconnect at the yield keeps it
+            commits[index] = write_behind.enqueue(
+                build_prompt_record(items[index], prompt_ids[index]),
+                build_output_record(prompt_ids[index], items[index], result, output_ids[index])
+            )
+            yield json.dumps({
+                "type": "result",
+                "index": index,
+                "prompt_id": prompt_ids[index],
+                "output_id": output_ids[index],
+                "success": result['success'],
+                "code": result['code'],
+                "language": items[index].language,
+                "model": result['model'],
+                "provider": result.get('provider'),
+                "generation_time_ms": result['time_ms'],
+                "cached": result.get('cached', False),
+                "prompt_token_overhead": result.get('prompt_token_overhead', 0),
+                "error": result['error']
+            }) + "\n"
+        
+        # The summary is sent once every item's rows are committed; rows the
+        # write-behind queue gave up on are reported instead of failing the stream
+        outcomes = await asyncio.gather(*commits.values(), return_exceptions=True)
+        persist_failed = [
+            {"index": index, "error": str(outcome)}
+            for index, outcome in zip(commits, outcomes)
+            if isinstance(outcome, Exception)
+        ]
+        ids = [
+            {"index": i, "prompt_id": pid, "output_id": oid}
+            for i, (pid, oid) in enumerate(zip(prompt_ids, output_ids))
+        ]
+        
+        succeeded = sum(1 for r in results if r['success'])
+        yield json.dumps({
+            "type": "summary",
+            "total": len(items),
+            "succeeded": succeeded,
+            "failed": len(items) - succeeded,
+            "ids": ids,
+            "persist_failed": persist_failed
+        }) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
 @app.post("/api/feedback", response_model=FeedbackResponse)
 async def submit_feedback(
     request: FeedbackRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Submit feedback for generated code"""
     
-    # Validate output exists
-    output = db.query(ModelOutput).filter(ModelOutput.id == request.output_id).first()
+    # Validate output exists (it may still be queued or in a flush that is running;
+    # flush() waits behind that flush before committing what is left)
+    output = await db.get(ModelOutput, request.output_id)
+    if not output:
+        await write_behind.flush()
+        output = await db.get(ModelOutput, request.output_id)
     if not output:
         raise HTTPException(status_code=404, detail="Output not found")
     
@@ -278,54 +649,111 @@ async def submit_feedback(
         comments=request.comments,
         created_at=datetime.utcnow()
     )
-    db.add(feedback_record)
-    db.commit()
-    db.refresh(feedback_record)
+    feedback_id = await insert_record(feedback_record)
     
     return {
         "success": True,
         "message": "Feedback submitted successfully",
-        "feedback_id": feedback_record.id
+        "feedback_id": feedback_id
     }
 
 
 @app.get("/api/statistics", response_model=StatisticsResponse)
-async def get_statistics(db: Session = Depends(get_db)):
-    """Get system statistics"""
+async def get_statistics(days: int = 30, db: AsyncSession = Depends(get_async_db)):
+    """Get system statistics (read from the materialized aggregates)"""
     
-    stats = get_database_stats()
+    stats = await get_database_stats_async(db)
     
     # Get average rating
-    from sqlalchemy import func
-    avg_rating = db.query(func.avg(Feedback.rating)).scalar() or 0.0
-    
-    # Get model performance
-    model_perf = db.query(
-        ModelOutput.model_name,
-        func.avg(Feedback.rating).label('avg_rating'),
-        func.count(ModelOutput.id).label('count')
-    ).join(
-        Feedback, ModelOutput.id == Feedback.output_id, isouter=True
-    ).group_by(
-        ModelOutput.model_name
-    ).all()
+    rating = dict((await db.execute(
+        select(StatCounter.name, StatCounter.value).where(
+            StatCounter.name.in_(("rating_sum", "rating_count"))
+        )
+    )).all())
+    avg_rating = rating.get("rating_sum", 0) / rating["rating_count"] if rating.get("rating_count") else 0.0
+    
+    # Get model, language and daily performance
+    cutoff = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
+    aggregates = (await db.scalars(
+        select(RatingAggregate).where(RatingAggregate.scope.in_(("model", "language")))
+    )).all()
+    aggregates += (await db.scalars(
+        select(RatingAggregate).where(
+            RatingAggregate.scope == "day", RatingAggregate.key >= cutoff
+        ).order_by(RatingAggregate.key)
+    )).all()
+    
+    def performance(scope: str, label: str) -> List[dict]:
+        return [
+            {
+                label: row.key,
+                "avg_rating": row.rating_sum / row.rating_count if row.rating_count else 0.0,
+                "count": row.output_count,
+                "ratings": row.rating_count
+            }
+            for row in aggregates if row.scope == scope
+        ]
     
     return {
         **stats,
         "avg_rating": float(avg_rating),
-        "model_performance": [
-            {"model": model, "avg_rating": float(rating or 0), "count": count}
-            for model, rating, count in model_perf
-        ]
+        "model_performance": performance("model", "model"),
+        "language_performance": performance("language", "language"),
+        "daily": performance("day", "day")
+    }
+
+
+@app.get("/api/analytics")
+async def get_analytics(days: int = 30, rolling_days: int = 7):
+    """Dashboard slices computed from the in-memory columnar snapshot"""
+    
+    if not (1 <= days <= ANALYTICS_MAX_DAYS and 1 <= rolling_days <= ANALYTICS_MAX_DAYS):
+        raise HTTPException(
+            status_code=400, detail=f"days and rolling_days must be between 1 and {ANALYTICS_MAX_DAYS}"
+        )
+    return await asyncio.to_thread(feedback_analytics.report, days, rolling_days)
+
+
+@app.post("/api/statistics/reconcile")
+async def reconcile_statistics_endpoint():
+    """Rebuild the materialized statistics from the raw tables"""
+    
+    result = await asyncio.to_thread(reconcile_statistics)
+    return {
+        "success": True,
+        "statistics": result
+    }
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """In-process performance counters for the generation path"""
+    return {
+        "router": provider_router.get_stats(),
+        "model_catalog": model_catalog.get_stats(),
+        "rate_limits": rate_limits.get_stats(),
+        "response_cache": response_cache.get_stats(),
+        "single_flight": generation_flight.get_stats(),
+        "stream_flight": stream_flight.get_stats(),
+        "streams": stream_stats.get_stats(),
+        "sse_replay": sse_replay.get_stats(),
+        "write_behind": write_behind.get_stats(),
+        "prompt_index": prompt_index.get_stats(),
+        "few_shot": few_shot.get_stats()
     }
 
 
+def language_suggestions(language: str, prompt: Optional[str]) -> List[str]:
+    """Vector search plus pattern queries on a reader session (blocking; run off the event loop)"""
+    with get_db_session() as db:
+        return FeedbackLearningEngine(db).get_language_suggestions(language, prompt)
+
+
 @app.get("/api/suggestions/{language}")
-async def get_suggestions(language: str, db: Session = Depends(get_db)):
-    """Get AI suggestions for a specific language"""
+async def get_suggestions(language: str, prompt: Optional[str] = None):
+    """Get AI suggestions for a specific language, led by rated generations similar to `prompt`"""
     
-    engine = FeedbackLearningEngine(db)
-    suggestions = engine.get_language_suggestions(language)
+    suggestions = await asyncio.to_thread(language_suggestions, language, prompt)
     
     return {
         "language": language,
@@ -333,33 +761,69 @@ async def get_suggestions(language: str, db: Session = Depends(get_db)):
     }
 
 
+def feedback_trends(days: int, bucket: Optional[str]) -> dict:
+    """Trend aggregates on a reader session (blocking; run off the event loop)"""
+    with get_db_session() as db:
+        engine = FeedbackLearningEngine(db)
+        series = engine.feedback_trend_buckets(days, bucket) if bucket else None
+        return {
+            **engine.analyze_feedback_trends(days),
+            "buckets": series
+        }
+
+
+@app.get("/api/learning/trends")
+async def get_feedback_trends(days: int = 30, bucket: Optional[str] = None):
+    """Feedback trends (overall, per language, per model); bucket=hour|day adds a chart series"""
+    
+    try:
+        return await asyncio.to_thread(feedback_trends, days, bucket)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/api/learning/run-cycle")
-async def run_learning_cycle_endpoint(db: Session = Depends(get_db)):
-    """Manually trigger a learning cycle"""
+async def run_learning_cycle_endpoint(full: bool = False):
+    """Queue a learning cycle (full=true replays all feedback); poll the job for its report"""
     
-    report = run_learning_cycle(db)
+    job = await learning_scheduler.enqueue("manual", full=full)
     return {
         "success": True,
-        "report": report
+        **job
     }
 
 
+@app.get("/api/learning/jobs")
+async def get_learning_jobs(limit: int = 20):
+    """Recent learning jobs, the lease holder and scheduler settings"""
+    return await learning_scheduler.get_status(limit)
+
+
+@app.get("/api/learning/jobs/{job_id}")
+async def get_learning_job(job_id: str):
+    """Status, duration and report of one learning job"""
+    job = await learning_scheduler.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @app.get("/api/patterns")
 async def get_learning_patterns(
     language: Optional[str] = None,
     pattern_type: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get learning patterns"""
     
-    query = db.query(LearningPattern)
+    query = select(LearningPattern)
     
     if language:
-        query = query.filter(LearningPattern.language == language)
+        query = query.where(LearningPattern.language == language)
     if pattern_type:
-        query = query.filter(LearningPattern.pattern_type == pattern_type)
+        query = query.where(LearningPattern.pattern_type == pattern_type)
     
-    patterns = query.all()
+    patterns = (await db.scalars(query)).all()
     
     return {
         "count": len(patterns),
@@ -382,25 +846,66 @@ async def get_learning_patterns(
 # WEBSOCKET FOR STREAMING
 # ============================================================================
 
+async def stream_to_websocket(websocket: WebSocket, request: CodeGenerationRequest, session: StreamSession):
+    """Send a session's frames until the final one"""
+    connected = True
+    async for frame in persisted_frames(request, session):
+        if not connected:
+            continue
+        try:
+            await websocket.send_json(frame)
+        except Exception:
+            # Client went away: stop the stream, but still record what was generated
+            connected = False
+            session.cancel()
+
+
 @app.websocket("/ws/generate")
 async def websocket_generate(websocket: WebSocket):
-    """WebSocket endpoint for streaming code generation"""
+    """
+    WebSocket endpoint for streaming code generation
+    
+    Send {"prompt", "language", ...} (CodeGenerationRequest fields) to start a
+    generation and {"type": "cancel"} to abort the running one. Deltas arrive
+    coalesced into frames; the final frame carries prompt_id and output_id.
+    """
     await websocket.accept()
+    session = None
+    sender = None
     
     try:
         while True:
-            # Receive request
             data = await websocket.receive_json()
-            prompt = data.get('prompt')
-            language = data.get('language', 'python')
+            if data.get("type") == "cancel":
+                if session is not None:
+                    session.cancel()
+                continue
+            
+            if sender is not None and not sender.done():
+                await websocket.send_json({
+                    "type": "error", "content": "A generation is already streaming; cancel it first"
+                })
+                continue
+            
+            try:
+                request = CodeGenerationRequest(**data)
+            except ValidationError as e:
+                await websocket.send_json({"type": "error", "content": str(e)})
+                continue
+            if not request.language:
+                request.language = detect_language_from_prompt(request.prompt)
             
-            # Stream generation
-            for chunk in groq_service.stream_generate(prompt, language):
-                await websocket.send_json(chunk)
-                await asyncio.sleep(0.01)  # Small delay for smooth streaming
+            # Receiving continues while the frames are sent, so a cancel takes effect mid-stream
+            session = open_stream_session(request)
+            sender = asyncio.create_task(stream_to_websocket(websocket, request, session))
     
     except WebSocketDisconnect:
         print("WebSocket disconnected")
+    finally:
+        if session is not None:
+            session.cancel()
+        if sender is not None:
+            await sender
 
 
 if __name__ == "__main__":
@@ -3,7 +3,7 @@ Database Models - SQLAlchemy ORM
 Defines tables for prompts, outputs, feedback, and user profiles
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -53,6 +53,12 @@ class Prompt(Base):
 class ModelOutput(Base):
     """Stores generated code outputs from Ollama"""
     __tablename__ = 'model_outputs'
+    __table_args__ = (
+        Index('ix_model_outputs_prompt_id', 'prompt_id'),  # Join to prompts
+        Index('ix_model_outputs_model_name', 'model_name'),  # GROUP BY model in /api/statistics
+        Index('ix_model_outputs_language', 'language'),
+        Index('ix_model_outputs_created_at', 'created_at'),  # Late-committed rows in the analytics refresh
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     prompt_id = Column(Integer, ForeignKey('prompts.id'), nullable=False)
@@ -66,6 +72,8 @@ class ModelOutput(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     success = Column(Boolean, default=True)
     error_message = Column(Text, nullable=True)
+    cached = Column(Boolean, default=False)  # Served from the response cache
+    hedged = Column(Boolean, default=False)  # A duplicate hedge request was raced
     
     # Relationships
     prompt = relationship("Prompt", back_populates="outputs")
@@ -78,6 +86,11 @@ class ModelOutput(Base):
 class Feedback(Base):
     """Stores user feedback on generated code"""
     __tablename__ = 'feedback'
+    __table_args__ = (
+        Index('ix_feedback_output_id_rating', 'output_id', 'rating'),  # Covers join + AVG(rating)
+        Index('ix_feedback_created_at_rating', 'created_at', 'rating'),  # Trend windows
+        Index('ix_feedback_rating', 'rating'),  # Top/bottom rated outputs
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     output_id = Column(Integer, ForeignKey('model_outputs.id'), nullable=False)
@@ -104,10 +117,16 @@ class Feedback(Base):
 class LearningPattern(Base):
     """Stores learned patterns from feedback for improvement"""
     __tablename__ = 'learning_patterns'
+    __table_args__ = (
+        Index('ix_learning_patterns_lookup', 'language', 'pattern_type', 'confidence_score'),
+        Index('ix_learning_patterns_recent', 'language', 'pattern_type', 'last_updated'),
+        Index('ux_learning_patterns_signature', 'language', 'pattern_type', 'signature', unique=True),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     language = Column(String(50), nullable=False)
     pattern_type = Column(String(50), nullable=False)  # 'successful', 'failed', 'improvement'
+    signature = Column(String(64), nullable=True)  # Hash of the prompt keywords (upsert key)
     pattern_description = Column(Text, nullable=False)
     prompt_keywords = Column(Text, nullable=True)  # JSON array
     code_snippet = Column(Text, nullable=True)
@@ -120,6 +139,105 @@ class LearningPattern(Base):
         return f"<LearningPattern(id={self.id}, language='{self.language}', type='{self.pattern_type}')>"
 
 
+class LearningState(Base):
+    """Progress markers for incremental jobs (e.g. last feedback seen by the learning cycle)"""
+    __tablename__ = 'learning_state'
+    
+    name = Column(String(100), primary_key=True)
+    last_feedback_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<LearningState(name='{self.name}', last_feedback_id={self.last_feedback_id})>"
+
+
+class LearningJob(Base):
+    """Learning cycle runs queued by the scheduler or the API (see learning/scheduler.py)"""
+    __tablename__ = 'learning_jobs'
+    __table_args__ = (
+        Index('ix_learning_jobs_created_at', 'created_at'),
+    )
+    
+    id = Column(String(32), primary_key=True)
+    status = Column(String(20), nullable=False)  # 'queued', 'running', 'succeeded', 'failed', 'skipped'
+    trigger = Column(String(20), nullable=False)  # 'manual', 'interval', 'feedback'
+    full = Column(Boolean, default=False)
+    owner = Column(String(100), nullable=True)  # host:pid of the worker that ran it
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+    report = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+    
+    def __repr__(self):
+        return f"<LearningJob(id='{self.id}', status='{self.status}')>"
+
+
+class JobLease(Base):
+    """Mutual exclusion for background jobs across API worker processes"""
+    __tablename__ = 'job_leases'
+    
+    name = Column(String(100), primary_key=True)
+    owner = Column(String(100), nullable=False)
+    acquired_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<JobLease(name='{self.name}', owner='{self.owner}')>"
+
+
+class CachedResponse(Base):
+    """Content-addressed cache of generation results (see services/response_cache.py)"""
+    __tablename__ = 'response_cache'
+    
+    cache_key = Column(String(64), primary_key=True)  # SHA-256 of the request tuple
+    payload = Column(Text, nullable=False)  # JSON: code, raw_output, model, time_ms
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=True)
+    hit_count = Column(Integer, default=0)
+    
+    def __repr__(self):
+        return f"<CachedResponse(key='{self.cache_key[:12]}', hits={self.hit_count})>"
+
+
+class StatCounter(Base):
+    """Running totals behind /api/statistics (see database/aggregates.py)"""
+    __tablename__ = 'stat_counters'
+    
+    name = Column(String(50), primary_key=True)  # e.g. total_prompts, rating_sum
+    value = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<StatCounter(name='{self.name}', value={self.value})>"
+
+
+class RatingAggregate(Base):
+    """Output counts and rating sums per model, per language and per day"""
+    __tablename__ = 'rating_aggregates'
+    
+    scope = Column(String(20), primary_key=True)  # 'model', 'language' or 'day'
+    key = Column(String(100), primary_key=True)  # Model name, language or YYYY-MM-DD
+    output_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_count = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<RatingAggregate(scope='{self.scope}', key='{self.key}', outputs={self.output_count})>"
+
+
+class IdAllocation(Base):
+    """High-water mark of primary keys handed out in blocks (see database/write_behind.py)"""
+    __tablename__ = 'id_allocations'
+    
+    table_name = Column(String(100), primary_key=True)
+    next_id = Column(Integer, nullable=False)  # First ID not yet reserved by any process
+    
+    def __repr__(self):
+        return f"<IdAllocation(table='{self.table_name}', next_id={self.next_id})>"
+
+
 class SystemMetrics(Base):
     """Tracks system-wide metrics and performance"""
     __tablename__ = 'system_metrics'
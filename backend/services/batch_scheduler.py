@@ -0,0 +1,84 @@
+"""
+Batch Scheduler
+Bounded-concurrency fan-out for batch generation jobs.
+
+A fixed pool of workers pulls items off the batch, so memory stays flat for
+batches of thousands of items, and an optional request pacing keeps the
+batch under a provider's requests-per-minute quota. Results are yielded in
+completion order together with the index of the item they belong to.
+"""
+
+import os
+import time
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+
+class BatchScheduler:
+    """Run a worker over a list of items with at most max_concurrency in flight"""
+
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: Optional[float] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests_per_minute = requests_per_minute
+        self._next_start = 0.0
+        self._pace_lock = asyncio.Lock()
+
+    async def _pace(self):
+        """Space out request starts evenly to respect requests_per_minute"""
+        if not self.requests_per_minute:
+            return
+        async with self._pace_lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + 60.0 / self.requests_per_minute
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+    async def run(
+        self,
+        items: List[Any],
+        worker: Callable[[Any], Awaitable[Any]]
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        Yield (index, result) as each item completes. A worker exception is
+        yielded as the result instead of aborting the batch.
+        """
+        results: asyncio.Queue = asyncio.Queue()
+        pending = iter(enumerate(items))
+
+        async def run_worker():
+            for index, item in pending:
+                await self._pace()
+                try:
+                    result = await worker(item)
+                except Exception as e:
+                    result = e
+                await results.put((index, result))
+
+        workers = [
+            asyncio.ensure_future(run_worker())
+            for _ in range(min(self.max_concurrency, len(items)))
+        ]
+        try:
+            for _ in range(len(items)):
+                yield await results.get()
+        finally:
+            # The consumer went away (e.g. client disconnected): stop the batch
+            for task in workers:
+                task.cancel()
+
+
+def create_batch_scheduler(max_concurrency: Optional[int] = None) -> BatchScheduler:
+    """
+    Build a scheduler from environment settings:
+        BATCH_MAX_CONCURRENCY       generations in flight per batch (default 8)
+        BATCH_REQUESTS_PER_MINUTE   pace request starts (default: unpaced)
+    """
+    limit = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+    if max_concurrency:
+        limit = min(limit, max_concurrency)
+    rpm = os.getenv("BATCH_REQUESTS_PER_MINUTE")
+    return BatchScheduler(
+        max_concurrency=limit,
+        requests_per_minute=float(rpm) if rpm else None
+    )
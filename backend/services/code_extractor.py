@@ -0,0 +1,244 @@
+"""
+Code Extraction
+Turns a model response (markdown fences, explanations, code) into clean code.
+
+extract_clean_code() works on a complete response and is what
+/api/generate returns. StreamingCodeExtractor produces the same text from
+stream chunks as they arrive: a small state machine tracks whether it is
+before, inside or after a fenced block, filters prose lines outside fences,
+and emits clean code deltas. Each chunk is scanned once, so a whole stream
+costs O(n). When later input changes what the complete response extracts
+to (a larger second block, an unclosed fence, a very short answer), a
+"replace" event carries the full corrected text; after finish() the
+streamed text always equals extract_clean_code() of the whole response.
+"""
+
+import re
+from typing import Dict, List
+
+CODE_BLOCK_PATTERN = re.compile(r'```(?:\w+)?\s*\n(.*?)```', re.DOTALL)
+
+SKIP_PHRASES = [
+    'here is', 'here\'s', 'this code', 'to run', 'to use', 'to save',
+    'you can', 'simply', 'make sure', 'note that', 'explanation',
+    'how to', 'save this', 'run this', 'execute', 'to get started'
+]
+
+CODE_KEYWORDS = [
+    'def ', 'class ', 'function ', 'const ', 'let ', 'var ',
+    'import ', 'from ', '#include', 'public ', 'private ',
+    'fn ', 'func ', 'package ', 'using ', 'namespace '
+]
+
+FENCE = "```"
+FENCE_HEADER = re.compile(r'(?:\w+)?\s*')  # rest of an opening fence line
+
+
+def _is_code_line(line: str) -> bool:
+    """Line kept by the prose filter: no explanation phrase, or code despite one"""
+    line_lower = line.lower().strip()
+    if not any(phrase in line_lower for phrase in SKIP_PHRASES):
+        return True
+    return any(keyword in line for keyword in CODE_KEYWORDS)
+
+
+def _looks_like_code(line: str) -> bool:
+    """Stronger signal used while streaming, before prose lines are released"""
+    stripped = line.strip()
+    return (
+        any(keyword in line for keyword in CODE_KEYWORDS)
+        or line[:1] in (' ', '\t')
+        or stripped[-1:] in (':', ';', '{', '}', '(', ')', '[', ']', ',')
+        or stripped[:1] in ('#', '/', '@', '<', '}')
+    )
+
+
+def extract_clean_code(raw_output: str) -> str:
+    """Extract clean code from a complete model response"""
+    if not raw_output or not raw_output.strip():
+        return ""
+
+    # Remove markdown code blocks if present
+    code_blocks = CODE_BLOCK_PATTERN.findall(raw_output)
+
+    if code_blocks:
+        # Use the largest code block
+        largest_block = max(code_blocks, key=len)
+        return largest_block.strip()
+
+    # Remove common explanation phrases
+    code_lines = []
+    for line in raw_output.split('\n'):
+        # Skip empty lines at the start
+        if not code_lines and not line.strip():
+            continue
+        if _is_code_line(line):
+            code_lines.append(line)
+
+    final_code = '\n'.join(code_lines).strip()
+
+    # If extraction resulted in very short code, return raw output
+    if not final_code or len(final_code) < 10:
+        return raw_output.strip()
+
+    return final_code
+
+
+class _StrippedText:
+    """Appends text as if the result were .strip()ped: leading whitespace is
+    dropped and trailing whitespace is held back until more text follows"""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.length = 0
+        self._started = False
+        self._held = ""
+
+    def append(self, text: str) -> str:
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+        text = self._held + text
+        delta = text.rstrip()
+        self._held = text[len(delta):]
+        if delta:
+            self.parts.append(delta)
+            self.length += len(delta)
+        return delta
+
+    @property
+    def raw_length(self) -> int:
+        return self.length + len(self._held)
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+class StreamingCodeExtractor:
+    """
+    Incremental extract_clean_code(). feed() each chunk and finish() at the
+    end; both return events:
+        {"type": "content", "content": delta}   append to the code so far
+        {"type": "replace", "content": code}    the code so far is now this
+    """
+
+    PREAMBLE = "preamble"  # no fence yet: prose filter over complete lines
+    IN_FENCE = "in_fence"  # inside a fenced block: stream it
+    BETWEEN = "between"    # after a block: wait for another fence
+
+    def __init__(self):
+        self.state = self.PREAMBLE
+        self._chunks: List[str] = []
+        self._pending: List[str] = []      # unscanned tail, kept as parts
+        self._lines = _StrippedText()      # prose-filtered output (no fences)
+        self._held_lines: List[str] = []   # prose lines not released yet
+        self._block: _StrippedText = None  # fenced block being read
+        self._best: _StrippedText = None   # largest closed block
+        self._shown: _StrippedText = None  # what the client currently shows
+        self._emitted: List[str] = []
+
+    def _show(self, source: _StrippedText, delta: str, events: List[Dict]):
+        if source is not self._shown:
+            self._shown = source
+            text = source.text()
+            events.append({"type": "replace" if self._emitted else "content", "content": text})
+            self._emitted = [text] if text else []
+        elif delta:
+            self._emitted.append(delta)
+            events.append({"type": "content", "content": delta})
+
+    def _prose_line(self, line: str, events: List[Dict]):
+        if not self._lines.parts and not self._held_lines and not line.strip():
+            return
+        if not _is_code_line(line):
+            return
+        if not self._lines.parts and not _looks_like_code(line):
+            # Leading prose is only shown once code follows it
+            self._held_lines.append(line)
+            return
+        for held in self._held_lines + [line]:
+            self._show(self._lines, self._lines.append(held + "\n"), events)
+        self._held_lines = []
+
+    def _block_text(self, text: str, events: List[Dict]):
+        delta = self._block.append(text)
+        if self._shown is self._block or (
+            delta and (self._best is None or self._block.raw_length > self._best.raw_length)
+        ):
+            self._show(self._block, delta, events)
+
+    def feed(self, chunk: str) -> List[Dict]:
+        events: List[Dict] = []
+        if not chunk:
+            return events
+        self._chunks.append(chunk)
+        self._pending.append(chunk)
+        if self.state != self.IN_FENCE and "\n" not in chunk:
+            # Outside a fence nothing is decided before the end of the line:
+            # only scan the pending text again once a newline arrives
+            return events
+        text = "".join(self._pending)
+        pos, size = 0, len(text)
+
+        while pos < size:
+            if self.state == self.IN_FENCE:
+                end = text.find(FENCE, pos)
+                if end < 0:
+                    # Hold back trailing backticks that may start the closing fence
+                    end = pos + len(text[pos:].rstrip("`"))
+                    self._block_text(text[pos:end], events)
+                    pos = end
+                    break
+                self._block_text(text[pos:end], events)
+                pos = end + len(FENCE)
+                if self._best is None or self._block.raw_length > self._best.raw_length:
+                    self._best = self._block
+                self._block = None
+                self.state = self.BETWEEN
+                continue
+
+            newline = text.find("\n", pos)
+            start = text.find(FENCE, pos, newline if newline >= 0 else size)
+            if start >= 0:
+                header_end = text.find("\n", start)
+                if header_end < 0:
+                    break  # wait for the rest of the opening line
+                if FENCE_HEADER.fullmatch(text[start + len(FENCE):header_end]):
+                    pos = header_end + 1
+                    self._block = _StrippedText()
+                    self._held_lines = []
+                    self.state = self.IN_FENCE
+                    continue
+            if newline < 0:
+                break
+            if self.state == self.PREAMBLE:
+                self._prose_line(text[pos:newline], events)
+            pos = newline + 1
+
+        self._pending = [text[pos:]] if pos < size else []
+        return events
+
+    def finish(self) -> List[Dict]:
+        """Flush the last partial line and reconcile with extract_clean_code()"""
+        events: List[Dict] = []
+        if self.state == self.PREAMBLE and self._pending:
+            self._prose_line("".join(self._pending), events)
+        self._pending = []
+
+        final = extract_clean_code("".join(self._chunks))
+        if "".join(self._emitted) != final:
+            self._emitted = [final]
+            events.append({"type": "replace", "content": final})
+        return events
+
+    @property
+    def code(self) -> str:
+        """Clean code emitted so far"""
+        return "".join(self._emitted)
+
+    @property
+    def raw_output(self) -> str:
+        """Everything fed so far, unfiltered"""
+        return "".join(self._chunks)
@@ -5,31 +5,58 @@ Handles all interactions with the Groq API for Mistral model
 
 import os
 import time
-import re
+from contextlib import aclosing, asynccontextmanager
 from typing import Dict, List, Tuple, Optional
-from datetime import datetime
-from groq import Groq
 
+from backend.services.provider_base import BaseProvider
+from backend.services.rate_limiter import rate_limits, parse_raw_response
 
-class GroqService:
+
+class GroqService(BaseProvider):
     """Service for interacting with Groq Mistral API"""
 
+    name = "groq"
+    sdk = "groq"  # Imported when the first client is built
+    preferred_models = ("mistral", "mixtral", "llama")
+
     def __init__(self):
+        super().__init__()
         self.api_key = os.getenv("GROQ_API_KEY")
         self.default_model = os.getenv("GROQ_MODEL")
         self.client = None  # Lazy load client
-        self.available_models: List[str] = []
-    
+        self.async_client = None  # Lazy load async client
+
     def _get_client(self):
-        """Lazy load Groq client"""
+        """Lazy load Groq client (on the provider's pooled HTTP client)"""
         if self.client is None and self.api_key:
             try:
-                self.client = Groq(api_key=self.api_key)
+                from groq import Groq
+                self.client = Groq(api_key=self.api_key, http_client=self.http_client())
             except Exception as e:
                 print(f"❌ Failed to initialize Groq client: {e}")
                 return None
         return self.client
 
+    def _get_async_client(self):
+        """Lazy load async Groq client (used by the async request path)"""
+        if self.async_client is None and self.api_key:
+            try:
+                from groq import AsyncGroq
+                # Throttling retries are handled by the rate limiter, not the SDK
+                self.async_client = AsyncGroq(
+                    api_key=self.api_key, max_retries=0, http_client=self.async_http_client()
+                )
+            except Exception as e:
+                print(f"❌ Failed to initialize async Groq client: {e}")
+                return None
+        return self.async_client
+
+    def warm_up(self):
+        """Import the SDK and build both clients ahead of the first request"""
+        if self.api_key:
+            self._get_client()
+            self._get_async_client()
+
     def check_availability(self) -> Tuple[bool, List[str]]:
         """Check if Groq API is reachable"""
         if not self.api_key:
@@ -47,6 +74,22 @@ class GroqService:
             print(f"❌ Groq check error: {e}")
             return False, []
 
+    async def check_availability_async(self) -> Tuple[bool, List[str]]:
+        """Check if Groq API is reachable without blocking the event loop"""
+        if not self.api_key:
+            return False, []
+
+        try:
+            client = self._get_async_client()
+            if client:
+                models = await client.models.list()
+                self.available_models = [m.id for m in models.data]
+                return True, self.available_models
+            return False, []
+        except Exception as e:
+            print(f"❌ Groq check error: {e}")
+            return False, []
+
     def select_best_model(self) -> Optional[str]:
         """Select the best available model for code generation"""
         # If user explicitly set a model, respect it
@@ -54,16 +97,9 @@ class GroqService:
             return self.default_model
 
         # Prefer Mistral/Mixtral if available, otherwise fallback
-        preferred = [
-            "mistral",
-            "mixtral",
-            "llama",
-        ]
-
-        for pref in preferred:
-            for model in self.available_models:
-                if pref in model.lower():
-                    return model
+        ranked = self.chat_models()
+        if ranked:
+            return ranked[0]
 
         if self.available_models:
             return self.available_models[0]
@@ -71,13 +107,52 @@ class GroqService:
         # Fallback if models list is unavailable
         return "llama-3.1-8b-instant"
 
+    def _fallback_model(self, model: Optional[str], error: Exception) -> Optional[str]:
+        """Pick another available model if the selected one does not exist"""
+        from groq import NotFoundError, RateLimitError
+        # Throttling is not a model problem: retrying elsewhere only doubles the load
+        if isinstance(error, RateLimitError):
+            return None
+
+        error_str = str(error)
+        if isinstance(error, NotFoundError) or "model_not_found" in error_str or "model_decommissioned" in error_str:
+            return next(
+                (m for m in self.chat_models() if m != model),
+                None
+            )
+        return None
+
+    async def _create_async(self, client, model: str, messages: List[Dict], **params):
+        """chat.completions.create under the per-model rate limiter"""
+        limiter = rate_limits.get("groq", model)
+        raw = await limiter.run(
+            lambda: client.chat.completions.with_raw_response.create(
+                model=model, messages=messages, **params
+            ),
+            tokens=self._estimate_tokens(messages, params.get("max_tokens") or 0)
+        )
+        return await parse_raw_response(raw)
+
+    @asynccontextmanager
+    async def _stream_async(self, client, model: str, messages: List[Dict], **params):
+        """Streaming _create_async; the rate limiter slot is held until the stream is closed"""
+        limiter = rate_limits.get("groq", model)
+        async with limiter.hold(
+            lambda: client.chat.completions.with_raw_response.create(
+                model=model, messages=messages, stream=True, **params
+            ),
+            tokens=self._estimate_tokens(messages, params.get("max_tokens") or 0)
+        ) as raw:
+            yield await parse_raw_response(raw)
+
     def generate_code(
         self,
         prompt: str,
         language: str,
         model: Optional[str] = None,
         temperature: float = 0.3,
-        max_tokens: int = 1000
+        max_tokens: int = 1000,
+        examples: Optional[str] = None
     ) -> Dict:
         """
         Generate code using Groq Mistral
@@ -85,17 +160,10 @@ class GroqService:
         Returns:
             Dict with keys: success, code, raw_output, time_ms, model, error
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         if not self.api_key:
-            return {
-                "success": False,
-                "code": "",
-                "raw_output": "",
-                "time_ms": 0,
-                "model": None,
-                "error": "GROQ_API_KEY is not set"
-            }
+            return self._error_result("GROQ_API_KEY is not set")
 
         if not self.available_models:
             self.check_availability()
@@ -103,180 +171,138 @@ class GroqService:
         if model is None:
             model = self.select_best_model()
 
-        # Language-specific system prompts
-        system_prompts = {
-            "python": "You are an expert Python developer. Generate clean, efficient Python code following PEP 8 standards.",
-            "javascript": "You are an expert JavaScript developer. Generate modern ES6+ JavaScript code.",
-            "typescript": "You are an expert TypeScript developer. Generate type-safe TypeScript code.",
-            "java": "You are an expert Java developer. Generate clean, object-oriented Java code.",
-            "cpp": "You are an expert C++ developer. Generate modern C++17/20 code.",
-            "rust": "You are an expert Rust developer. Generate safe, idiomatic Rust code.",
-            "go": "You are an expert Go developer. Generate clean, idiomatic Go code.",
-            "csharp": "You are an expert C# developer. Generate clean, modern C# code.",
-        }
-
-        system_prompt = system_prompts.get(
-            language.lower(),
-            f"You are an expert {language} developer. Generate clean, well-documented code."
-        )
+        messages = self._build_messages(prompt, language, examples)
 
         try:
             print(f"🔄 Generating code with {model}...")
 
             client = self._get_client()
             if not client:
-                return {
-                    "success": False,
-                    "code": "",
-                    "raw_output": "",
-                    "time_ms": 0,
-                    "model": None,
-                    "error": "Failed to initialize Groq client"
-                }
+                return self._error_result("Failed to initialize Groq client")
 
             response = client.chat.completions.create(
                 model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"{system_prompt}\n\nIMPORTANT: Return ONLY the code. No explanations, no markdown formatting, no instructions. Just the raw code."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Generate {language} code for: {prompt}\n\nReturn ONLY the code itself. No text before or after."
-                    }
-                ],
+                messages=messages,
                 temperature=temperature,
                 max_tokens=max_tokens
             )
 
-            raw_output = response.choices[0].message.content or ""
-            clean_code = self._extract_clean_code(raw_output, language)
+            result = self._success_result(
+                response.choices[0].message.content or "", model, start_time
+            )
+            print(f"✅ Code generated in {result['time_ms']}ms")
+            return result
 
-            end_time = time.time()
-            time_ms = int((end_time - start_time) * 1000)
+        except Exception as e:
+            error_str = str(e)
+            print(f"❌ Error during generation: {error_str}")
 
-            print(f"✅ Code generated in {time_ms}ms")
+            # Retry with another available model if the selected one is not found
+            fallback = self._fallback_model(model, e)
+            if fallback:
+                try:
+                    response = client.chat.completions.create(
+                        model=fallback,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    )
+
+                    return self._success_result(
+                        response.choices[0].message.content or "", fallback, start_time
+                    )
+                except Exception as retry_error:
+                    error_str = str(retry_error)
+                    print(f"❌ Retry failed: {error_str}")
+
+            return self._error_result(error_str, model, start_time)
+
+    async def generate_code_async(
+        self,
+        prompt: str,
+        language: str,
+        model: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        examples: Optional[str] = None
+    ) -> Dict:
+        """
+        Generate code using the async Groq client without blocking the event loop
 
-            return {
-                "success": True,
-                "code": clean_code,
-                "raw_output": raw_output,
-                "time_ms": time_ms,
-                "model": model,
-                "error": None
-            }
+        Returns:
+            Dict with keys: success, code, raw_output, time_ms, model, error
+        """
+        start_time = time.perf_counter()
 
-        except Exception as e:
-            end_time = time.time()
-            time_ms = int((end_time - start_time) * 1000)
+        if not self.api_key:
+            return self._error_result("GROQ_API_KEY is not set")
 
+        await self.ensure_models_async()
+
+        if model is None:
+            model = self.select_best_model()
+
+        messages = self._build_messages(prompt, language, examples)
+
+        client = self._get_async_client()
+        if not client:
+            return self._error_result("Failed to initialize Groq client")
+
+        try:
+            print(f"🔄 Generating code with {model}...")
+
+            response = await self._create_async(
+                client,
+                model,
+                messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+
+            result = self._success_result(
+                response.choices[0].message.content or "", model, start_time
+            )
+            print(f"✅ Code generated in {result['time_ms']}ms")
+            return result
+
+        except Exception as e:
             error_str = str(e)
             print(f"❌ Error during generation: {error_str}")
 
             # Retry with another available model if the selected one is not found
-            if "model_not_found" in error_str or "model" in error_str.lower():
-                fallback = next(
-                    (m for m in self.available_models if m != model),
-                    None
-                )
-                if fallback:
-                    try:
-                        response = client.chat.completions.create(
-                            model=fallback,
-                            messages=[
-                                {
-                                    "role": "system",
-                                    "content": f"{system_prompt}\n\nIMPORTANT: Return ONLY the code. No explanations, no markdown formatting, no instructions. Just the raw code."
-                                },
-                                {
-                                    "role": "user",
-                                    "content": f"Generate {language} code for: {prompt}\n\nReturn ONLY the code itself. No text before or after."
-                                }
-                            ],
-                            temperature=temperature,
-                            max_tokens=max_tokens
-                        )
-
-                        raw_output = response.choices[0].message.content or ""
-                        clean_code = self._extract_clean_code(raw_output, language)
-
-                        end_time = time.time()
-                        time_ms = int((end_time - start_time) * 1000)
-
-                        return {
-                            "success": True,
-                            "code": clean_code,
-                            "raw_output": raw_output,
-                            "time_ms": time_ms,
-                            "model": fallback,
-                            "error": None
-                        }
-                    except Exception as retry_error:
-                        error_str = str(retry_error)
-                        print(f"❌ Retry failed: {error_str}")
-
-            return {
-                "success": False,
-                "code": "",
-                "raw_output": "",
-                "time_ms": time_ms,
-                "model": model,
-                "error": error_str
-            }
-
-    def _extract_clean_code(self, raw_output: str, language: str) -> str:
-        """Extract clean code from Groq response"""
-        if not raw_output or not raw_output.strip():
-            return ""
-
-        # Remove markdown code blocks if present
-        code_block_pattern = r'```(?:\w+)?\s*\n(.*?)```'
-        code_blocks = re.findall(code_block_pattern, raw_output, re.DOTALL)
-
-        if code_blocks:
-            # Use the largest code block
-            largest_block = max(code_blocks, key=len)
-            return largest_block.strip()
-
-        # Remove common explanation phrases
-        lines = raw_output.split('\n')
-        code_lines = []
-        skip_phrases = [
-            'here is', 'here\'s', 'this code', 'to run', 'to use', 'to save',
-            'you can', 'simply', 'make sure', 'note that', 'explanation',
-            'how to', 'save this', 'run this', 'execute', 'to get started'
-        ]
-
-        for line in lines:
-            line_lower = line.lower().strip()
-
-            # Skip empty lines at the start
-            if not code_lines and not line.strip():
-                continue
-
-            # Skip explanation lines
-            is_explanation = any(phrase in line_lower for phrase in skip_phrases)
-
-            # Keep lines that look like code
-            if not is_explanation or any(
-                keyword in line for keyword in [
-                    'def ', 'class ', 'function ', 'const ', 'let ', 'var ',
-                    'import ', 'from ', '#include', 'public ', 'private ',
-                    'fn ', 'func ', 'package ', 'using ', 'namespace '
-                ]
-            ):
-                code_lines.append(line)
-
-        final_code = '\n'.join(code_lines).strip()
-
-        # If extraction resulted in very short code, return raw output
-        if not final_code or len(final_code) < 10:
-            return raw_output.strip()
-
-        return final_code
-
-    def stream_generate(self, prompt: str, language: str, model: Optional[str] = None):
+            fallback = self._fallback_model(model, e)
+            if fallback:
+                try:
+                    response = await self._create_async(
+                        client,
+                        fallback,
+                        messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    )
+
+                    return self._success_result(
+                        response.choices[0].message.content or "", fallback, start_time
+                    )
+                except Exception as retry_error:
+                    error_str = str(retry_error)
+                    print(f"❌ Retry failed: {error_str}")
+
+            return self._error_result(error_str, model, start_time)
+
+    def _chunk_text(self, chunk) -> str:
+        delta = chunk.choices[0].delta if chunk.choices else None
+        return delta.content if delta and delta.content else ""
+
+    def stream_generate(
+        self,
+        prompt: str,
+        language: str,
+        model: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        examples: Optional[str] = None
+    ):
         """Generator function for streaming code generation (for WebSocket)"""
         if not self.api_key:
             yield {"type": "error", "content": "GROQ_API_KEY is not set"}
@@ -285,6 +311,7 @@ class GroqService:
         if model is None:
             model = self.select_best_model()
 
+        start_time = time.perf_counter()
         try:
             client = self._get_client()
             if not client:
@@ -293,22 +320,51 @@ class GroqService:
 
             stream = client.chat.completions.create(
                 model=model,
-                messages=[
-                    {"role": "user", "content": f"Generate {language} code for: {prompt}"}
-                ],
-                stream=True
+                messages=self._build_messages(prompt, language, examples),
+                stream=True,
+                temperature=temperature,
+                max_tokens=max_tokens
             )
+            yield from self._stream_events(stream, start_time, model)
 
-            for chunk in stream:
-                delta = chunk.choices[0].delta
-                content = delta.content if delta and delta.content else ""
-                if content:
-                    yield {"type": "content", "content": content}
+        except Exception as e:
+            yield self._stream_error(e, start_time)
+
+    async def stream_generate_async(
+        self,
+        prompt: str,
+        language: str,
+        model: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        examples: Optional[str] = None
+    ):
+        """Async generator for streaming code generation (for WebSocket)"""
+        if not self.api_key:
+            yield {"type": "error", "content": "GROQ_API_KEY is not set"}
+            return
+
+        if model is None:
+            model = self.select_best_model()
+
+        start_time = time.perf_counter()
+        try:
+            client = self._get_async_client()
+            if not client:
+                yield {"type": "error", "content": "Failed to initialize Groq client"}
+                return
 
-            yield {"type": "complete"}
+            async with self._stream_async(
+                client, model, self._build_messages(prompt, language, examples),
+                temperature=temperature, max_tokens=max_tokens
+            ) as stream:
+                # aclosing: a consumer that stops early closes the upstream response now
+                async with aclosing(self._stream_events_async(stream, start_time, model)) as events:
+                    async for event in events:
+                        yield event
 
         except Exception as e:
-            yield {"type": "error", "content": str(e)}
+            yield self._stream_error(e, start_time)
 
 
 # Singleton instance
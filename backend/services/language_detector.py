@@ -0,0 +1,140 @@
+"""
+Language Detector
+Scores every programming language in one pass over the prompt.
+
+All keywords (language names, frameworks, tools, file extensions) are
+compiled into a single regex whose alternation is factored into a prefix
+trie, so the engine walks one automaton-like pattern over the lowercased
+prompt instead of trying each keyword separately. Keywords only match as whole words:
+"go" does not fire inside "good", "ts" not inside "its", "java" not inside
+"javascript". Each hit adds its weight to every language it belongs to, and
+the confidence is the winner's share of the total evidence, smoothed so a
+single weak hit is not reported as certain.
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+DEFAULT_LANGUAGE = "python"
+
+# Weight per keyword: 3 = the language itself, 2 = framework/tool/extension
+# that implies it, 1 or less = ambiguous words that are also plain English
+LANGUAGE_KEYWORDS: Dict[str, Dict[str, float]] = {
+    "python": {
+        "python": 3, "python3": 3, "py": 1, ".py": 2, "django": 2, "flask": 2, "pandas": 2,
+        "numpy": 2, "fastapi": 2, "pip": 1, "pytest": 2, "pydantic": 2, "asyncio": 2,
+    },
+    "javascript": {
+        "javascript": 3, "js": 2, ".js": 2, "node": 1, "nodejs": 2, "node.js": 2, "npm": 2,
+        "react": 1.5, "vue": 1.5, "angular": 0.5, "express": 1, "express.js": 2, "jquery": 2, ".jsx": 2,
+    },
+    "typescript": {
+        "typescript": 3, "ts": 1, ".ts": 2, ".tsx": 2, "tsx": 2, "angular": 1, "nest": 0.5,
+        "nestjs": 2, "deno": 1.5,
+    },
+    "java": {
+        "java": 3, ".java": 2, "spring": 1, "spring boot": 2, "springboot": 2, "maven": 2,
+        "gradle": 2, "jvm": 1.5, "junit": 2,
+    },
+    "cpp": {
+        "c++": 3, "cpp": 3, ".cpp": 2, ".hpp": 2, "cplusplus": 3, "stl": 1.5, "cmake": 1.5,
+        "std::vector": 2,
+    },
+    "csharp": {
+        "c#": 3, "csharp": 3, ".cs": 2, ".net": 2, "dotnet": 2, "asp.net": 2, "linq": 2,
+        "unity": 1, "blazor": 2,
+    },
+    "rust": {
+        "rust": 3, ".rs": 2, "cargo": 1.5, "tokio": 2, "crate": 1, "serde": 2, "rustc": 2,
+    },
+    "go": {
+        "go": 1.5, "golang": 3, ".go": 2, "goroutine": 2, "goroutines": 2, "gin": 1, "go mod": 2,
+    },
+    "php": {
+        "php": 3, ".php": 2, "laravel": 2, "symfony": 2, "composer": 1, "wordpress": 1.5,
+    },
+    "ruby": {
+        "ruby": 3, ".rb": 2, "rails": 1.5, "ruby on rails": 2, "gem": 1, "rspec": 2,
+    },
+}
+
+# Extra evidence needed before a language is reported with full confidence
+SMOOTHING = 1.0
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex alternation for the words, factored by common prefix (longest match first)"""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: Dict) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if "" in node:
+            return f"(?:{body})?"
+        return body
+
+    return render(trie)
+
+
+class LanguageDetector:
+    """Weighted keyword detector compiled into one word-boundary regex"""
+
+    def __init__(
+        self,
+        keywords: Dict[str, Dict[str, float]] = LANGUAGE_KEYWORDS,
+        default: str = DEFAULT_LANGUAGE,
+        smoothing: float = SMOOTHING
+    ):
+        self.default = default
+        self.smoothing = smoothing
+        weights: Dict[str, List[Tuple[str, float]]] = defaultdict(list)
+        for language, entries in keywords.items():
+            for keyword, weight in entries.items():
+                weights[keyword.lower()].append((language, weight))
+        self.weights = dict(weights)
+
+        # Each match consumes the separator in front of the keyword, so the
+        # pattern starts with a character class and the regex engine skips
+        # straight to separators instead of trying every position. A "."
+        # separator turns the word into a file extension ("main.py" -> ".py");
+        # keywords end where no word character (or # / +) follows.
+        stems = {keyword[1:] for keyword in self.weights if keyword.startswith(".")}
+        self.pattern = re.compile(rf"([^\w#+])({_trie_pattern(self.weights.keys() | stems)})(?![\w#+])")
+
+    def scores(self, prompt: str) -> Dict[str, float]:
+        """Summed keyword weight per language"""
+        totals: Dict[str, float] = defaultdict(float)
+        weights = self.weights
+        for separator, word in self.pattern.findall(" " + prompt.lower()):
+            for language, weight in weights.get("." + word if separator == "." else word, ()):
+                totals[language] += weight
+        return totals
+
+    def detect(self, prompt: str) -> Dict:
+        """
+        Returns {"language", "confidence", "scores"}. Without any evidence the
+        default language is returned with confidence 0.
+        """
+        totals = self.scores(prompt)
+        if not totals:
+            return {"language": self.default, "confidence": 0.0, "scores": {}}
+
+        language = max(totals, key=totals.get)
+        confidence = totals[language] / (sum(totals.values()) + self.smoothing)
+        return {
+            "language": language,
+            "confidence": round(confidence, 3),
+            "scores": dict(sorted(totals.items(), key=lambda item: -item[1])),
+        }
+
+
+# Singleton instance
+language_detector = LanguageDetector()
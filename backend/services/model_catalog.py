@@ -0,0 +1,250 @@
+"""
+Model Catalog
+Keeps each provider's availability and model list in memory.
+
+A background task refreshes every provider once its entry is older than
+the TTL; readers (/health, readiness, model selection and fallback) only
+ever see the in-memory copy. A reader that finds a stale entry gets it
+immediately and triggers a revalidation in the background
+(stale-while-revalidate). Concurrent refreshes of one provider share a
+single upstream call, and after a failed refresh the provider is not
+asked again until the retry interval has passed, so a slow or failing
+models.list() can no longer be hit once per request.
+
+start() returns at once: the same background task first warms the
+providers up (SDK imports and client construction on a worker thread)
+and loads every provider, so the server accepts requests while that
+happens and readiness reports 503 until the first load has finished.
+"""
+
+import os
+import time
+import asyncio
+from typing import Callable, Dict, List, Optional
+
+from backend.services.provider_router import provider_router
+
+
+class _Entry:
+    """Last known state of one provider"""
+
+    def __init__(self):
+        self.models: List[str] = []
+        self.available = False
+        self.error: Optional[str] = None
+        self.fetched_at = 0.0    # monotonic time of the last successful refresh (0 = never)
+        self.attempted_at = 0.0  # monotonic time of the last attempt
+        self.refreshes = 0
+        self.failures = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class ModelCatalog:
+    """In-memory provider/model catalog with a background refresher"""
+
+    def __init__(
+        self,
+        providers: Dict[str, object],
+        ttl_seconds: float = 300,
+        retry_seconds: float = 30,
+        timeout_seconds: float = 10
+    ):
+        self.providers = providers
+        self.ttl_seconds = ttl_seconds
+        self.retry_seconds = retry_seconds
+        self.timeout_seconds = timeout_seconds
+        self.entries: Dict[str, _Entry] = {name: _Entry() for name in providers}
+        self._task: Optional[asyncio.Task] = None
+        self.loaded = False
+        self.warm_up_ms: Optional[int] = None
+        self.reads = 0
+        self.background_revalidations = 0
+
+        # Providers ask the catalog (not the upstream API) when they need models
+        for provider in providers.values():
+            provider.model_catalog = self
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+
+    def _is_stale(self, entry: _Entry, now: float) -> bool:
+        return not entry.fetched_at or now - entry.fetched_at >= self.ttl_seconds
+
+    def _is_due(self, entry: _Entry, now: float) -> bool:
+        """Stale, not being refreshed, and not inside the retry back-off"""
+        return (
+            self._is_stale(entry, now)
+            and (entry.task is None or entry.task.done())
+            and (entry.error is None or now - entry.attempted_at >= self.retry_seconds)
+        )
+
+    async def _fetch(self, name: str):
+        entry = self.entries[name]
+        provider = self.providers[name]
+        entry.attempted_at = time.monotonic()
+        entry.refreshes += 1
+        try:
+            available, models = await asyncio.wait_for(
+                provider.check_availability_async(), self.timeout_seconds
+            )
+            error = None if available else "unavailable"
+        except asyncio.TimeoutError:
+            available, models, error = False, [], f"timed out after {self.timeout_seconds}s"
+        except Exception as e:
+            available, models, error = False, [], str(e)
+
+        entry.available = available
+        entry.error = error
+        if available:
+            entry.fetched_at = time.monotonic()
+            entry.models = list(models)
+            provider.available_models = list(models)
+        else:
+            # Keep the last good model list for selection; only availability changes
+            entry.failures += 1
+
+    async def refresh(self, name: str):
+        """Refresh one provider now; joins a refresh already in flight"""
+        entry = self.entries[name]
+        if entry.task is None or entry.task.done():
+            entry.task = asyncio.ensure_future(self._fetch(name))
+        await asyncio.shield(entry.task)
+
+    async def refresh_all(self, only_due: bool = False):
+        now = time.monotonic()
+        names = [
+            name for name, entry in self.entries.items()
+            if not only_due or self._is_due(entry, now)
+        ]
+        if names:
+            await asyncio.gather(*(self.refresh(name) for name in names))
+
+    def _revalidate(self, name: str):
+        """Start a background refresh if the entry is due (never waits for it)"""
+        entry = self.entries[name]
+        if not self._is_due(entry, time.monotonic()):
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self.background_revalidations += 1
+        entry.task = asyncio.ensure_future(self._fetch(name))
+
+    async def ensure(self, name: str) -> List[str]:
+        """
+        Models of a provider that has none loaded yet. Waits for at most one
+        shared refresh, and not at all inside the retry back-off.
+        """
+        entry = self.entries.get(name)
+        if entry is None:
+            return []
+        if not entry.fetched_at:
+            if entry.task is not None and not entry.task.done():
+                await asyncio.shield(entry.task)
+            elif self._is_due(entry, time.monotonic()):
+                await self.refresh(name)
+        return entry.models
+
+    # ------------------------------------------------------------------
+    # Reads (memory only)
+    # ------------------------------------------------------------------
+
+    def get(self, name: str) -> Dict:
+        self.reads += 1
+        self._revalidate(name)
+        entry = self.entries[name]
+        now = time.monotonic()
+        return {
+            "available": entry.available,
+            "models": entry.models,
+            "stale": self._is_stale(entry, now),
+            "age_seconds": round(now - entry.fetched_at, 1) if entry.fetched_at else None,
+            "refreshing": entry.task is not None and not entry.task.done(),
+            "error": entry.error,
+            "refreshes": entry.refreshes,
+            "failures": entry.failures,
+        }
+
+    def snapshot(self) -> Dict:
+        providers = {name: self.get(name) for name in self.entries}
+        return {
+            "ready": any(p["available"] for p in providers.values()),
+            "models": [m for p in providers.values() if p["available"] for m in p["models"]],
+            "providers": providers,
+        }
+
+    # ------------------------------------------------------------------
+    # Background refresher
+    # ------------------------------------------------------------------
+
+    async def warm_up(self):
+        """Build provider clients off the event loop, then load every provider once"""
+        start_time = time.perf_counter()
+        for name, provider in self.providers.items():
+            try:
+                await asyncio.to_thread(provider.warm_up)
+            except Exception as e:
+                print(f"⚠️ Warm-up of provider '{name}' failed: {e}")
+        await self.refresh_all()
+        self.loaded = True
+        self.warm_up_ms = int((time.perf_counter() - start_time) * 1000)
+
+    async def _run(self, on_loaded: Optional[Callable[[], None]] = None):
+        await self.warm_up()
+        if on_loaded is not None:
+            on_loaded()
+        while True:
+            await asyncio.sleep(min(self.ttl_seconds, self.retry_seconds) / 2)
+            try:
+                await self.refresh_all(only_due=True)
+            except Exception as e:
+                print(f"⚠️ Model catalog refresh failed: {e}")
+
+    async def start(self, on_loaded: Optional[Callable[[], None]] = None):
+        """
+        Warm up and load every provider in the background, then keep the
+        catalog fresh. Returns immediately; on_loaded runs after the first load.
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(on_loaded))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict:
+        return {
+            "loaded": self.loaded,
+            "warm_up_ms": self.warm_up_ms,
+            "ttl_seconds": self.ttl_seconds,
+            "retry_seconds": self.retry_seconds,
+            "reads": self.reads,
+            "background_revalidations": self.background_revalidations,
+            "refreshes": sum(e.refreshes for e in self.entries.values()),
+        }
+
+
+def create_model_catalog(providers: Dict[str, object]) -> ModelCatalog:
+    """
+    Build the catalog from environment settings:
+        MODEL_CATALOG_TTL            seconds a model list is fresh (default 300)
+        MODEL_CATALOG_RETRY_SECONDS  wait after a failed refresh before asking again (default 30)
+        MODEL_CATALOG_TIMEOUT        upper bound for one provider check (default 10)
+    """
+    return ModelCatalog(
+        providers,
+        ttl_seconds=float(os.getenv("MODEL_CATALOG_TTL", "300")),
+        retry_seconds=float(os.getenv("MODEL_CATALOG_RETRY_SECONDS", "30")),
+        timeout_seconds=float(os.getenv("MODEL_CATALOG_TIMEOUT", "10"))
+    )
+
+
+# Singleton instance (over the router's providers)
+model_catalog = create_model_catalog(provider_router.providers)
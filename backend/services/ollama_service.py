@@ -3,67 +3,111 @@ Ollama Integration Service
 Handles all interactions with the local Ollama API
 """
 
-import ollama
-import requests
+import os
+import json
 import time
-from typing import Dict, List, Tuple, Optional
-import re
-from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
 
+from backend.services.provider_base import BaseProvider
 
-class OllamaService:
-    """Service for interacting with local Ollama API"""
+if TYPE_CHECKING:
+    import httpx
+
+
+class OllamaService(BaseProvider):
+    """Service for interacting with local Ollama API (over the provider's pooled HTTP client)"""
+    
+    name = "ollama"
+    # Priority order for code generation
+    preferred_models = ("codellama", "deepseek-coder", "mistral", "llama3", "phi", "qwen")
     
-    def __init__(self, base_url: str = "http://localhost:11434"):
-        self.base_url = base_url
-        self.available_models = []
-        self.best_model = None
+    def __init__(self, base_url: Optional[str] = None):
+        base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        super().__init__(base_url)
+        self._best_model: Optional[str] = None
+        self._best_for: Optional[Tuple[str, ...]] = None  # model list _best_model was picked from
         
+    def _parse_models(self, response: "httpx.Response") -> Tuple[bool, List[str]]:
+        if response.status_code == 200:
+            data = response.json()
+            self.available_models = [model['name'] for model in data.get('models', [])]
+            return True, self.available_models
+        return False, []
+    
     def check_availability(self) -> Tuple[bool, List[str]]:
         """Check if Ollama is running and get available models"""
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                self.available_models = [model['name'] for model in data.get('models', [])]
-                return True, self.available_models
+            return self._parse_models(self.http_client().get("/api/tags", timeout=5))
+        except Exception as e:
+            print(f"❌ Ollama check error: {e}")
             return False, []
+    
+    async def check_availability_async(self) -> Tuple[bool, List[str]]:
+        """Check if Ollama is running without blocking the event loop"""
+        try:
+            return self._parse_models(await self.async_http_client().get("/api/tags", timeout=5))
         except Exception as e:
             print(f"❌ Ollama check error: {e}")
             return False, []
     
     def select_best_model(self) -> Optional[str]:
         """Select the best available model for code generation"""
-        # Priority order for code generation
-        preferred_models = [
-            "codellama",
-            "deepseek-coder",
-            "mistral",
-            "llama3",
-            "phi",
-            "qwen"
-        ]
-        
-        for preferred in preferred_models:
-            for available in self.available_models:
-                if preferred in available.lower():
-                    self.best_model = available
-                    return available
+        ranked = self.chat_models()
+        if ranked:
+            return ranked[0]
         
         # Return first available model as fallback
         if self.available_models:
-            self.best_model = self.available_models[0]
             return self.available_models[0]
         
         return None
     
+    @property
+    def best_model(self) -> Optional[str]:
+        """select_best_model() of the current model list, picked again whenever a refresh changes it"""
+        models = tuple(self.available_models)
+        if models != self._best_for:
+            self._best_model = self.select_best_model()
+            self._best_for = models
+        return self._best_model
+    
+    def _chat_body(
+        self, model: str, messages: List[Dict], stream: bool, temperature: float = 0.3, max_tokens: int = 1000
+    ) -> Dict:
+        """Request body for POST /api/chat"""
+        return {
+            "model": model,
+            "messages": messages,
+            "stream": stream,
+            "options": {
+                "temperature": temperature,
+                "top_p": 0.9,
+                "num_predict": max_tokens
+            }
+        }
+    
+    def _raise_for_error(self, response: "httpx.Response"):
+        """Ollama reports failures as {"error": "..."} with a non-2xx status"""
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("error")
+            except ValueError:
+                message = None
+            raise RuntimeError(message or f"Ollama returned HTTP {response.status_code}")
+    
+    def _chunk_text(self, chunk) -> str:
+        if "error" in chunk:
+            raise RuntimeError(chunk["error"])
+        return chunk.get("message", {}).get("content", "")
+    
     def generate_code(
         self,
         prompt: str,
         language: str,
         model: Optional[str] = None,
         temperature: float = 0.3,
-        max_tokens: int = 1000
+        max_tokens: int = 1000,
+        examples: Optional[str] = None
     ) -> Dict:
         """
         Generate code using Ollama
@@ -71,169 +115,144 @@ class OllamaService:
         Returns:
             Dict with keys: success, code, raw_output, time_ms, model, error
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         if model is None:
-            model = self.best_model or self.select_best_model()
+            if not self.available_models:
+                self.check_availability()
+            model = self.best_model
         
         if not model:
-            return {
-                "success": False,
-                "code": "",
-                "raw_output": "",
-                "time_ms": 0,
-                "model": None,
-                "error": "No Ollama model available"
-            }
-        
-        # Language-specific system prompts
-        system_prompts = {
-            "python": "You are an expert Python developer. Generate clean, efficient Python code following PEP 8 standards.",
-            "javascript": "You are an expert JavaScript developer. Generate modern ES6+ JavaScript code.",
-            "typescript": "You are an expert TypeScript developer. Generate type-safe TypeScript code.",
-            "java": "You are an expert Java developer. Generate clean, object-oriented Java code.",
-            "cpp": "You are an expert C++ developer. Generate modern C++17/20 code.",
-            "rust": "You are an expert Rust developer. Generate safe, idiomatic Rust code.",
-            "go": "You are an expert Go developer. Generate clean, idiomatic Go code.",
-            "csharp": "You are an expert C# developer. Generate clean, modern C# code.",
-        }
-        
-        system_prompt = system_prompts.get(
-            language.lower(),
-            f"You are an expert {language} developer. Generate clean, well-documented code."
-        )
+            return self._error_result("No Ollama model available")
         
         try:
             print(f"🔄 Generating code with {model}...")
             
-            response = ollama.chat(
-                model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"{system_prompt}\n\nIMPORTANT: Return ONLY the code. No explanations, no markdown formatting, no instructions. Just the raw code."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Generate {language} code for: {prompt}\n\nReturn ONLY the code itself. No text before or after."
-                    }
-                ],
-                options={
-                    "temperature": temperature,
-                    "top_p": 0.9,
-                    "num_predict": max_tokens
-                }
-            )
-            
-            raw_output = response['message']['content']
-            clean_code = self._extract_clean_code(raw_output, language)
-            
-            end_time = time.time()
-            time_ms = int((end_time - start_time) * 1000)
+            response = self.http_client().post("/api/chat", json=self._chat_body(
+                model, self._build_messages(prompt, language, examples), False, temperature, max_tokens
+            ))
+            self._raise_for_error(response)
             
-            print(f"✅ Code generated in {time_ms}ms")
-            
-            return {
-                "success": True,
-                "code": clean_code,
-                "raw_output": raw_output,
-                "time_ms": time_ms,
-                "model": model,
-                "error": None
-            }
+            result = self._success_result(response.json()['message']['content'], model, start_time)
+            print(f"✅ Code generated in {result['time_ms']}ms")
+            return result
             
         except Exception as e:
-            end_time = time.time()
-            time_ms = int((end_time - start_time) * 1000)
-            
             print(f"❌ Error during generation: {e}")
-            
-            return {
-                "success": False,
-                "code": "",
-                "raw_output": "",
-                "time_ms": time_ms,
-                "model": model,
-                "error": str(e)
-            }
+            return self._error_result(str(e), model, start_time)
     
-    def _extract_clean_code(self, raw_output: str, language: str) -> str:
-        """Extract clean code from Ollama response"""
-        if not raw_output or not raw_output.strip():
-            return ""
+    async def generate_code_async(
+        self,
+        prompt: str,
+        language: str,
+        model: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        examples: Optional[str] = None
+    ) -> Dict:
+        """
+        Generate code using the async pooled client without blocking the event loop
         
-        # Remove markdown code blocks if present
-        code_block_pattern = r'```(?:\w+)?\s*\n(.*?)```'
-        code_blocks = re.findall(code_block_pattern, raw_output, re.DOTALL)
+        Returns:
+            Dict with keys: success, code, raw_output, time_ms, model, error
+        """
+        start_time = time.perf_counter()
         
-        if code_blocks:
-            # Use the largest code block
-            largest_block = max(code_blocks, key=len)
-            return largest_block.strip()
+        if model is None:
+            await self.ensure_models_async()
+            model = self.best_model
         
-        # Remove common explanation phrases
-        lines = raw_output.split('\n')
-        code_lines = []
-        skip_phrases = [
-            'here is', 'here\'s', 'this code', 'to run', 'to use', 'to save',
-            'you can', 'simply', 'make sure', 'note that', 'explanation',
-            'how to', 'save this', 'run this', 'execute', 'to get started'
-        ]
+        if not model:
+            return self._error_result("No Ollama model available")
         
-        for line in lines:
-            line_lower = line.lower().strip()
+        try:
+            print(f"🔄 Generating code with {model}...")
             
-            # Skip empty lines at the start
-            if not code_lines and not line.strip():
-                continue
+            response = await self.async_http_client().post("/api/chat", json=self._chat_body(
+                model, self._build_messages(prompt, language, examples), False, temperature, max_tokens
+            ))
+            self._raise_for_error(response)
             
-            # Skip explanation lines
-            is_explanation = any(phrase in line_lower for phrase in skip_phrases)
+            result = self._success_result(response.json()['message']['content'], model, start_time)
+            print(f"✅ Code generated in {result['time_ms']}ms")
+            return result
             
-            # Keep lines that look like code
-            if not is_explanation or any(
-                keyword in line for keyword in [
-                    'def ', 'class ', 'function ', 'const ', 'let ', 'var ',
-                    'import ', 'from ', '#include', 'public ', 'private ',
-                    'fn ', 'func ', 'package ', 'using ', 'namespace '
-                ]
-            ):
-                code_lines.append(line)
-        
-        final_code = '\n'.join(code_lines).strip()
-        
-        # If extraction resulted in very short code, return raw output
-        if not final_code or len(final_code) < 10:
-            return raw_output.strip()
-        
-        return final_code
+        except Exception as e:
+            print(f"❌ Error during generation: {e}")
+            return self._error_result(str(e), model, start_time)
     
-    def stream_generate(self, prompt: str, language: str, model: Optional[str] = None):
+    def stream_generate(
+        self,
+        prompt: str,
+        language: str,
+        model: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        examples: Optional[str] = None
+    ):
         """Generator function for streaming code generation (for WebSocket)"""
         if model is None:
-            model = self.best_model or self.select_best_model()
+            if not self.available_models:
+                self.check_availability()
+            model = self.best_model
         
         if not model:
             yield {"type": "error", "content": "No model available"}
             return
         
+        start_time = time.perf_counter()
+        body = self._chat_body(
+            model, self._build_messages(prompt, language, examples), True, temperature, max_tokens
+        )
         try:
-            stream = ollama.chat(
-                model=model,
-                messages=[
-                    {"role": "user", "content": f"Generate {language} code for: {prompt}"}
-                ],
-                stream=True
-            )
-            
-            for chunk in stream:
-                content = chunk['message']['content']
-                yield {"type": "content", "content": content}
+            with self.http_client().stream("POST", "/api/chat", json=body) as response:
+                if response.status_code >= 400:
+                    response.read()
+                    self._raise_for_error(response)
+                chunks = (json.loads(line) for line in response.iter_lines() if line)
+                yield from self._stream_events(chunks, start_time, model)
             
-            yield {"type": "complete"}
+        except Exception as e:
+            yield self._stream_error(e, start_time)
+    
+    async def stream_generate_async(
+        self,
+        prompt: str,
+        language: str,
+        model: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        examples: Optional[str] = None
+    ):
+        """Async generator for streaming code generation (for WebSocket)"""
+        if model is None:
+            await self.ensure_models_async()
+            model = self.best_model
+        
+        if not model:
+            yield {"type": "error", "content": "No model available"}
+            return
+        
+        start_time = time.perf_counter()
+        body = self._chat_body(
+            model, self._build_messages(prompt, language, examples), True, temperature, max_tokens
+        )
+        try:
+            async with self.async_http_client().stream("POST", "/api/chat", json=body) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    self._raise_for_error(response)
+                
+                async def chunks():
+                    async for line in response.aiter_lines():
+                        if line:
+                            yield json.loads(line)
+                
+                async for event in self._stream_events_async(chunks(), start_time, model):
+                    yield event
             
         except Exception as e:
-            yield {"type": "error", "content": str(e)}
+            yield self._stream_error(e, start_time)
 
 
 # Singleton instance
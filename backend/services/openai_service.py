@@ -5,19 +5,49 @@ Handles all interactions with the OpenAI API
 
 import os
 import time
-import re
+from contextlib import aclosing, asynccontextmanager
 from typing import Dict, List, Tuple, Optional
-from datetime import datetime
-from openai import OpenAI
 
+from backend.services.provider_base import BaseProvider
+from backend.services.rate_limiter import rate_limits, parse_raw_response
 
-class OpenAIService:
+
+class OpenAIService(BaseProvider):
     """Service for interacting with OpenAI GPT API"""
 
+    name = "openai"
+    sdk = "openai"  # Imported when the first client is built
+    preferred_models = ("gpt-4o", "gpt-4.1", "gpt-4", "gpt-3.5-turbo")
+
     def __init__(self):
+        super().__init__()
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.default_model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-        self.client = OpenAI(api_key=self.api_key) if self.api_key else None
+        self.client = None  # Lazy load client
+        self.async_client = None  # Lazy load async client
+
+    def _get_client(self):
+        """Lazy load OpenAI client (on the provider's pooled HTTP client)"""
+        if self.client is None and self.api_key:
+            from openai import OpenAI
+            self.client = OpenAI(api_key=self.api_key, http_client=self.http_client())
+        return self.client
+
+    def _get_async_client(self):
+        """Lazy load async OpenAI client (used by the async request path)"""
+        if self.async_client is None and self.api_key:
+            from openai import AsyncOpenAI
+            # Throttling retries are handled by the rate limiter, not the SDK
+            self.async_client = AsyncOpenAI(
+                api_key=self.api_key, max_retries=0, http_client=self.async_http_client()
+            )
+        return self.async_client
+
+    def warm_up(self):
+        """Import the SDK and build both clients ahead of the first request"""
+        if self.api_key:
+            self._get_client()
+            self._get_async_client()
 
     def check_availability(self) -> Tuple[bool, List[str]]:
         """Check if OpenAI API is reachable and list some models"""
@@ -25,7 +55,20 @@ class OpenAIService:
             return False, []
 
         try:
-            models = self.client.models.list()
+            models = self._get_client().models.list()
+            model_ids = [m.id for m in models.data][:25]
+            return True, model_ids
+        except Exception as e:
+            print(f"❌ OpenAI check error: {e}")
+            return False, []
+
+    async def check_availability_async(self) -> Tuple[bool, List[str]]:
+        """Check if OpenAI API is reachable without blocking the event loop"""
+        if not self.api_key:
+            return False, []
+
+        try:
+            models = await self._get_async_client().models.list()
             model_ids = [m.id for m in models.data][:25]
             return True, model_ids
         except Exception as e:
@@ -36,13 +79,37 @@ class OpenAIService:
         """Select the best available model for code generation"""
         return self.default_model
 
+    async def _create_async(self, model: str, messages: List[Dict], **params):
+        """chat.completions.create under the per-model rate limiter"""
+        limiter = rate_limits.get("openai", model)
+        raw = await limiter.run(
+            lambda: self._get_async_client().chat.completions.with_raw_response.create(
+                model=model, messages=messages, **params
+            ),
+            tokens=self._estimate_tokens(messages, params.get("max_tokens") or 0)
+        )
+        return await parse_raw_response(raw)
+
+    @asynccontextmanager
+    async def _stream_async(self, model: str, messages: List[Dict], **params):
+        """Streaming _create_async; the rate limiter slot is held until the stream is closed"""
+        limiter = rate_limits.get("openai", model)
+        async with limiter.hold(
+            lambda: self._get_async_client().chat.completions.with_raw_response.create(
+                model=model, messages=messages, stream=True, **params
+            ),
+            tokens=self._estimate_tokens(messages, params.get("max_tokens") or 0)
+        ) as raw:
+            yield await parse_raw_response(raw)
+
     def generate_code(
         self,
         prompt: str,
         language: str,
         model: Optional[str] = None,
         temperature: float = 0.3,
-        max_tokens: int = 1000
+        max_tokens: int = 1000,
+        examples: Optional[str] = None
     ) -> Dict:
         """
         Generate code using OpenAI GPT
@@ -50,142 +117,92 @@ class OpenAIService:
         Returns:
             Dict with keys: success, code, raw_output, time_ms, model, error
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         if not self.api_key:
-            return {
-                "success": False,
-                "code": "",
-                "raw_output": "",
-                "time_ms": 0,
-                "model": None,
-                "error": "OPENAI_API_KEY is not set"
-            }
+            return self._error_result("OPENAI_API_KEY is not set")
 
         if model is None:
             model = self.select_best_model()
 
-        # Language-specific system prompts
-        system_prompts = {
-            "python": "You are an expert Python developer. Generate clean, efficient Python code following PEP 8 standards.",
-            "javascript": "You are an expert JavaScript developer. Generate modern ES6+ JavaScript code.",
-            "typescript": "You are an expert TypeScript developer. Generate type-safe TypeScript code.",
-            "java": "You are an expert Java developer. Generate clean, object-oriented Java code.",
-            "cpp": "You are an expert C++ developer. Generate modern C++17/20 code.",
-            "rust": "You are an expert Rust developer. Generate safe, idiomatic Rust code.",
-            "go": "You are an expert Go developer. Generate clean, idiomatic Go code.",
-            "csharp": "You are an expert C# developer. Generate clean, modern C# code.",
-        }
-
-        system_prompt = system_prompts.get(
-            language.lower(),
-            f"You are an expert {language} developer. Generate clean, well-documented code."
-        )
-
         try:
             print(f"🔄 Generating code with {model}...")
 
-            response = self.client.chat.completions.create(
+            response = self._get_client().chat.completions.create(
                 model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"{system_prompt}\n\nIMPORTANT: Return ONLY the code. No explanations, no markdown formatting, no instructions. Just the raw code."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Generate {language} code for: {prompt}\n\nReturn ONLY the code itself. No text before or after."
-                    }
-                ],
+                messages=self._build_messages(prompt, language, examples),
                 temperature=temperature,
                 top_p=0.9,
                 max_tokens=max_tokens
             )
 
-            raw_output = response.choices[0].message.content or ""
-            clean_code = self._extract_clean_code(raw_output, language)
+            result = self._success_result(
+                response.choices[0].message.content or "", model, start_time
+            )
+            print(f"✅ Code generated in {result['time_ms']}ms")
+            return result
 
-            end_time = time.time()
-            time_ms = int((end_time - start_time) * 1000)
+        except Exception as e:
+            print(f"❌ Error during generation: {e}")
+            return self._error_result(str(e), model, start_time)
 
-            print(f"✅ Code generated in {time_ms}ms")
+    async def generate_code_async(
+        self,
+        prompt: str,
+        language: str,
+        model: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        examples: Optional[str] = None
+    ) -> Dict:
+        """
+        Generate code using the async OpenAI client without blocking the event loop
+
+        Returns:
+            Dict with keys: success, code, raw_output, time_ms, model, error
+        """
+        start_time = time.perf_counter()
 
-            return {
-                "success": True,
-                "code": clean_code,
-                "raw_output": raw_output,
-                "time_ms": time_ms,
-                "model": model,
-                "error": None
-            }
+        if not self.api_key:
+            return self._error_result("OPENAI_API_KEY is not set")
 
-        except Exception as e:
-            end_time = time.time()
-            time_ms = int((end_time - start_time) * 1000)
+        if model is None:
+            model = self.select_best_model()
+
+        try:
+            print(f"🔄 Generating code with {model}...")
+
+            response = await self._create_async(
+                model,
+                self._build_messages(prompt, language, examples),
+                temperature=temperature,
+                top_p=0.9,
+                max_tokens=max_tokens
+            )
 
+            result = self._success_result(
+                response.choices[0].message.content or "", model, start_time
+            )
+            print(f"✅ Code generated in {result['time_ms']}ms")
+            return result
+
+        except Exception as e:
             print(f"❌ Error during generation: {e}")
+            return self._error_result(str(e), model, start_time)
 
-            return {
-                "success": False,
-                "code": "",
-                "raw_output": "",
-                "time_ms": time_ms,
-                "model": model,
-                "error": str(e)
-            }
-
-    def _extract_clean_code(self, raw_output: str, language: str) -> str:
-        """Extract clean code from OpenAI response"""
-        if not raw_output or not raw_output.strip():
-            return ""
-
-        # Remove markdown code blocks if present
-        code_block_pattern = r'```(?:\w+)?\s*\n(.*?)```'
-        code_blocks = re.findall(code_block_pattern, raw_output, re.DOTALL)
-
-        if code_blocks:
-            # Use the largest code block
-            largest_block = max(code_blocks, key=len)
-            return largest_block.strip()
-
-        # Remove common explanation phrases
-        lines = raw_output.split('\n')
-        code_lines = []
-        skip_phrases = [
-            'here is', 'here\'s', 'this code', 'to run', 'to use', 'to save',
-            'you can', 'simply', 'make sure', 'note that', 'explanation',
-            'how to', 'save this', 'run this', 'execute', 'to get started'
-        ]
-
-        for line in lines:
-            line_lower = line.lower().strip()
-
-            # Skip empty lines at the start
-            if not code_lines and not line.strip():
-                continue
-
-            # Skip explanation lines
-            is_explanation = any(phrase in line_lower for phrase in skip_phrases)
-
-            # Keep lines that look like code
-            if not is_explanation or any(
-                keyword in line for keyword in [
-                    'def ', 'class ', 'function ', 'const ', 'let ', 'var ',
-                    'import ', 'from ', '#include', 'public ', 'private ',
-                    'fn ', 'func ', 'package ', 'using ', 'namespace '
-                ]
-            ):
-                code_lines.append(line)
-
-        final_code = '\n'.join(code_lines).strip()
-
-        # If extraction resulted in very short code, return raw output
-        if not final_code or len(final_code) < 10:
-            return raw_output.strip()
-
-        return final_code
-
-    def stream_generate(self, prompt: str, language: str, model: Optional[str] = None):
+    def _chunk_text(self, chunk) -> str:
+        delta = chunk.choices[0].delta if chunk.choices else None
+        return delta.content if delta and delta.content else ""
+
+    def stream_generate(
+        self,
+        prompt: str,
+        language: str,
+        model: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        examples: Optional[str] = None
+    ):
         """Generator function for streaming code generation (for WebSocket)"""
         if not self.api_key:
             yield {"type": "error", "content": "OPENAI_API_KEY is not set"}
@@ -194,25 +211,51 @@ class OpenAIService:
         if model is None:
             model = self.select_best_model()
 
+        start_time = time.perf_counter()
         try:
-            stream = self.client.chat.completions.create(
+            stream = self._get_client().chat.completions.create(
                 model=model,
-                messages=[
-                    {"role": "user", "content": f"Generate {language} code for: {prompt}"}
-                ],
-                stream=True
+                messages=self._build_messages(prompt, language, examples),
+                stream=True,
+                temperature=temperature,
+                top_p=0.9,
+                max_tokens=max_tokens
             )
+            yield from self._stream_events(stream, start_time, model)
 
-            for chunk in stream:
-                delta = chunk.choices[0].delta
-                content = delta.content if delta and delta.content else ""
-                if content:
-                    yield {"type": "content", "content": content}
+        except Exception as e:
+            yield self._stream_error(e, start_time)
 
-            yield {"type": "complete"}
+    async def stream_generate_async(
+        self,
+        prompt: str,
+        language: str,
+        model: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        examples: Optional[str] = None
+    ):
+        """Async generator for streaming code generation (for WebSocket)"""
+        if not self.api_key:
+            yield {"type": "error", "content": "OPENAI_API_KEY is not set"}
+            return
+
+        if model is None:
+            model = self.select_best_model()
+
+        start_time = time.perf_counter()
+        try:
+            async with self._stream_async(
+                model, self._build_messages(prompt, language, examples),
+                temperature=temperature, top_p=0.9, max_tokens=max_tokens
+            ) as stream:
+                # aclosing: a consumer that stops early closes the upstream response now
+                async with aclosing(self._stream_events_async(stream, start_time, model)) as events:
+                    async for event in events:
+                        yield event
 
         except Exception as e:
-            yield {"type": "error", "content": str(e)}
+            yield self._stream_error(e, start_time)
 
 
 # Singleton instance
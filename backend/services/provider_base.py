@@ -0,0 +1,289 @@
+"""
+Provider Base
+Shared plumbing for the LLM provider services (Groq, OpenAI, Ollama).
+
+Every provider owns one keep-alive HTTP connection pool for its blocking
+calls and one for its async calls, created on first use and reused for the
+life of the process; SDK clients are handed these pools instead of opening
+their own. HTTP/2 is negotiated when the optional `h2` package is
+installed. System and user message templates are rendered once per
+language, results and timing are built the same way for every provider,
+and each provider keeps request / failure / latency counters. A new
+provider subclasses BaseProvider and only implements its API calls.
+
+Importing a provider module is cheap: httpx and the provider SDK are only
+imported when the first client is built, either by the first request or
+by warm_up() on a worker thread once the server is accepting requests.
+"""
+
+import os
+import time
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from backend.services.code_extractor import StreamingCodeExtractor, extract_clean_code
+
+if TYPE_CHECKING:
+    import httpx
+
+# Optional: enables HTTP/2 on the provider pools (looked up, not imported)
+HTTP2_AVAILABLE = find_spec("h2") is not None
+
+# Language-specific system prompts
+SYSTEM_PROMPTS = {
+    "python": "You are an expert Python developer. Generate clean, efficient Python code following PEP 8 standards.",
+    "javascript": "You are an expert JavaScript developer. Generate modern ES6+ JavaScript code.",
+    "typescript": "You are an expert TypeScript developer. Generate type-safe TypeScript code.",
+    "java": "You are an expert Java developer. Generate clean, object-oriented Java code.",
+    "cpp": "You are an expert C++ developer. Generate modern C++17/20 code.",
+    "rust": "You are an expert Rust developer. Generate safe, idiomatic Rust code.",
+    "go": "You are an expert Go developer. Generate clean, idiomatic Go code.",
+    "csharp": "You are an expert C# developer. Generate clean, modern C# code.",
+}
+
+CODE_ONLY = "IMPORTANT: Return ONLY the code. No explanations, no markdown formatting, no instructions. Just the raw code."
+
+# Model name fragments of speech, moderation, embedding and image models: never used for chat
+NON_CHAT_MODELS = ("whisper", "guard", "tts", "embed", "dall-e", "audio", "realtime", "transcribe", "moderation")
+
+
+class BaseProvider:
+    """
+    Base class for provider services. Subclasses set `name`, implement
+    check_availability(_async), select_best_model, generate_code(_async)
+    and stream_generate(_async), and override _chunk_text() for streams.
+
+    Pool settings (environment, shared by all providers):
+        PROVIDER_MAX_CONNECTIONS     connections per pool (default 20)
+        PROVIDER_KEEPALIVE           idle keep-alive connections kept (default 10)
+        PROVIDER_KEEPALIVE_EXPIRY    seconds an idle connection is kept (default 60)
+        PROVIDER_TIMEOUT             read timeout in seconds (default 120)
+        PROVIDER_CONNECT_TIMEOUT     connect timeout in seconds (default 5)
+        PROVIDER_HTTP2               "false" disables HTTP/2 (on by default when h2 is installed)
+    """
+
+    name = "provider"
+    sdk: Optional[str] = None  # Import name of the provider SDK, if it needs one
+    preferred_models: Tuple[str, ...] = ()  # Chat model name fragments, best first
+
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = base_url
+        self.http2 = HTTP2_AVAILABLE and os.getenv("PROVIDER_HTTP2", "true").lower() != "false"
+        self.max_connections = int(os.getenv("PROVIDER_MAX_CONNECTIONS", "20"))
+        self.keepalive_connections = int(os.getenv("PROVIDER_KEEPALIVE", "10"))
+        self.keepalive_expiry = float(os.getenv("PROVIDER_KEEPALIVE_EXPIRY", "60"))
+        self.read_timeout = float(os.getenv("PROVIDER_TIMEOUT", "120"))
+        self.connect_timeout = float(os.getenv("PROVIDER_CONNECT_TIMEOUT", "5"))
+        self._http: Optional["httpx.Client"] = None
+        self._async_http: Optional["httpx.AsyncClient"] = None
+        self._templates: Dict[str, Tuple[str, str, str]] = {}
+        self.available_models: List[str] = []
+        self.model_catalog = None  # Set by the ModelCatalog that refreshes this provider
+
+        self.requests = 0
+        self.failures = 0
+        self.total_time_ms = 0
+        self.last_error: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # Connection pools
+    # ------------------------------------------------------------------
+
+    def _pool_options(self) -> Dict:
+        import httpx
+        options = {
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            "timeout": httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            "http2": self.http2
+        }
+        if self.base_url:
+            options["base_url"] = self.base_url
+        return options
+
+    def http_client(self) -> "httpx.Client":
+        """Pooled keep-alive client for blocking calls"""
+        if self._http is None:
+            import httpx
+            self._http = httpx.Client(**self._pool_options())
+        return self._http
+
+    def async_http_client(self) -> "httpx.AsyncClient":
+        """Pooled keep-alive client for the async request path"""
+        if self._async_http is None:
+            import httpx
+            self._async_http = httpx.AsyncClient(**self._pool_options())
+        return self._async_http
+
+    def sdk_installed(self) -> bool:
+        """Whether the provider's SDK can be imported (checked without importing it)"""
+        return self.sdk is None or find_spec(self.sdk) is not None
+
+    def warm_up(self):
+        """
+        Build the pools and SDK clients ahead of the first request. Blocking
+        (imports); the app runs it on a worker thread after startup.
+        """
+        self.http_client()
+        self.async_http_client()
+
+    async def aclose(self):
+        """Close both pools (application shutdown)"""
+        if self._async_http is not None:
+            await self._async_http.aclose()
+            self._async_http = None
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+
+    async def ensure_models_async(self) -> List[str]:
+        """Known models; loaded through the shared catalog refresh if none are yet"""
+        if not self.available_models and self.model_catalog is not None:
+            await self.model_catalog.ensure(self.name)
+        return self.available_models
+
+    def chat_models(self) -> List[str]:
+        """Available models that match preferred_models (in that order) and can serve chat"""
+        usable = [m for m in self.available_models if not any(x in m.lower() for x in NON_CHAT_MODELS)]
+        ranked: List[str] = []
+        for preferred in self.preferred_models:
+            ranked += [m for m in usable if preferred in m.lower() and m not in ranked]
+        return ranked
+
+    # ------------------------------------------------------------------
+    # Messages
+    # ------------------------------------------------------------------
+
+    def _message_template(self, language: str) -> Tuple[str, str, str]:
+        """(system content, user prefix, user suffix) for a language, rendered once"""
+        template = self._templates.get(language)
+        if template is None:
+            system_prompt = SYSTEM_PROMPTS.get(
+                language.lower(),
+                f"You are an expert {language} developer. Generate clean, well-documented code."
+            )
+            template = (
+                f"{system_prompt}\n\n{CODE_ONLY}",
+                f"Generate {language} code for: ",
+                "\n\nReturn ONLY the code itself. No text before or after."
+            )
+            self._templates[language] = template
+        return template
+
+    def _build_messages(self, prompt: str, language: str, examples: Optional[str] = None) -> List[Dict]:
+        """Build the chat messages for a code generation request (plus optional few-shot examples)"""
+        system_content, user_prefix, user_suffix = self._message_template(language)
+        if examples:
+            system_content = f"{system_content}\n\n{examples}"
+        return [
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": user_prefix + prompt + user_suffix}
+        ]
+
+    def _estimate_tokens(self, messages: List[Dict], max_tokens: int) -> int:
+        """Rough token cost of a request (~4 characters per token) for the token bucket"""
+        return sum(len(m["content"]) for m in messages) // 4 + max_tokens
+
+    # ------------------------------------------------------------------
+    # Results and instrumentation
+    # ------------------------------------------------------------------
+
+    def _record(self, success: bool, time_ms: int, error: Optional[str] = None):
+        self.requests += 1
+        self.total_time_ms += time_ms
+        if not success:
+            self.failures += 1
+            self.last_error = error
+
+    def _success_result(self, raw_output: str, model: str, start_time: float) -> Dict:
+        """Build the result dict for a successful generation (start_time from time.perf_counter())"""
+        time_ms = int((time.perf_counter() - start_time) * 1000)
+        self._record(True, time_ms)
+        return {
+            "success": True,
+            "code": extract_clean_code(raw_output),
+            "raw_output": raw_output,
+            "time_ms": time_ms,
+            "model": model,
+            "error": None
+        }
+
+    def _error_result(self, error: str, model: Optional[str] = None, start_time: Optional[float] = None) -> Dict:
+        """Build the result dict for a failed generation"""
+        time_ms = int((time.perf_counter() - start_time) * 1000) if start_time else 0
+        self._record(False, time_ms, error)
+        return {
+            "success": False,
+            "code": "",
+            "raw_output": "",
+            "time_ms": time_ms,
+            "model": model,
+            "error": error
+        }
+
+    # ------------------------------------------------------------------
+    # Streaming
+    # ------------------------------------------------------------------
+
+    def _chunk_text(self, chunk) -> str:
+        """Text content of one upstream stream chunk"""
+        raise NotImplementedError
+
+    def _complete_event(self, extractor: StreamingCodeExtractor, model: Optional[str], start_time: float) -> Dict:
+        """Final stream event: who answered, how long it took, and the raw text (for persistence)"""
+        time_ms = int((time.perf_counter() - start_time) * 1000)
+        self._record(True, time_ms)
+        return {
+            "type": "complete",
+            "provider": self.name,
+            "model": model,
+            "time_ms": time_ms,
+            "raw_output": extractor.raw_output
+        }
+
+    def _stream_events(self, stream: Iterable, start_time: float, model: Optional[str] = None):
+        """Clean code events for a blocking upstream stream"""
+        extractor = StreamingCodeExtractor()
+        for chunk in stream:
+            content = self._chunk_text(chunk)
+            if content:
+                yield from extractor.feed(content)
+        yield from extractor.finish()
+        yield self._complete_event(extractor, model, start_time)
+
+    async def _stream_events_async(self, stream, start_time: float, model: Optional[str] = None):
+        """Clean code events for an async upstream stream"""
+        extractor = StreamingCodeExtractor()
+        try:
+            async for chunk in stream:
+                content = self._chunk_text(chunk)
+                if content:
+                    for event in extractor.feed(content):
+                        yield event
+        finally:
+            # A cancelled consumer (client cancel / disconnect) aborts the upstream response
+            close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+            if close is not None:
+                await close()
+        for event in extractor.finish():
+            yield event
+        yield self._complete_event(extractor, model, start_time)
+
+    def _stream_error(self, error: Exception, start_time: float) -> Dict:
+        self._record(False, int((time.perf_counter() - start_time) * 1000), str(error))
+        return {"type": "error", "content": str(error)}
+
+    def get_stats(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "avg_time_ms": self.total_time_ms / self.requests if self.requests else 0.0,
+            "last_error": self.last_error,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "keepalive_connections": self.keepalive_connections,
+            "pools_open": [kind for kind, pool in (("sync", self._http), ("async", self._async_http)) if pool],
+        }
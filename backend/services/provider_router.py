@@ -0,0 +1,546 @@
+"""
+Provider Router Service
+Routes generation requests across Groq, OpenAI and Ollama.
+
+Each provider's latency (EWMA and p95) and error rate are tracked from live
+traffic. Requests go to the fastest healthy provider, fail over to the next
+one on error, and may be hedged to a second provider once the primary has
+been running longer than a tail-latency threshold. Providers that keep
+failing are taken out of rotation by a circuit breaker.
+
+Hedging is opt-in (ROUTER_HEDGING or per request). The hedge fires once the
+primary has run longer than a configurable percentile of its recent
+latency; the duplicate goes to the next provider or, with a single
+provider, to a second model. The first success wins, the other call is
+cancelled, and every hedge is counted so its cost can be measured.
+"""
+
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from contextlib import aclosing
+from typing import Dict, List, Optional, Tuple
+
+
+class ProviderStats:
+    """Rolling latency / error statistics and circuit breaker for one provider"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        ewma_alpha: float = 0.2,
+        window: int = 200,
+        failure_threshold: int = 5,
+        error_rate_threshold: float = 0.5,
+        cooldown_seconds: float = 30.0
+    ):
+        self.name = name
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.cooldown_seconds = cooldown_seconds
+
+        self.ewma_ms: Optional[float] = None
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window // 4)  # True = success
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def record_success(self, latency_ms: Optional[float] = None):
+        self.requests += 1
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        self.state = self.CLOSED
+
+        if latency_ms is not None:
+            self.latencies.append(latency_ms)
+            if self.ewma_ms is None:
+                self.ewma_ms = latency_ms
+            else:
+                self.ewma_ms = self.ewma_alpha * latency_ms + (1 - self.ewma_alpha) * self.ewma_ms
+
+    def record_failure(self):
+        self.requests += 1
+        self.failures += 1
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+
+        if self.state == self.HALF_OPEN or self._should_trip():
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def _should_trip(self) -> bool:
+        if self.consecutive_failures >= self.failure_threshold:
+            return True
+        # Only judge the error rate once there is a meaningful sample
+        if len(self.outcomes) >= self.failure_threshold * 2:
+            return self.error_rate() >= self.error_rate_threshold
+        return False
+
+    def is_available(self) -> bool:
+        """Closed circuits take traffic; open ones let a single probe through after the cooldown"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            self.state = self.HALF_OPEN
+        return self.state == self.HALF_OPEN and not self._probe_in_flight
+
+    def begin_request(self):
+        """Mark the half-open probe as taken so concurrent requests skip this provider"""
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = True
+
+    def abandon_request(self):
+        """A request that ended without an outcome (losing hedge, abandoned stream) frees the probe"""
+        self._probe_in_flight = False
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def p95(self) -> Optional[float]:
+        return self.percentile(95)
+
+    def score(self) -> float:
+        """Lower is better: expected latency inflated by the error rate"""
+        # Providers without samples score 0 so they get explored first
+        return (self.ewma_ms or 0.0) / max(1e-3, 1.0 - self.error_rate())
+
+    def to_dict(self) -> Dict:
+        return {
+            "provider": self.name,
+            "state": self.state,
+            "ewma_ms": round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            "p95_ms": self.p95(),
+            "error_rate": round(self.error_rate(), 3),
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class ProviderRouter:
+    """Latency-aware router exposing the same interface as the provider services"""
+
+    def __init__(
+        self,
+        providers: Dict[str, object],
+        hedge_after_ms: Optional[float] = None,
+        failure_threshold: int = 5,
+        cooldown_seconds: float = 30.0,
+        explore_ratio: float = 0.05,
+        hedging: Optional[bool] = None,
+        hedge_percentile: float = 95.0,
+        hedge_min_samples: int = 20,
+        provider_concurrency: Optional[Dict[str, int]] = None
+    ):
+        self.providers = providers
+        # Optional cap on concurrent upstream calls per provider
+        self.limits: Dict[str, asyncio.Semaphore] = {
+            name: asyncio.Semaphore(limit)
+            for name, limit in (provider_concurrency or {}).items()
+            if name in providers
+        }
+        self.hedge_after_ms = hedge_after_ms
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        # A static threshold alone also switches hedging on (previous behaviour)
+        self.hedging = hedging if hedging is not None else hedge_after_ms is not None
+        self.explore_ratio = explore_ratio
+        self.stats: Dict[str, ProviderStats] = {
+            name: ProviderStats(
+                name,
+                failure_threshold=failure_threshold,
+                cooldown_seconds=cooldown_seconds
+            )
+            for name in providers
+        }
+        self.hedges_started = 0
+        self.hedges_won = 0
+        self.hedges_cancelled = 0
+        self.hedged_requests = 0
+        self.total_requests = 0
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+
+    def rank(self, explore: bool = False) -> List[str]:
+        """Provider names ordered by score, healthy ones only"""
+        ordered = sorted(self.providers, key=lambda name: self.stats[name].score())
+        ranked = [name for name in ordered if self.stats[name].is_available()]
+
+        # Occasionally promote a slower provider so its stats stay fresh
+        # and a recovered provider can win traffic back
+        if explore and len(ranked) > 1 and random.random() < self.explore_ratio:
+            ranked.insert(0, ranked.pop(random.randrange(1, len(ranked))))
+        return ranked
+
+    def select_best_model(self) -> Optional[str]:
+        """Model of the provider that would currently be picked"""
+        ranked = self.rank() or list(self.providers)
+        if not ranked:
+            return None
+        return self.providers[ranked[0]].select_best_model()
+
+    async def check_availability_async(self) -> Tuple[bool, List[str]]:
+        """Check every provider concurrently; available if any one is"""
+        names = list(self.providers)
+        results = await asyncio.gather(
+            *(self.providers[name].check_availability_async() for name in names),
+            return_exceptions=True
+        )
+
+        any_available = False
+        models: List[str] = []
+        for name, result in zip(names, results):
+            if isinstance(result, Exception) or not result[0]:
+                continue
+            any_available = True
+            models.extend(result[1])
+        return any_available, models
+
+    async def _call(self, name: str, **kwargs) -> Dict:
+        """Call one provider and record the outcome"""
+        limit = self.limits.get(name)
+        if limit is not None:
+            await limit.acquire()
+
+        self.stats[name].begin_request()
+        start = time.perf_counter()
+        try:
+            result = await self.providers[name].generate_code_async(**kwargs)
+        except asyncio.CancelledError:
+            # A losing hedge: neither a success nor a failure
+            self.stats[name].abandon_request()
+            raise
+        except Exception as e:
+            result = {
+                "success": False,
+                "code": "",
+                "raw_output": "",
+                "time_ms": int((time.perf_counter() - start) * 1000),
+                "model": kwargs.get("model"),
+                "error": str(e)
+            }
+        finally:
+            if limit is not None:
+                limit.release()
+
+        if result["success"]:
+            self.stats[name].record_success((time.perf_counter() - start) * 1000)
+        else:
+            self.stats[name].record_failure()
+        return {**result, "provider": name}
+
+    def hedge_delay_ms(self, name: str) -> Optional[float]:
+        """
+        How long to wait for a provider before hedging: the configured
+        percentile of its recent latency, or the static threshold while
+        there are too few samples
+        """
+        stats = self.stats[name]
+        if len(stats.latencies) >= self.hedge_min_samples:
+            return stats.percentile(self.hedge_percentile)
+        return self.hedge_after_ms
+
+    def _hedge_target(
+        self,
+        primary: str,
+        candidates: List[str],
+        model: Optional[str]
+    ) -> Optional[Tuple[str, Optional[str]]]:
+        """Pick (provider, model) for the duplicate request"""
+        # Prefer a different provider (independent failure domain)
+        if model is None and candidates:
+            return candidates[0], None
+
+        # Otherwise a second chat model on the same provider (never e.g. a speech or guard model)
+        service = self.providers[primary]
+        primary_model = model or service.select_best_model()
+        alternate = next((m for m in service.chat_models() if m != primary_model), None)
+        if alternate:
+            return primary, alternate
+        return None
+
+    async def _call_hedged(
+        self,
+        primary: str,
+        backup: Optional[Tuple[str, Optional[str]]],
+        hedge: bool,
+        **kwargs
+    ) -> Dict:
+        """Call primary; if it is slower than the hedge delay, race it against backup"""
+        primary_task = asyncio.ensure_future(self._call(primary, **kwargs))
+        delay_ms = self.hedge_delay_ms(primary) if hedge and backup else None
+        if delay_ms is None:
+            return await primary_task
+
+        done, _ = await asyncio.wait({primary_task}, timeout=delay_ms / 1000)
+        if done:
+            return primary_task.result()
+
+        self.hedges_started += 1
+        backup_name, backup_model = backup
+        backup_kwargs = {**kwargs, "model": backup_model} if backup_model else kwargs
+        backup_task = asyncio.ensure_future(self._call(backup_name, **backup_kwargs))
+        hedge_info = {
+            "hedged": True,
+            "hedge_delay_ms": int(delay_ms),
+            "hedge_target": f"{backup_name}:{backup_model}" if backup_model else backup_name
+        }
+
+        pending = {primary_task, backup_task}
+        result = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    candidate = task.result()
+                    if candidate["success"]:
+                        winner = "backup" if task is backup_task else "primary"
+                        if winner == "backup":
+                            self.hedges_won += 1
+                        return {**candidate, **hedge_info, "hedge_winner": winner}
+                    result = candidate
+            return {**result, **hedge_info, "hedge_winner": None}
+        finally:
+            for task in pending:
+                self.hedges_cancelled += 1
+                task.cancel()
+
+    async def generate_code_async(
+        self,
+        prompt: str,
+        language: str,
+        model: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        hedge: Optional[bool] = None,
+        examples: Optional[str] = None
+    ) -> Dict:
+        """
+        Generate code on the fastest healthy provider, failing over on error
+
+        Args:
+            hedge: race a duplicate request once the primary is slow
+                   (None uses the router default)
+            examples: few-shot context appended to the system prompt
+
+        Returns:
+            Dict with keys: success, code, raw_output, time_ms, model, error, provider
+            plus hedged / hedge_winner / hedge_delay_ms / hedge_target when hedged
+        """
+        kwargs = dict(
+            prompt=prompt,
+            language=language,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            examples=examples
+        )
+
+        ranked = self.rank(explore=True)
+        if not ranked:
+            return {
+                "success": False,
+                "code": "",
+                "raw_output": "",
+                "time_ms": 0,
+                "model": None,
+                "error": "No healthy provider available",
+                "provider": None
+            }
+
+        self.total_requests += 1
+        hedge = self.hedging if hedge is None else hedge
+
+        result = None
+        tried = set()
+        for index, name in enumerate(ranked):
+            if name in tried:
+                continue
+            candidates = [n for n in ranked[index + 1:] if n not in tried]
+            backup = self._hedge_target(name, candidates, model) if hedge else None
+            result = await self._call_hedged(name, backup, hedge, **kwargs)
+            tried.add(name)
+            if result.get("hedged"):
+                self.hedged_requests += 1
+                tried.add(backup[0])
+            if result["success"]:
+                return result
+            # Pinned models are provider specific: do not fail over
+            if model is not None:
+                break
+        return result
+
+    async def stream_generate_async(
+        self,
+        prompt: str,
+        language: str,
+        model: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 1000
+    ):
+        """Stream from the best healthy provider; fail over if it errors before the first chunk"""
+        ranked = self.rank(explore=True)
+        if not ranked:
+            yield {"type": "error", "content": "No healthy provider available"}
+            return
+
+        for name in ranked:
+            self.stats[name].begin_request()
+            emitted = False
+            failed = None
+            try:
+                # aclosing: an abandoned stream closes the provider's upstream response now
+                async with aclosing(self.providers[name].stream_generate_async(
+                    prompt, language, model, temperature, max_tokens
+                )) as stream:
+                    async for chunk in stream:
+                        if chunk["type"] == "error":
+                            failed = chunk
+                            break
+                        emitted = True
+                        yield chunk
+            except (GeneratorExit, asyncio.CancelledError):
+                # Consumer went away (disconnect, cancel, eviction): no outcome,
+                # but a half-open probe must not stay taken forever
+                self.stats[name].abandon_request()
+                raise
+
+            if failed is None:
+                self.stats[name].record_success()
+                return
+
+            self.stats[name].record_failure()
+            if emitted or model is not None:
+                yield failed
+                return
+
+        yield failed
+
+    async def aclose(self):
+        """Release every provider's pooled connections"""
+        for provider in self.providers.values():
+            if hasattr(provider, "aclose"):
+                await provider.aclose()
+
+    def get_stats(self) -> Dict:
+        return {
+            "providers": [self.stats[name].to_dict() for name in self.providers],
+            "clients": {
+                name: provider.get_stats()
+                for name, provider in self.providers.items() if hasattr(provider, "get_stats")
+            },
+            "ranking": self.rank(),
+            "hedging": {
+                "enabled": self.hedging,
+                "percentile": self.hedge_percentile,
+                "fallback_after_ms": self.hedge_after_ms,
+                "current_delay_ms": {name: self.hedge_delay_ms(name) for name in self.providers},
+                "started": self.hedges_started,
+                "won_by_backup": self.hedges_won,
+                "cancelled": self.hedges_cancelled,
+                # Extra upstream calls per request: the cost side of the tradeoff
+                "hedge_rate": self.hedges_started / self.total_requests if self.total_requests else 0.0,
+            },
+        }
+
+
+def _load_provider(name: str):
+    """
+    Import a provider singleton on demand. Provider modules do not import
+    their SDK; a missing optional SDK is detected without importing it.
+    """
+    try:
+        if name == "groq":
+            from backend.services.groq_service import groq_service as provider
+        elif name == "openai":
+            from backend.services.openai_service import openai_service as provider
+        elif name == "ollama":
+            from backend.services.ollama_service import ollama_service as provider
+        else:
+            print(f"⚠️ Unknown provider '{name}'")
+            return None
+    except ImportError as e:
+        print(f"⚠️ Provider '{name}' unavailable: {e}")
+        return None
+    if not provider.sdk_installed():
+        print(f"⚠️ Provider '{name}' unavailable: the '{provider.sdk}' package is not installed")
+        return None
+    return provider
+
+
+def create_provider_router() -> ProviderRouter:
+    """
+    Build the router from environment settings:
+        ROUTER_PROVIDERS          comma separated, e.g. "groq,openai,ollama"
+                                  (default: groq, plus openai if OPENAI_API_KEY
+                                  and ollama if OLLAMA_BASE_URL are set)
+        ROUTER_HEDGING            "1" to hedge requests by default
+        ROUTER_HEDGE_PERCENTILE   hedge once a call exceeds this latency percentile
+        ROUTER_HEDGE_AFTER_MS     hedge threshold used until enough samples exist
+        ROUTER_FAILURE_THRESHOLD  consecutive failures before the circuit opens
+        ROUTER_COOLDOWN_SECONDS   how long an open circuit rejects traffic
+        ROUTER_EXPLORE_RATIO      share of requests sent to a non-best provider
+        ROUTER_PROVIDER_CONCURRENCY  per-provider in-flight caps, e.g. "groq:8,openai:16"
+    """
+    configured = os.getenv("ROUTER_PROVIDERS")
+    if configured:
+        names = [n.strip().lower() for n in configured.split(",") if n.strip()]
+    else:
+        names = ["groq"]
+        if os.getenv("OPENAI_API_KEY"):
+            names.append("openai")
+        if os.getenv("OLLAMA_BASE_URL"):
+            names.append("ollama")
+
+    providers = {}
+    for name in names:
+        service = _load_provider(name)
+        if service is not None:
+            providers[name] = service
+
+    provider_concurrency = {}
+    for entry in os.getenv("ROUTER_PROVIDER_CONCURRENCY", "").split(","):
+        if ":" in entry:
+            name, limit = entry.split(":", 1)
+            provider_concurrency[name.strip().lower()] = int(limit)
+
+    hedge_after_ms = os.getenv("ROUTER_HEDGE_AFTER_MS")
+    hedging = os.getenv("ROUTER_HEDGING")
+    return ProviderRouter(
+        providers,
+        hedge_after_ms=float(hedge_after_ms) if hedge_after_ms else None,
+        hedging=hedging.lower() in ("1", "true", "yes") if hedging else None,
+        hedge_percentile=float(os.getenv("ROUTER_HEDGE_PERCENTILE", "95")),
+        failure_threshold=int(os.getenv("ROUTER_FAILURE_THRESHOLD", "5")),
+        cooldown_seconds=float(os.getenv("ROUTER_COOLDOWN_SECONDS", "30")),
+        explore_ratio=float(os.getenv("ROUTER_EXPLORE_RATIO", "0.05")),
+        provider_concurrency=provider_concurrency
+    )
+
+
+# Singleton instance
+provider_router = create_provider_router()
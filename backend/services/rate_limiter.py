@@ -0,0 +1,313 @@
+"""
+Upstream Rate Limiting
+Per-provider, per-model limiters that keep us just under provider quotas.
+
+Each (provider, model) pair gets:
+  - token buckets for requests and tokens, re-synced from the provider's
+    x-ratelimit-* response headers
+  - an AIMD (additive-increase / multiplicative-decrease) concurrency limit
+    that grows slowly while calls succeed and halves on a 429
+  - retries of throttled calls with jittered exponential backoff, honouring
+    Retry-After when the provider sends it
+
+Streaming calls hold their concurrency slot until the stream is closed
+(ProviderRateLimiter.hold), not just until the response headers arrive.
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import inspect
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse provider reset durations such as '2m59.56s', '7.66s', '250ms' or '12' into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+def _header_int(headers, name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """Async token bucket; rate None means unlimited until told otherwise"""
+
+    def __init__(self, rate_per_second: Optional[float] = None, capacity: Optional[float] = None):
+        self.rate = rate_per_second
+        self.capacity = capacity or (rate_per_second * 60 if rate_per_second else None)
+        self.tokens = self.capacity or 0.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """Take tokens, sleeping until they are available. Returns seconds waited"""
+        waited = 0.0
+        while self.rate:
+            self._refill()
+            amount = min(amount, self.capacity)
+            if self.tokens >= amount:
+                self.tokens -= amount
+                break
+            delay = (amount - self.tokens) / self.rate
+            waited += delay
+            await asyncio.sleep(delay)
+        return waited
+
+    def sync(self, limit: Optional[int], remaining: Optional[int], reset_seconds: Optional[float]):
+        """
+        Align with the provider's view: `remaining` tokens left, bucket
+        fully replenished to `limit` after `reset_seconds`
+        """
+        if limit is None or remaining is None:
+            return
+        self._refill()
+        self.capacity = float(limit)
+        self.tokens = float(min(remaining, limit))
+        if reset_seconds and reset_seconds > 0 and limit > remaining:
+            self.rate = (limit - remaining) / reset_seconds
+        elif self.rate is None:
+            self.rate = limit / 60.0
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit: +1 per window of successes, halve on throttling"""
+
+    def __init__(
+        self,
+        initial: float = 8,
+        minimum: float = 1,
+        maximum: float = 64,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 1.0
+    ):
+        self.limit = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        # Additive increase: roughly +1 once `limit` calls have succeeded
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_throttle(self):
+        # Multiplicative decrease, at most once per cooldown so one burst
+        # of 429s does not collapse the limit to the floor
+        now = time.monotonic()
+        if now - self._last_decrease >= self.decrease_cooldown:
+            self.limit = max(self.minimum, self.limit * self.decrease_factor)
+            self._last_decrease = now
+
+
+class ProviderRateLimiter:
+    """Request/token buckets, AIMD concurrency and throttle retries for one (provider, model)"""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        initial_concurrency: int = 8,
+        max_concurrency: int = 64,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0
+    ):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute / 60.0 if requests_per_minute else None)
+        self.tokens = TokenBucket(tokens_per_minute / 60.0 if tokens_per_minute else None)
+        self.concurrency = AdaptiveConcurrencyLimiter(initial=initial_concurrency, maximum=max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.calls = 0
+        self.throttled = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+
+    async def acquire(self, tokens: int = 0):
+        await self.concurrency.acquire()
+        try:
+            self.wait_seconds += await self.requests.acquire(1)
+            if tokens:
+                self.wait_seconds += await self.tokens.acquire(tokens)
+        except BaseException:
+            await self.concurrency.release()
+            raise
+
+    async def release(self):
+        await self.concurrency.release()
+
+    def update_from_headers(self, headers):
+        """Re-sync the buckets from x-ratelimit-* response headers"""
+        if not headers:
+            return
+        self.requests.sync(
+            _header_int(headers, "x-ratelimit-limit-requests"),
+            _header_int(headers, "x-ratelimit-remaining-requests"),
+            parse_duration(headers.get("x-ratelimit-reset-requests"))
+        )
+        self.tokens.sync(
+            _header_int(headers, "x-ratelimit-limit-tokens"),
+            _header_int(headers, "x-ratelimit-remaining-tokens"),
+            parse_duration(headers.get("x-ratelimit-reset-tokens"))
+        )
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after + random.uniform(0, self.base_delay))
+        return delay
+
+    async def run(self, call: Callable[[], Awaitable[Any]], tokens: int = 0, keep_slot: bool = False) -> Any:
+        """
+        Run an upstream call under the limiter. `call` must return a raw
+        response exposing `.headers`. Throttled calls (HTTP 429) are retried
+        with backoff; any other error is raised to the caller untouched.
+        keep_slot=True leaves the concurrency slot taken after a successful
+        call; the caller must release() it (see hold()).
+        """
+        attempt = 0
+        while True:
+            await self.acquire(tokens)
+            held = False
+            try:
+                self.calls += 1
+                response = await call()
+            except Exception as e:
+                throttled, headers = is_throttle_error(e)
+                if not throttled:
+                    raise
+                self.throttled += 1
+                self.concurrency.on_throttle()
+                self.update_from_headers(headers)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, parse_duration(headers.get("retry-after") if headers else None))
+            else:
+                self.concurrency.on_success()
+                self.update_from_headers(getattr(response, "headers", None))
+                held = keep_slot
+                return response
+            finally:
+                if not held:
+                    await self.release()
+
+            attempt += 1
+            self.retries += 1
+            self.wait_seconds += delay
+            await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def hold(self, call: Callable[[], Awaitable[Any]], tokens: int = 0):
+        """
+        run() for streaming calls: the concurrency slot stays taken while the
+        block runs, i.e. until the stream body is consumed or closed
+        """
+        response = await self.run(call, tokens, keep_slot=True)
+        try:
+            yield response
+        finally:
+            await self.release()
+
+    def get_stats(self) -> Dict:
+        return {
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+            "requests_per_second": self.requests.rate,
+            "tokens_per_second": self.tokens.rate,
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+
+def is_throttle_error(error: Exception) -> Tuple[bool, Optional[Any]]:
+    """(is HTTP 429, response headers) for SDK errors from groq/openai/httpx"""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    headers = getattr(response, "headers", None)
+    return status == 429, headers
+
+
+async def parse_raw_response(raw: Any) -> Any:
+    """Parse an SDK raw response (sync parse() in openai, async in groq)"""
+    parsed = raw.parse()
+    if inspect.isawaitable(parsed):
+        parsed = await parsed
+    return parsed
+
+
+class RateLimitRegistry:
+    """One ProviderRateLimiter per (provider, model)"""
+
+    def __init__(self):
+        self._limiters: Dict[Tuple[str, str], ProviderRateLimiter] = {}
+
+    def get(self, provider: str, model: Optional[str]) -> ProviderRateLimiter:
+        key = (provider, model or "default")
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            prefix = f"RATE_LIMIT_{provider.upper()}"
+            rpm = os.getenv(f"{prefix}_RPM")
+            tpm = os.getenv(f"{prefix}_TPM")
+            limiter = ProviderRateLimiter(
+                f"{provider}:{key[1]}",
+                requests_per_minute=float(rpm) if rpm else None,
+                tokens_per_minute=float(tpm) if tpm else None,
+                initial_concurrency=int(os.getenv("RATE_LIMIT_INITIAL_CONCURRENCY", "8")),
+                max_concurrency=int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "64")),
+                max_retries=int(os.getenv("RATE_LIMIT_MAX_RETRIES", "4"))
+            )
+            self._limiters[key] = limiter
+        return limiter
+
+    def get_stats(self) -> Dict:
+        return {limiter.name: limiter.get_stats() for limiter in self._limiters.values()}
+
+
+# Singleton instance
+rate_limits = RateLimitRegistry()
@@ -0,0 +1,283 @@
+"""
+Response Cache Service
+Content-addressed cache for deterministic code generations.
+
+Keys are a SHA-256 of (prompt, language, model, temperature, max_tokens).
+Two pluggable backends are provided: an in-process LRU/TTL dictionary and a
+SQLite table (`response_cache`) that lives next to `model_outputs`.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+
+def make_cache_key(
+    prompt: str,
+    language: str,
+    model: Optional[str],
+    temperature: float,
+    max_tokens: int,
+    few_shot: bool = False,
+    hedge: bool = False
+) -> str:
+    """Build a stable content address for a generation request (few-shot / hedged requests get their own)"""
+    fields = [prompt, language.lower(), model or "", round(float(temperature), 4), int(max_tokens)]
+    if few_shot or hedge:
+        fields += [bool(few_shot), bool(hedge)]
+    payload = json.dumps(fields, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with per-entry TTL"""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """
+    Cache stored in the `response_cache` table of the application database.
+    Lookups read on their own session (blocking: async callers run them on a
+    worker thread); every write (hit counters, inserts, eviction) is queued
+    as a job on the database writer and not waited for.
+    """
+
+    blocking = True
+
+    # Run the (COUNT + DELETE) eviction pass only every N writes
+    EVICT_EVERY = 64
+
+    def __init__(self, session_factory=None, writer=None, max_entries: int = 10000, ttl_seconds: int = 86400):
+        if session_factory is None:
+            from backend.database.connection import SessionLocal
+            session_factory = SessionLocal
+        if writer is None:
+            from backend.database.connection import db_writer
+            writer = db_writer
+
+        self.session_factory = session_factory
+        self.writer = writer
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        from sqlalchemy import func
+        from backend.models.database_models import CachedResponse
+
+        db = self.session_factory()
+        try:
+            entry = db.get(CachedResponse, key)
+            if entry is None:
+                return None
+            expires_at, payload = entry.expires_at, entry.payload
+        finally:
+            db.close()
+
+        now = datetime.utcnow()
+        if expires_at and expires_at < now:
+            self._submit(lambda db: db.query(CachedResponse).filter(
+                CachedResponse.cache_key == key
+            ).delete(synchronize_session=False))
+            return None
+
+        # Recency/hit bookkeeping does not hold up the hit
+        self._submit(lambda db: db.query(CachedResponse).filter(
+            CachedResponse.cache_key == key
+        ).update({
+            CachedResponse.last_accessed: now,
+            CachedResponse.hit_count: func.coalesce(CachedResponse.hit_count, 0) + 1
+        }, synchronize_session=False))
+        return json.loads(payload)
+
+    def set(self, key: str, value: Dict):
+        from backend.models.database_models import CachedResponse
+
+        now = datetime.utcnow()
+        self._writes += 1
+        evict = self._writes % self.EVICT_EVERY == 0
+
+        def write(db):
+            db.merge(CachedResponse(
+                cache_key=key,
+                payload=json.dumps(value),
+                created_at=now,
+                last_accessed=now,
+                expires_at=now + timedelta(seconds=self.ttl_seconds),
+                hit_count=0
+            ))
+            if evict:
+                db.flush()
+                self._evict(db)
+
+        self._submit(write)
+
+    def _submit(self, job):
+        """Queue a write on the database writer; failures are only logged"""
+        self.writer.submit(job).add_done_callback(self._report)
+
+    @staticmethod
+    def _report(future):
+        if future.exception() is not None:
+            print(f"⚠️ Response cache write failed: {future.exception()}")
+
+    def _evict(self, db):
+        """Drop expired entries, then least recently used ones above max_entries"""
+        from backend.models.database_models import CachedResponse
+
+        db.query(CachedResponse).filter(
+            CachedResponse.expires_at < datetime.utcnow()
+        ).delete(synchronize_session=False)
+
+        overflow = db.query(CachedResponse).count() - self.max_entries
+        if overflow > 0:
+            stale_keys = [
+                key for (key,) in db.query(CachedResponse.cache_key).order_by(
+                    CachedResponse.last_accessed
+                ).limit(overflow)
+            ]
+            db.query(CachedResponse).filter(
+                CachedResponse.cache_key.in_(stale_keys)
+            ).delete(synchronize_session=False)
+
+    def clear(self):
+        from backend.models.database_models import CachedResponse
+
+        self.writer.run(lambda db: db.query(CachedResponse).delete())
+
+
+class ResponseCache:
+    """Policy layer in front of a cache backend"""
+
+    def __init__(self, backend=None, enabled: bool = True, near_duplicate_threshold: float = 0.0):
+        self.backend = backend
+        self.enabled = enabled and backend is not None
+        # Cosine similarity above which a highly rated past generation for a
+        # near-identical prompt is served on an exact miss (0 = off)
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.hits = 0
+        self.misses = 0
+        self.near_hits = 0
+
+    def should_use(self, temperature: float, requested: Optional[bool] = None) -> bool:
+        """
+        Caching is on by default for temperature 0 (deterministic output)
+        and opt-in above that.
+        """
+        if not self.enabled:
+            return False
+        if requested is not None:
+            return requested
+        return temperature == 0
+
+    async def get_async(self, key: str) -> Optional[Dict]:
+        """get() without blocking the event loop (database lookups run on a worker thread)"""
+        if getattr(self.backend, "blocking", False):
+            return await asyncio.to_thread(self.get, key)
+        return self.get(key)
+
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"⚠️ Response cache read failed: {e}")
+            value = None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, result: Dict):
+        """Store a successful generation result"""
+        if not result.get("success"):
+            return
+        try:
+            self.backend.set(key, {
+                "code": result["code"],
+                "raw_output": result["raw_output"],
+                "model": result["model"],
+                "time_ms": result["time_ms"],
+            })
+        except Exception as e:
+            print(f"⚠️ Response cache write failed: {e}")
+
+    def get_stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "near_duplicate_threshold": self.near_duplicate_threshold,
+            "near_duplicate_hits": self.near_hits,
+        }
+
+
+def create_response_cache() -> ResponseCache:
+    """
+    Build the cache from environment settings:
+        RESPONSE_CACHE_BACKEND      memory (default) | sqlite | off
+        RESPONSE_CACHE_MAX_ENTRIES  maximum number of cached responses
+        RESPONSE_CACHE_TTL_SECONDS  time-to-live for each entry
+        RESPONSE_CACHE_NEAR_DUPLICATE  similarity (0-1) for serving rated near-duplicates (default 0 = off)
+    """
+    backend_name = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+    max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+    ttl_seconds = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+    near_duplicate = float(os.getenv("RESPONSE_CACHE_NEAR_DUPLICATE", "0"))
+
+    if backend_name == "off":
+        return ResponseCache(backend=None, enabled=False)
+    if backend_name == "sqlite":
+        backend = SQLiteCacheBackend(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    else:
+        backend = MemoryCacheBackend(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    return ResponseCache(backend, near_duplicate_threshold=near_duplicate)
+
+
+# Singleton instance
+response_cache = create_response_cache()
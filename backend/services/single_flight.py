@@ -0,0 +1,165 @@
+"""
+Single-Flight Request Coalescing
+Concurrent identical generation requests share one upstream call.
+
+SingleFlight coalesces request/response calls: the first caller for a key
+starts the upstream task, later callers await the same task.
+
+StreamFlight does the same for streaming calls: the upstream stream is
+consumed once into a buffer, late joiners replay the buffered chunks and
+then follow the live ones.
+
+Only deterministic requests (see is_deterministic) may be coalesced: a
+sampled request sharing another caller's completion would lose its own
+sample. This is independent of the response cache setting.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+
+def is_deterministic(temperature: float) -> bool:
+    """True if identical requests must produce the same output (greedy decoding)"""
+    return float(temperature) == 0
+
+
+class SingleFlight:
+    """Attach concurrent calls with the same key to one in-flight task"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run fn() once per key at a time.
+
+        Returns:
+            (result, shared) where shared is True if this caller joined
+            a call started by someone else
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+
+        if shared:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+
+        # Shield so one caller going away does not cancel the shared call
+        result = await asyncio.shield(task)
+        return result, shared
+
+    def get_stats(self) -> Dict:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
+
+
+class _StreamCall:
+    """One upstream stream shared by any number of subscribers"""
+
+    def __init__(self):
+        self.chunks: List[Dict] = []
+        self.done = False
+        self.subscribers = 0
+        self.task: asyncio.Task = None
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: Dict):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self):
+        self.done = True
+        self._notify()
+
+    def _notify(self):
+        # Wake everyone waiting and arm a fresh event for the next chunk
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self):
+        await self._changed.wait()
+
+
+class StreamFlight:
+    """Coalesce concurrent identical streaming generations"""
+
+    def __init__(self):
+        self._calls: Dict[str, _StreamCall] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.replayed_chunks = 0
+
+    async def subscribe(
+        self,
+        key: str,
+        stream_factory: Callable[[], AsyncIterator[Dict]]
+    ) -> AsyncIterator[Dict]:
+        """
+        Yield the chunks of the stream for key, starting the upstream
+        stream only if no identical one is already running.
+        """
+        call = self._calls.get(key)
+
+        if call is None:
+            self.leaders += 1
+            call = _StreamCall()
+            self._calls[key] = call
+            call.task = asyncio.ensure_future(self._pump(key, call, stream_factory))
+        else:
+            self.coalesced += 1
+            self.replayed_chunks += len(call.chunks)
+
+        call.subscribers += 1
+        position = 0
+        try:
+            while True:
+                if position < len(call.chunks):
+                    yield call.chunks[position]
+                    position += 1
+                elif call.done:
+                    return
+                else:
+                    await call.wait()
+        finally:
+            call.subscribers -= 1
+            # Nobody is listening any more: stop paying for the upstream stream
+            if call.subscribers == 0 and not call.done:
+                call.task.cancel()
+
+    async def _pump(self, key: str, call: _StreamCall, stream_factory):
+        """Consume the upstream stream into the shared buffer"""
+        try:
+            async for chunk in stream_factory():
+                call.publish(chunk)
+        except asyncio.CancelledError:
+            call.publish({"type": "error", "content": "Stream cancelled"})
+            raise
+        except Exception as e:
+            call.publish({"type": "error", "content": str(e)})
+        finally:
+            # Late joiners after this point start a fresh stream
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            call.finish()
+
+    def get_stats(self) -> Dict:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "replayed_chunks": self.replayed_chunks,
+            "in_flight": len(self._calls),
+        }
+
+
+# Singleton instances
+generation_flight = SingleFlight()
+stream_flight = StreamFlight()
@@ -0,0 +1,215 @@
+"""
+Server-Sent Events Streaming
+Replay buffer and wire format for /api/generate/stream.
+
+A generation runs in its own task and every frame it produces is kept, in
+order, in a short-lived in-memory replay buffer; HTTP responses only follow
+that buffer. Each event id is "<stream_id>:<seq>", so when a connection
+drops the client (EventSource does this by itself) reconnects with a
+Last-Event-ID header and receives the frames after that one - the
+generation is neither restarted nor interrupted by the reconnect. A stream
+nobody is following for the resume grace period is cancelled; finished
+streams are kept for the replay TTL.
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+# Sent (as HTTP 410, or as an error event once a response has started) for a stream that is gone
+STREAM_EXPIRED = "Stream expired; start a new generation"
+
+
+class _Replay:
+    """Frames of one generation, in order, plus the clients following them"""
+
+    def __init__(self, cancel: Callable[[], None]):
+        self.frames: List[Dict] = []
+        self.done = False
+        self.followers = 0
+        self.cancel = cancel
+        self.finished_at = 0.0
+        self.task: Optional[asyncio.Task] = None
+        self.grace: Optional[asyncio.TimerHandle] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, frame: Dict):
+        self.frames.append(frame)
+        self._notify()
+
+    def finish(self):
+        self.done = True
+        self.finished_at = time.monotonic()
+        self._notify()
+
+    def _notify(self):
+        # Wake every follower and arm a fresh event for the next frame
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for a new frame; False on timeout"""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+def format_event(event_id: Optional[str], event: str, data: Dict) -> str:
+    """One SSE event (the JSON payload never contains raw newlines)"""
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+class SSEReplay:
+    """Run generations detached from their HTTP responses and replay their frames"""
+
+    def __init__(
+        self,
+        ttl_seconds: float = 60,
+        max_streams: int = 256,
+        grace_seconds: float = 15,
+        heartbeat_seconds: float = 15,
+        retry_ms: int = 2000
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_streams = max_streams
+        self.grace_seconds = grace_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.retry_ms = retry_ms
+        self._streams: Dict[str, _Replay] = {}
+        self.started = 0
+        self.resumed = 0
+        self.replayed_frames = 0
+        self.abandoned = 0
+        self.expired_resumes = 0
+
+    # ------------------------------------------------------------------
+    # Generations
+    # ------------------------------------------------------------------
+
+    def _evict(self):
+        """Drop finished streams past the TTL, then the oldest finished ones over the cap"""
+        now = time.monotonic()
+        for stream_id, replay in list(self._streams.items()):
+            if replay.done and now - replay.finished_at >= self.ttl_seconds:
+                del self._streams[stream_id]
+        finished = [stream_id for stream_id, replay in self._streams.items() if replay.done]
+        for stream_id in finished[:max(0, len(self._streams) - self.max_streams)]:
+            del self._streams[stream_id]
+
+    async def _record(self, replay: _Replay, frames: AsyncIterator[Dict]):
+        try:
+            async for frame in frames:
+                replay.publish(frame)
+        except Exception as e:
+            replay.publish({"type": "error", "content": str(e)})
+        finally:
+            replay.finish()
+
+    def start(self, frames: AsyncIterator[Dict], cancel: Callable[[], None]) -> str:
+        """Start recording a generation's frames; returns its stream id"""
+        self._evict()
+        stream_id = uuid.uuid4().hex[:16]
+        replay = _Replay(cancel)
+        self._streams[stream_id] = replay
+        replay.task = asyncio.ensure_future(self._record(replay, frames))
+        # Also covers a client that goes away before its response starts
+        replay.grace = asyncio.get_running_loop().call_later(self.grace_seconds, self._abandon, replay)
+        self.started += 1
+        return stream_id
+
+    def resume_point(self, last_event_id: str) -> Optional[Tuple[str, int]]:
+        """(stream id, last seq seen) for a Last-Event-ID, or None if the stream is gone"""
+        self._evict()
+        stream_id, _, seq = last_event_id.strip().rpartition(":")
+        if stream_id not in self._streams or not seq.isdigit():
+            self.expired_resumes += 1
+            return None
+        self.resumed += 1
+        return stream_id, int(seq)
+
+    def _abandon(self, replay: _Replay):
+        """Grace period over and still nobody following: stop paying for the generation"""
+        replay.grace = None
+        if replay.followers == 0 and not replay.done:
+            self.abandoned += 1
+            replay.cancel()
+
+    # ------------------------------------------------------------------
+    # Responses
+    # ------------------------------------------------------------------
+
+    async def stream(self, stream_id: str, after: int = -1) -> AsyncIterator[str]:
+        """SSE text for one connection: frames after seq `after`, then live ones"""
+        replay = self._streams.get(stream_id)
+        if replay is None:
+            # Evicted between resume_point() and the response starting
+            self.expired_resumes += 1
+            yield format_event(None, "error", {"type": "error", "status": 410, "content": STREAM_EXPIRED})
+            return
+        replay.followers += 1
+        if replay.grace is not None:
+            replay.grace.cancel()
+            replay.grace = None
+
+        position = after + 1
+        if position:
+            self.replayed_frames += max(0, len(replay.frames) - position)
+        try:
+            yield f"retry: {self.retry_ms}\n"
+            yield format_event(None, "start", {"stream_id": stream_id, "resumed_after": after})
+            while True:
+                if position < len(replay.frames):
+                    frame = replay.frames[position]
+                    yield format_event(f"{stream_id}:{position}", frame["type"], frame)
+                    position += 1
+                elif replay.done:
+                    return
+                elif not await replay.wait(self.heartbeat_seconds):
+                    # Comment line: keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+        finally:
+            replay.followers -= 1
+            if replay.followers == 0 and not replay.done:
+                replay.grace = asyncio.get_running_loop().call_later(
+                    self.grace_seconds, self._abandon, replay
+                )
+
+    def get_stats(self) -> Dict:
+        return {
+            "streams": len(self._streams),
+            "running": sum(1 for replay in self._streams.values() if not replay.done),
+            "started": self.started,
+            "resumed": self.resumed,
+            "replayed_frames": self.replayed_frames,
+            "expired_resumes": self.expired_resumes,
+            "abandoned": self.abandoned,
+        }
+
+
+def create_sse_replay() -> SSEReplay:
+    """
+    Build the replay buffer from environment settings:
+        SSE_REPLAY_TTL           seconds a finished stream can still be resumed (default 60)
+        SSE_REPLAY_MAX_STREAMS   finished streams kept at most (default 256)
+        SSE_RESUME_GRACE         seconds a stream keeps running with no client attached (default 15)
+        SSE_HEARTBEAT_SECONDS    keep-alive comment interval on idle streams (default 15)
+        SSE_RETRY_MS             reconnect delay suggested to EventSource clients (default 2000)
+    """
+    return SSEReplay(
+        ttl_seconds=float(os.getenv("SSE_REPLAY_TTL", "60")),
+        max_streams=int(os.getenv("SSE_REPLAY_MAX_STREAMS", "256")),
+        grace_seconds=float(os.getenv("SSE_RESUME_GRACE", "15")),
+        heartbeat_seconds=float(os.getenv("SSE_HEARTBEAT_SECONDS", "15")),
+        retry_ms=int(os.getenv("SSE_RETRY_MS", "2000"))
+    )
+
+
+# Singleton instance
+sse_replay = create_sse_replay()
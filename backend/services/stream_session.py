@@ -0,0 +1,298 @@
+"""
+Stream Session
+One streaming generation, from the shared upstream stream to the frames a
+client receives.
+
+A producer task follows the upstream stream (through StreamFlight when the
+session has a key, so identical concurrent deterministic streams share one
+provider call; a session without a key owns its stream) and feeds a
+bounded queue; when the client reads slower than the model writes, the
+producer waits instead of buffering without limit. The consumer side
+coalesces the many tiny deltas a model emits into frames: the first delta
+is sent at once (time to first token), later ones are merged for up to a
+short time window or until a frame reaches a size limit. cancel() stops the
+producer, which leaves the shared stream and aborts the upstream call once
+nobody else is following it. Each session measures its time to first token
+and output rate (timing()).
+
+Frames use the provider stream event types:
+    {"type": "content", "content": delta}      append to the code so far
+    {"type": "replace", "content": code}       the code so far is now this
+    {"type": "complete", "model", "provider", "time_ms"}
+    {"type": "error", "content": message}
+    {"type": "cancelled"}
+"""
+
+import os
+import time
+import asyncio
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from backend.services.single_flight import stream_flight
+
+TERMINAL_EVENTS = ("complete", "error", "cancelled")
+
+
+class StreamStats:
+    """Counters across all stream sessions"""
+
+    def __init__(self):
+        self.sessions = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.events = 0
+        self.frames = 0
+        self.backpressure_waits = 0
+        self.ttft_ms_total = 0.0
+        self.ttft_count = 0
+        self.decode_tokens = 0
+        self.decode_seconds = 0.0
+
+    def record_timing(self, timing: Dict):
+        if timing["ttft_ms"] is not None:
+            self.ttft_ms_total += timing["ttft_ms"]
+            self.ttft_count += 1
+        self.decode_tokens += timing["decode_tokens"]
+        self.decode_seconds += timing["decode_seconds"]
+
+    def get_stats(self) -> Dict:
+        return {
+            "sessions": self.sessions,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "events": self.events,
+            "frames": self.frames,
+            "events_per_frame": self.events / self.frames if self.frames else 0.0,
+            "backpressure_waits": self.backpressure_waits,
+            "avg_ttft_ms": self.ttft_ms_total / self.ttft_count if self.ttft_count else 0.0,
+            "tokens_per_second": self.decode_tokens / self.decode_seconds if self.decode_seconds else 0.0,
+        }
+
+
+class StreamSession:
+    """Upstream events -> bounded queue -> coalesced frames for one client"""
+
+    def __init__(
+        self,
+        key: Optional[str],
+        stream_factory: Callable[[], AsyncIterator[Dict]],
+        queue_size: int = 64,
+        coalesce_ms: float = 20,
+        frame_chars: int = 2048,
+        stats: Optional[StreamStats] = None
+    ):
+        self.key = key
+        self.stream_factory = stream_factory
+        self.coalesce_seconds = coalesce_ms / 1000
+        self.frame_chars = frame_chars
+        self.stats = stats or stream_stats
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self._producer: Optional[asyncio.Task] = None
+
+        self.code = ""
+        self.complete: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.cancelled = False
+        self.done = False
+        self.start_time = time.perf_counter()
+        self.first_frame_time: Optional[float] = None
+        self.first_frame_chars = 0
+        self.last_frame_time: Optional[float] = None
+
+    # ------------------------------------------------------------------
+    # Producer
+    # ------------------------------------------------------------------
+
+    async def _produce(self):
+        if self.key is None:
+            events = self.stream_factory()
+        else:
+            events = stream_flight.subscribe(self.key, self.stream_factory)
+        try:
+            async for event in events:
+                if self._queue.full():
+                    self.stats.backpressure_waits += 1
+                await self._queue.put(event)
+                if event["type"] in TERMINAL_EVENTS:
+                    return
+            await self._queue.put({"type": "error", "content": "Stream ended unexpectedly"})
+        finally:
+            # Leave the stream now (not at garbage collection), so a cancel
+            # aborts the upstream call as soon as nobody else follows it
+            await events.aclose()
+
+    def cancel(self):
+        """Abort the stream; the consumer receives a final "cancelled" frame"""
+        if self.done or self.cancelled:
+            return
+        self.cancelled = True
+        self._stop_producer()
+        # Drop what the client has not seen yet; the queue then has room for the terminal frame
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait({"type": "cancelled"})
+
+    def _stop_producer(self):
+        # Cancel once: a second cancel would interrupt the producer while it
+        # closes the upstream response, leaving the provider call running
+        if self._producer is not None and not self._producer.done() and not self._producer.cancelling():
+            self._producer.cancel()
+
+    # ------------------------------------------------------------------
+    # Consumer
+    # ------------------------------------------------------------------
+
+    async def _next_event(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        if not self._queue.empty():
+            event = self._queue.get_nowait()
+        elif timeout is None:
+            event = await self._queue.get()
+        elif timeout <= 0:
+            return None
+        else:
+            try:
+                event = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        self.stats.events += 1
+        return event
+
+    def _apply(self, frame: Dict):
+        if frame["type"] == "content":
+            self.code += frame["content"]
+        elif frame["type"] == "replace":
+            self.code = frame["content"]
+        elif frame["type"] == "complete":
+            self.complete = frame
+        elif frame["type"] == "error":
+            self.error = frame["content"]
+
+    def _finish(self, frame: Dict) -> Dict:
+        """Record the terminal frame and strip what only the server needs"""
+        self.done = True
+        self.stats.active -= 1
+        self.stats.record_timing(self.timing())
+        if frame["type"] == "complete":
+            self.stats.completed += 1
+            return {key: value for key, value in frame.items() if key != "raw_output"}
+        if frame["type"] == "cancelled":
+            self.stats.cancelled += 1
+        else:
+            self.stats.failed += 1
+        return frame
+
+    async def frames(self) -> AsyncIterator[Dict]:
+        """Yield coalesced frames until (and including) the terminal frame"""
+        self.stats.sessions += 1
+        self.stats.active += 1
+        self._producer = asyncio.ensure_future(self._produce())
+        loop = asyncio.get_running_loop()
+        first = True
+        pending: Optional[Dict] = None
+        try:
+            while True:
+                event = pending or await self._next_event()
+                pending = None
+                if event["type"] in TERMINAL_EVENTS:
+                    self._apply(event)
+                    self.stats.frames += 1
+                    yield self._finish(event)
+                    return
+
+                frame = dict(event)
+                # The first delta goes out alone; later ones are merged for a short window
+                deadline = loop.time() + (0 if first else self.coalesce_seconds)
+                first = False
+                while len(frame["content"]) < self.frame_chars:
+                    event = await self._next_event(deadline - loop.time())
+                    if event is None:
+                        break
+                    if event["type"] == "content":
+                        frame["content"] += event["content"]
+                    elif event["type"] == "replace":
+                        frame = dict(event)
+                    else:
+                        pending = event
+                        break
+
+                self._apply(frame)
+                self.stats.frames += 1
+                self.last_frame_time = time.perf_counter()
+                if self.first_frame_time is None:
+                    self.first_frame_time = self.last_frame_time
+                    self.first_frame_chars = len(self.code)
+                yield frame
+        finally:
+            if not self.done:
+                # Consumer went away mid-stream (e.g. the client disconnected)
+                self.cancel()
+                self._finish({"type": "cancelled"})
+            self._stop_producer()
+
+    def timing(self) -> Dict:
+        """
+        Time to first token (first code frame) and output rate after it: the
+        code that arrived after the first frame over the time between the
+        first and the last code frame. With a single code frame there is no
+        rate to measure (tokens_per_second is None). Tokens are estimated at
+        ~4 characters each, like the rate limiter does.
+        """
+        raw_output = (self.complete or {}).get("raw_output") or self.code
+        tokens = len(raw_output) // 4
+        if self.first_frame_time is None:
+            return {"ttft_ms": None, "tokens": tokens, "tokens_per_second": None,
+                    "decode_tokens": 0, "decode_seconds": 0.0}
+        decode_seconds = self.last_frame_time - self.first_frame_time
+        decode_tokens = max(0, len(self.code) - self.first_frame_chars) // 4
+        if decode_seconds <= 0:
+            decode_tokens, decode_seconds = 0, 0.0
+        return {
+            "ttft_ms": round((self.first_frame_time - self.start_time) * 1000, 1),
+            "tokens": tokens,
+            "tokens_per_second": round(decode_tokens / decode_seconds, 1) if decode_seconds else None,
+            "decode_tokens": decode_tokens,
+            "decode_seconds": decode_seconds,
+        }
+
+    def result(self) -> Dict:
+        """Generation result in the shape run_generation() returns, for persistence"""
+        complete = self.complete or {}
+        if self.cancelled:
+            error = "Cancelled by client"
+        elif complete:
+            error = None
+        else:
+            error = self.error or "Stream ended unexpectedly"
+        return {
+            "success": error is None,
+            "code": self.code,
+            "raw_output": complete.get("raw_output", ""),
+            "time_ms": complete.get("time_ms", int((time.perf_counter() - self.start_time) * 1000)),
+            "model": complete.get("model"),
+            "provider": complete.get("provider"),
+            "error": error,
+        }
+
+
+def create_stream_session(key: Optional[str], stream_factory: Callable[[], AsyncIterator[Dict]]) -> StreamSession:
+    """
+    Build a session from environment settings (key=None: private upstream stream):
+        STREAM_QUEUE_SIZE     upstream events buffered per client before the producer waits (default 64)
+        STREAM_COALESCE_MS    window for merging deltas into one frame (default 20; 0 = only what is queued)
+        STREAM_FRAME_CHARS    a frame is sent once it reaches this many characters (default 2048)
+    """
+    return StreamSession(
+        key,
+        stream_factory,
+        queue_size=int(os.getenv("STREAM_QUEUE_SIZE", "64")),
+        coalesce_ms=float(os.getenv("STREAM_COALESCE_MS", "20")),
+        frame_chars=int(os.getenv("STREAM_FRAME_CHARS", "2048"))
+    )
+
+
+# Singleton instance (counters shared by every session)
+stream_stats = StreamStats()
@@ -0,0 +1,179 @@
+"""
+Columnar Analytics Benchmark
+Seeds a synthetic database and compares the dashboard slices computed by
+SQL aggregates (one query per slice) against the NumPy snapshot in
+backend/learning/analytics.py: cold load, warm compute, and an
+incremental refresh after new rows arrive. The NumPy results are checked
+against the SQL ones.
+
+Run from the project root:
+    python benchmarks/analytics.py                    # 10M outputs
+    python benchmarks/analytics.py --rows 1000000
+"""
+
+import argparse
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from query_plans import seed  # noqa: E402
+
+DAYS = 30
+
+
+def timed(label, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<34} {elapsed * 1000:>10.1f} ms")
+    return result, elapsed
+
+
+def sql_slices(db_path: Path, days: int, now: int):
+    """The same slices with one SQL aggregate each (percentiles via ORDER BY/OFFSET)"""
+    conn = sqlite3.connect(db_path)
+    since = "'" + time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now - days * 86400)) + "'"
+    feedback = (
+        f"FROM feedback f JOIN model_outputs o ON o.id = f.output_id WHERE f.created_at >= {since}"
+    )
+    slices = {
+        "overall": conn.execute(
+            f"SELECT AVG(f.rating), COUNT(*), SUM(f.rating >= 4), SUM(f.rating <= 2) {feedback}"
+        ).fetchone(),
+        "by_model": conn.execute(
+            f"SELECT o.model_name, AVG(f.rating), COUNT(*) {feedback} GROUP BY o.model_name"
+        ).fetchall(),
+        "by_language": conn.execute(
+            f"SELECT o.language, AVG(f.rating), COUNT(*) {feedback} GROUP BY o.language"
+        ).fetchall(),
+        "matrix": conn.execute(
+            f"SELECT o.model_name, o.language, AVG(f.rating), COUNT(*) {feedback} "
+            "GROUP BY o.model_name, o.language"
+        ).fetchall(),
+        "daily": conn.execute(
+            f"SELECT date(f.created_at), AVG(f.rating), COUNT(*) {feedback} GROUP BY date(f.created_at)"
+        ).fetchall(),
+    }
+    percentiles = {}
+    for (model,) in conn.execute("SELECT DISTINCT model_name FROM model_outputs").fetchall():
+        where = f"model_name = ? AND created_at >= {since} AND generation_time_ms IS NOT NULL"
+        count = conn.execute(f"SELECT COUNT(*) FROM model_outputs WHERE {where}", (model,)).fetchone()[0]
+        if not count:
+            continue
+        percentiles[model] = [
+            conn.execute(
+                f"SELECT generation_time_ms FROM model_outputs WHERE {where} "
+                "ORDER BY generation_time_ms LIMIT 1 OFFSET ?", (model, int((count - 1) * q / 100))
+            ).fetchone()[0]
+            for q in (50, 90, 99)
+        ]
+    slices["percentiles"] = percentiles
+    conn.close()
+    return slices
+
+
+def append_rows(db_path: Path, count: int):
+    """New outputs with feedback, as traffic would add between refreshes"""
+    conn = sqlite3.connect(db_path)
+    start = conn.execute("SELECT MAX(id) FROM model_outputs").fetchone()[0] + 1
+    conn.executemany(
+        "INSERT INTO model_outputs (id, prompt_id, model_name, generated_code, language, "
+        "generation_time_ms, created_at, success) VALUES (?, 1, 'gpt-4o-mini', '', 'python', ?, "
+        "datetime('now'), 1)",
+        ((i, 500 + i % 1000) for i in range(start, start + count))
+    )
+    conn.executemany(
+        "INSERT INTO feedback (output_id, rating, feedback_type, created_at) "
+        "VALUES (?, 5, 'positive', datetime('now'))",
+        ((i,) for i in range(start, start + count))
+    )
+    conn.commit()
+    conn.close()
+
+
+def check(report, slices):
+    """NumPy slices must match SQL (averages to float precision)"""
+    overall = report["overall"]
+    avg, count, positive, negative = slices["overall"]
+    assert overall["total_feedback"] == count, (overall, slices["overall"])
+    assert (overall["positive_count"], overall["negative_count"]) == (positive, negative)
+    assert abs(overall["avg_rating"] - avg) < 1e-9
+
+    by_model = {row["model"]: (row["count"], row["avg_rating"]) for row in report["by_model"]}
+    for model, avg, count in slices["by_model"]:
+        assert by_model[model][0] == count and abs(by_model[model][1] - avg) < 1e-9, model
+
+    daily = {row["day"]: (row["count"], row["avg_rating"]) for row in report["daily"]}
+    for day, avg, count in slices["daily"]:
+        if day in daily:
+            assert daily[day][0] == count and abs(daily[day][1] - avg) < 1e-9, (day, daily[day], count)
+
+    matrix = report["model_language_matrix"]
+    for model, language, avg, count in slices["matrix"]:
+        i, j = matrix["models"].index(model), matrix["languages"].index(language)
+        assert matrix["count"][i][j] == count, (model, language)
+
+    by_model_pct = {row["model"]: row["generation_time_ms"] for row in report["by_model"]}
+    for model, (p50, p90, p99) in slices["percentiles"].items():
+        ours = by_model_pct[model]
+        # SQL picks the lower neighbour, NumPy interpolates: allow one rank of spread
+        assert abs(ours["p50"] - p50) <= 5 and abs(ours["p99"] - p99) <= 5, (model, ours, p50, p99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQL vs NumPy columnar analytics")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Prompts/outputs to seed")
+    parser.add_argument("--append", type=int, default=10_000, help="Rows added before the incremental refresh")
+    parser.add_argument("--days", type=int, default=DAYS)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp()) / "analytics.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    from backend.database.connection import init_database
+    init_database()
+
+    start = time.perf_counter()
+    seed(db_path, args.rows, pattern_rows=0)
+    print(f"🌱 Seeded {args.rows:,} outputs / {(args.rows + 2) // 3:,} feedback "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    from backend.learning.analytics import FeedbackAnalytics
+    analytics = FeedbackAnalytics(refresh_seconds=0)
+
+    # Both sides use the same window end, so rows crossing the boundary
+    # while the benchmark runs do not show up as mismatches
+    now = int(time.time())
+    print(f"\n📊 Slices over the last {args.days} days")
+    sql_slices(db_path, args.days, now)  # Warm the page cache
+    slices, sql_time = timed("SQL (one query per slice)", sql_slices, db_path, args.days, now)
+    _, load_time = timed("NumPy cold load", analytics.refresh, True)
+    report, compute_time = timed("NumPy compute (warm)", analytics.compute, args.days, 7, now)
+    check(report, slices)
+
+    append_rows(db_path, args.append)
+    loaded, refresh_time = timed(f"NumPy refresh (+{args.append:,} rows)", analytics.refresh, True)
+    assert loaded == {"outputs": args.append, "feedback": args.append, "unmatched_feedback": 0}, loaded
+    now = int(time.time()) + 1
+    slices, sql_after = timed("SQL after append", sql_slices, db_path, args.days, now)
+    report, _ = timed("NumPy compute after append", analytics.compute, args.days, 7, now)
+    check(report, slices)
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\n   Snapshot: {analytics.outputs.size:,} outputs, {analytics.feedback.size:,} feedback; "
+          f"peak RSS {peak_mb:.0f} MB")
+    print(f"   Warm compute is {sql_time / compute_time:.0f}x faster than SQL; "
+          f"refresh + compute {sql_after / (refresh_time + compute_time):.0f}x")
+    print("✅ NumPy slices match SQL")
+
+
+if __name__ == "__main__":
+    main()
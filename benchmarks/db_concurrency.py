@@ -0,0 +1,146 @@
+"""
+Database Concurrency Benchmark
+Mixed workload: one stream of generation-style inserts (Prompt + ModelOutput)
+through the database writer, plus reader threads running the
+/api/statistics and /api/patterns queries. Reports read latency and
+throughput for each DATABASE_MODE.
+
+Run from the project root:
+    python benchmarks/db_concurrency.py
+    python benchmarks/db_concurrency.py --seconds 10 --readers 8 --seed-rows 50000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def run_child(args):
+    """Run the workload in this process (engine settings are fixed at import)"""
+    sys.path.insert(0, str(ROOT))
+    from datetime import datetime
+    from sqlalchemy import func
+    from backend.database.connection import SessionLocal, db_writer, init_database
+    from backend.models.database_models import Prompt, ModelOutput, Feedback, LearningPattern
+
+    init_database()
+
+    def seed(db):
+        prompts = [Prompt(prompt_text=f"seed {i}", detected_language="python") for i in range(args.seed_rows)]
+        db.add_all(prompts)
+        db.flush()
+        outputs = [
+            ModelOutput(prompt_id=p.id, model_name=f"model-{i % 3}", generated_code="x", language="python")
+            for i, p in enumerate(prompts)
+        ]
+        db.add_all(outputs)
+        db.flush()
+        db.add_all([Feedback(output_id=o.id, rating=1 + i % 5) for i, o in enumerate(outputs[::4])])
+
+    db_writer.run(seed)
+
+    stop = threading.Event()
+    read_latencies = []
+    read_errors = [0]
+    writes = [0]
+    write_errors = [0]
+
+    def writer_loop():
+        while not stop.is_set():
+            def insert(db):
+                prompt = Prompt(prompt_text="bench", detected_language="python", created_at=datetime.utcnow())
+                db.add(prompt)
+                db.flush()
+                db.add(ModelOutput(prompt_id=prompt.id, model_name="bench", generated_code="y", language="python"))
+            try:
+                db_writer.run(insert)
+                writes[0] += 1
+            except Exception:
+                write_errors[0] += 1
+
+    def reader_loop():
+        while not stop.is_set():
+            start = time.perf_counter()
+            db = SessionLocal()
+            try:
+                db.query(func.avg(Feedback.rating)).scalar()
+                db.query(
+                    ModelOutput.model_name, func.avg(Feedback.rating), func.count(ModelOutput.id)
+                ).join(Feedback, ModelOutput.id == Feedback.output_id, isouter=True).group_by(
+                    ModelOutput.model_name
+                ).all()
+                db.query(LearningPattern).filter(LearningPattern.language == "python").all()
+                read_latencies.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                read_errors[0] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer_loop) for _ in range(args.writers)]
+    threads += [threading.Thread(target=reader_loop) for _ in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    db_writer.stop()
+
+    read_latencies.sort()
+    print(json.dumps({
+        "reads_per_s": len(read_latencies) / args.seconds,
+        "read_p50_ms": statistics.median(read_latencies) if read_latencies else None,
+        "read_p99_ms": read_latencies[int(len(read_latencies) * 0.99) - 1] if read_latencies else None,
+        "read_errors": read_errors[0],
+        "writes_per_s": writes[0] / args.seconds,
+        "write_errors": write_errors[0],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database concurrency benchmark")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=4, help="Threads submitting to the writer queue")
+    parser.add_argument("--seed-rows", type=int, default=20000)
+    parser.add_argument("--modes", nargs="+", default=["default", "production"])
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    print(f"{'mode':<12} {'reads/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'r-err':>6} {'writes/s':>9} {'w-err':>6}")
+    for mode in args.modes:
+        db_path = Path(tempfile.mkdtemp()) / "bench.db"
+        env = {**os.environ, "DATABASE_MODE": mode, "DATABASE_URL": f"sqlite:///{db_path}"}
+        output = subprocess.run(
+            [sys.executable, __file__, "--child",
+             "--seconds", str(args.seconds), "--readers", str(args.readers),
+             "--writers", str(args.writers), "--seed-rows", str(args.seed_rows)],
+            env=env, capture_output=True, text=True, cwd=ROOT
+        )
+        lines = [line for line in output.stdout.splitlines() if line.startswith("{")]
+        if not lines:
+            # The shared single connection is not safe under concurrent use and can crash outright
+            last_error = [line for line in output.stderr.splitlines() if "Error" in line][-1:]
+            print(f"{mode:<12} crashed (exit {output.returncode}): {last_error[0] if last_error else ''}")
+            continue
+        r = json.loads(lines[-1])
+        fmt = lambda v: f"{v:.1f}" if v is not None else "-"
+        print(f"{mode:<12} {r['reads_per_s']:>9.1f} {fmt(r['read_p50_ms']):>8} {fmt(r['read_p99_ms']):>8} "
+              f"{r['read_errors']:>6} {r['writes_per_s']:>9.1f} {r['write_errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Feedback Trends Benchmark
+Compares analyze_feedback_trends (one grouped query with conditional
+aggregates) against the previous three-query version (overall, per
+language, per model), checks that both return the same figures, and times
+the hourly/daily bucketed variant.
+
+Run from the project root:
+    python benchmarks/feedback_trends.py                # 1M outputs
+    python benchmarks/feedback_trends.py --rows 100000 --days 365
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from query_plans import seed  # noqa: E402
+
+
+def three_queries(db, days: int):
+    """The previous implementation, with its CAST replaced by a valid CASE"""
+    from sqlalchemy import case, func
+    from backend.models.database_models import Feedback, ModelOutput
+
+    cutoff_date = datetime.utcnow() - timedelta(days=days)
+    overall = db.query(
+        func.avg(Feedback.rating),
+        func.count(Feedback.id),
+        func.sum(case((Feedback.rating >= 4, 1), else_=0)),
+        func.sum(case((Feedback.rating <= 2, 1), else_=0))
+    ).filter(Feedback.created_at >= cutoff_date).first()
+    grouped = {}
+    for name, column in (("by_language", ModelOutput.language), ("by_model", ModelOutput.model_name)):
+        grouped[name] = db.query(
+            column, func.avg(Feedback.rating), func.count(Feedback.id)
+        ).join(
+            Feedback, ModelOutput.id == Feedback.output_id
+        ).filter(Feedback.created_at >= cutoff_date).group_by(column).all()
+    return overall, grouped
+
+
+def original_cast(db, days: int) -> str:
+    """Run the old func.cast(..., type_=func.Integer) expression once"""
+    from sqlalchemy import func
+    from backend.models.database_models import Feedback
+
+    try:
+        db.query(func.sum(func.cast(Feedback.rating >= 4, type_=func.Integer))).first()
+        return "ran"
+    except Exception as e:
+        db.rollback()
+        return f"{type(e).__name__}: {e}"
+
+
+def best_of(runs: int, fn, *args):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grouped vs three-query feedback trends")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Prompts/outputs to seed")
+    parser.add_argument("--days", type=int, default=30, help="Trend window")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp()) / "trends.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    from backend.database.connection import init_database, SessionLocal
+    from backend.learning.feedback_engine import FeedbackLearningEngine
+    init_database()
+
+    start = time.perf_counter()
+    seed(db_path, args.rows, pattern_rows=0)
+    print(f"🌱 Seeded {args.rows:,} outputs in {time.perf_counter() - start:.1f}s")
+
+    db = SessionLocal()
+    try:
+        engine = FeedbackLearningEngine(db)
+        print(f"\nOld CAST expression: {original_cast(db, args.days)[:100]}")
+
+        (overall, grouped), old_ms = best_of(args.runs, three_queries, db, args.days)
+        trends, new_ms = best_of(args.runs, engine.analyze_feedback_trends, args.days)
+
+        avg, count, positive, negative = overall
+        assert trends["overall"]["total_feedback"] == count
+        assert (trends["overall"]["positive_count"], trends["overall"]["negative_count"]) == (positive, negative)
+        assert abs(trends["overall"]["avg_rating"] - (avg or 0)) < 1e-9
+        for name, key in (("by_language", "language"), ("by_model", "model")):
+            ours = {row[key]: (row["count"], row["avg_rating"]) for row in trends[name]}
+            for label, group_avg, group_count in grouped[name]:
+                assert ours[label][0] == group_count and abs(ours[label][1] - group_avg) < 1e-9, label
+
+        print(f"\n📊 Trends over {args.days} days ({count:,} feedback rows), best of {args.runs}")
+        print(f"   three queries (previous)       {old_ms:>9.1f} ms")
+        print(f"   one grouped query              {new_ms:>9.1f} ms   ({old_ms / new_ms:.1f}x)")
+        for bucket, label in (("hour", "hourly buckets"), ("day", "daily buckets")):
+            series, bucket_ms = best_of(args.runs, engine.feedback_trend_buckets, args.days, bucket)
+            assert sum(row["count"] for row in series) == count
+            print(f"   {label:<30} {bucket_ms:>9.1f} ms   ({len(series)} points)")
+        print("✅ Grouped trends match the three-query results")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Health Probe Benchmark
+Hammers /health, /health/live and /health/ready the way load balancer probes
+do, against a stub provider whose model listing is slow, and reports probe
+latency plus how many upstream model-list calls the probes caused.
+
+Provider state comes from the in-memory model catalog, so probe latency
+stays flat however slow the provider is, and upstream calls are bounded by
+the catalog TTL instead of the probe rate.
+
+Run from the project root:
+    python benchmarks/health_probe.py
+    python benchmarks/health_probe.py --models-latency-ms 3000 --probes 500 --ttl 2
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from load_generate import _wait_for  # noqa: E402
+
+
+async def probe(client: httpx.AsyncClient, url: str, count: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(count)))
+    latencies.sort()
+    return {
+        "elapsed_s": time.perf_counter() - started,
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1],
+        "statuses": statuses,
+    }
+
+
+async def run(args, api: str, stub: str):
+    async with httpx.AsyncClient(timeout=60) as client:
+        await client.post(f"{stub}/settings", json={"models_latency_ms": args.models_latency_ms})
+        for path in ("/health", "/health/live", "/health/ready"):
+            before = (await client.get(f"{stub}/stats")).json()["models_requests"]
+            result = await probe(client, f"{api}{path}", args.probes, args.concurrency)
+            after = (await client.get(f"{stub}/stats")).json()["models_requests"]
+            print(f"   {path:<14} p50 {result['p50_ms']:7.1f} ms   p99 {result['p99_ms']:7.1f} ms   "
+                  f"upstream model-list calls: {after - before:<3} over {result['elapsed_s']:.1f}s   "
+                  f"status {result['statuses']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Health/readiness probe latency and upstream calls")
+    parser.add_argument("--probes", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--models-latency-ms", type=float, default=2000,
+                        help="How slow the provider's model listing is")
+    parser.add_argument("--ttl", type=float, default=300, help="MODEL_CATALOG_TTL for the API worker")
+    parser.add_argument("--api-port", type=int, default=8031)
+    parser.add_argument("--stub-port", type=int, default=9131)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp()) / "bench.db"
+    stub = subprocess.Popen(
+        [sys.executable, str(ROOT / "benchmarks" / "stub_provider.py"),
+         "--port", str(args.stub_port), "--latency-ms", "50"],
+        cwd=ROOT,
+    )
+    env = {
+        **os.environ,
+        "GROQ_API_KEY": "stub",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{args.stub_port}",
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "MODEL_CATALOG_TTL": str(args.ttl),
+    }
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app",
+         "--port", str(args.api_port), "--workers", "1", "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for(f"http://127.0.0.1:{args.stub_port}/stats")
+        _wait_for(f"http://127.0.0.1:{args.api_port}/health/live")
+        print(f"🩺 {args.probes} probes per endpoint, {args.concurrency} concurrent, "
+              f"model listing takes {args.models_latency_ms:.0f} ms, catalog TTL {args.ttl:.0f}s")
+        asyncio.run(run(args, f"http://127.0.0.1:{args.api_port}", f"http://127.0.0.1:{args.stub_port}"))
+    finally:
+        for process in (api, stub):
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Cold Start Benchmark
+Profiles `import backend.main` with `python -X importtime` in a fresh
+interpreter and reports the total import time, the heaviest top-level
+packages, and any module that should only be loaded on first use (the
+provider SDKs and the HTTP client stack). With --boot it also starts the
+API under uvicorn against a stub provider and times how long it takes to
+answer /health/live (process up) and /health/ready (providers warmed up).
+
+Exits non-zero when the import time is over --budget-ms or a deferred
+module was imported; tests/test_import_time.py runs it as part of the
+test suite.
+
+Run from the project root:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget-ms 1200 --runs 5 --boot
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Loaded by the providers on first use, never while importing the app
+DEFERRED = ("groq", "openai", "ollama", "httpx", "httpcore")
+
+# Median cold import budget: ~880 ms measured after deferring the SDKs, plus headroom for slow runners
+BUDGET_MS = 1500
+
+
+def _env(db_dir: str, **extra) -> dict:
+    return {**os.environ, "DATABASE_URL": f"sqlite:///{Path(db_dir) / 'bench.db'}", **extra}
+
+
+def profile_imports(module: str, db_dir: str):
+    """(total import ms, {top-level package: self ms}, imported module names) for one cold import"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=_env(db_dir), capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    total_us, packages, modules = 0, {}, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        modules.add(name.strip())
+        root = name.strip().split(".")[0]
+        packages[root] = packages.get(root, 0) + int(own) / 1000
+        if not name.startswith("  "):
+            total_us += int(cumulative)  # Nested imports are included in their parent's cumulative time
+    return total_us / 1000, packages, modules
+
+
+def _wait_status(url: str, status: int, timeout: float = 60.0) -> float:
+    """Seconds until url answers with status"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == status:
+                    return time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.02)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def measure_boot(args, db_dir: str):
+    """(seconds to /health/live, seconds to /health/ready) from process start"""
+    stub = subprocess.Popen(
+        [sys.executable, str(ROOT / "benchmarks" / "stub_provider.py"),
+         "--port", str(args.stub_port), "--latency-ms", "50"],
+        cwd=ROOT,
+    )
+    try:
+        _wait_status(f"http://127.0.0.1:{args.stub_port}/stats", 200)
+        env = _env(db_dir, GROQ_API_KEY="stub", GROQ_BASE_URL=f"http://127.0.0.1:{args.stub_port}")
+        api = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app",
+             "--port", str(args.api_port), "--log-level", "warning"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+        )
+        try:
+            live = _wait_status(f"http://127.0.0.1:{args.api_port}/health/live", 200)
+            ready = _wait_status(f"http://127.0.0.1:{args.api_port}/health/ready", 200)
+            return live, live + ready
+        finally:
+            api.terminate()
+            api.wait()
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile and cold start budget for the API")
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--runs", type=int, default=3, help="Cold imports to take the median of")
+    parser.add_argument("--top", type=int, default=10, help="Heaviest top-level packages to list")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS,
+                        help="Fail when the median import time exceeds this (0 = report only)")
+    parser.add_argument("--boot", action="store_true", help="Also time uvicorn start to live/ready")
+    parser.add_argument("--api-port", type=int, default=8032)
+    parser.add_argument("--stub-port", type=int, default=9132)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp()
+    totals, packages, modules = [], {}, set()
+    for _ in range(args.runs):
+        total, packages, modules = profile_imports(args.module, db_dir)
+        totals.append(total)
+    median = statistics.median(totals)
+
+    print(f"\n⏱️  import {args.module}: median {median:.0f} ms over {args.runs} cold runs "
+          f"({', '.join(f'{t:.0f}' for t in totals)} ms), {len(modules)} modules")
+    print("   heaviest top-level packages by own import time (last run):")
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"   {name:<24} {ms:8.1f} ms  {ms / sum(packages.values()) * 100:5.1f}%")
+
+    loaded = sorted(m for m in DEFERRED if m in modules)
+    failed = False
+    if loaded:
+        print(f"\n❌ Loaded at import time but should be deferred to first use: {', '.join(loaded)}")
+        failed = True
+    else:
+        print(f"\n✅ Deferred until first use: {', '.join(DEFERRED)}")
+
+    if args.budget_ms:
+        if median > args.budget_ms:
+            print(f"❌ Import time {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+            failed = True
+        else:
+            print(f"✅ Import time {median:.0f} ms is within the {args.budget_ms:.0f} ms budget")
+
+    if args.boot:
+        live, ready = measure_boot(args, db_dir)
+        print(f"\n🚀 uvicorn start -> /health/live {live * 1000:.0f} ms, -> /health/ready {ready * 1000:.0f} ms")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Language Detection Benchmark
+Compares the previous substring detector with backend/services/language_detector.py
+on a labelled prompt set (including the "go" in "good" / "ts" in "its" traps)
+and measures throughput on short prompts and on multi-kilobyte prompts.
+
+Run from the project root:
+    python benchmarks/language_detection.py
+    python benchmarks/language_detection.py --kilobytes 16 --runs 2000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# (prompt, expected language); "python" is also the expected default
+LABELLED = [
+    ("Write a Python function to reverse a linked list", "python"),
+    ("Create a Django model for blog posts with tags", "python"),
+    ("Read a CSV with pandas and plot the monthly totals", "python"),
+    ("Build a FastAPI endpoint that validates input with pydantic", "python"),
+    ("Fix the bug in utils.py where the cache never expires", "python"),
+    ("What is a good way to sort its items by date?", "python"),
+    ("Write a function that counts words in a string", "python"),
+    ("Implement a thread safe queue with a timeout", "python"),
+    ("Let's go through the list and remove duplicates", "python"),
+    ("Write a JavaScript function to debounce input events", "javascript"),
+    ("Create a React component that fetches users on mount", "javascript"),
+    ("Set up an Express.js server with a health route", "javascript"),
+    ("Node.js script that watches a folder for changes", "javascript"),
+    ("Add a click handler with jQuery that toggles a class", "javascript"),
+    ("Write a Vue component for a paginated table", "javascript"),
+    ("Write a TypeScript interface for an API response", "typescript"),
+    ("Create an Angular service in TypeScript that caches HTTP calls", "typescript"),
+    ("NestJS controller with DTO validation", "typescript"),
+    ("Convert app.js to app.ts with strict types", "typescript"),
+    ("Write a Java class that implements a LRU cache", "java"),
+    ("Spring Boot REST controller for orders", "java"),
+    ("Maven build that runs JUnit tests in parallel", "java"),
+    ("Explain why javascript closures capture variables", "javascript"),
+    ("Implement a C++ template for a fixed-size ring buffer", "cpp"),
+    ("Use std::vector to store points and sort them", "cpp"),
+    ("Write cpp code to multiply two matrices", "cpp"),
+    ("Write a C# method that reads a JSON file", "csharp"),
+    ("ASP.NET Core middleware that logs request timing", "csharp"),
+    ("Query a list of orders with LINQ grouped by customer", "csharp"),
+    ("A .NET background service that polls a queue", "csharp"),
+    ("Write a Rust function that parses command line arguments", "rust"),
+    ("Use tokio to run two tasks concurrently", "rust"),
+    ("Serialize a struct with serde into JSON", "rust"),
+    ("Write a Go HTTP server with graceful shutdown", "go"),
+    ("Golang worker pool using goroutines and channels", "go"),
+    ("Fan out requests with goroutines and collect results", "go"),
+    ("Implement a PHP function to validate an email address", "php"),
+    ("Laravel migration for a users table", "php"),
+    ("Symfony command that imports products", "php"),
+    ("Write a Ruby method that groups words by length", "ruby"),
+    ("Rails model with a has_many association", "ruby"),
+    ("RSpec test for a shopping cart class", "ruby"),
+    ("Port this Python script to Rust", "rust"),
+    ("Good morning! Could you write a Go program that prints the time?", "go"),
+    ("It's a Java app, but its tests are slow", "java"),
+]
+
+
+def legacy_detect(prompt: str) -> str:
+    """The substring scan this module replaced (first language with any hit wins)"""
+    prompt_lower = prompt.lower()
+    language_keywords = {
+        'python': ['python', 'django', 'flask', 'pandas', 'numpy', 'fastapi'],
+        'javascript': ['javascript', 'js', 'node', 'nodejs', 'react', 'vue', 'angular', 'express'],
+        'typescript': ['typescript', 'ts', 'angular', 'nest'],
+        'java': ['java', 'spring', 'maven', 'gradle'],
+        'cpp': ['c++', 'cpp'],
+        'csharp': ['c#', 'csharp', '.net', 'dotnet', 'asp.net'],
+        'rust': ['rust', 'cargo'],
+        'go': ['go', 'golang'],
+        'php': ['php', 'laravel', 'symfony'],
+        'ruby': ['ruby', 'rails'],
+    }
+    for language, keywords in language_keywords.items():
+        if any(keyword in prompt_lower for keyword in keywords):
+            return language
+    return 'python'
+
+
+def throughput(detect, prompts, runs: int) -> float:
+    """Microseconds per prompt"""
+    start = time.perf_counter()
+    for _ in range(runs):
+        for prompt in prompts:
+            detect(prompt)
+    return (time.perf_counter() - start) / (runs * len(prompts)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Language detection accuracy and throughput")
+    parser.add_argument("--kilobytes", type=int, default=4, help="Size of the long prompts")
+    parser.add_argument("--runs", type=int, default=500)
+    args = parser.parse_args()
+
+    from backend.services.language_detector import language_detector
+
+    def detect(prompt):
+        return language_detector.detect(prompt)["language"]
+
+    print(f"🏷️  {len(LABELLED)} labelled prompts")
+    for name, fn in [("substring scan", legacy_detect), ("word-boundary regex", detect)]:
+        misses = [(p, e, fn(p)) for p, e in LABELLED if fn(p) != e]
+        print(f"   {name:<20} accuracy {1 - len(misses) / len(LABELLED):.1%}")
+        for prompt, expected, got in misses:
+            print(f"      ✗ {got:<10} (want {expected:<10}) {prompt}")
+
+    # Long prompts: pasted code/logs with a language mention buried in them
+    rng = random.Random(3)
+    filler = [p for p, _ in LABELLED] + ["the result is stored in a list and returned to the caller"] * 10
+    long_prompts = []
+    for _ in range(20):
+        text = []
+        while sum(len(t) + 1 for t in text) < args.kilobytes * 1024:
+            text.append(rng.choice(filler))
+        long_prompts.append(" ".join(text))
+    short_prompts = [p for p, _ in LABELLED]
+
+    print(f"\n⏱️  µs per prompt ({args.runs} runs)")
+    print(f"   {'':<20} {'short':>10} {f'{args.kilobytes} KB':>10}")
+    for name, fn in [("substring scan", legacy_detect), ("word-boundary regex", detect)]:
+        short = throughput(fn, short_prompts, args.runs)
+        long = throughput(fn, long_prompts, max(1, args.runs // 10))
+        print(f"   {name:<20} {short:>10.1f} {long:>10.1f}")
+
+    sample = language_detector.detect(LABELLED[1][0])
+    print(f"\n🔎 {LABELLED[1][0]!r} -> {sample}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Load Benchmark for /api/generate
+Measures throughput and latency at increasing concurrency levels against a
+single uvicorn worker backed by the stub provider.
+
+With a blocking provider call, throughput stays flat at ~1 / upstream latency.
+With the async path, throughput scales with concurrency until the worker saturates.
+
+Run from the project root:
+    python benchmarks/load_generate.py
+    python benchmarks/load_generate.py --levels 1 8 64 256 --latency-ms 500
+    python benchmarks/load_generate.py --url http://localhost:8000   # existing server
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _wait_for(url: str, timeout: float = 20.0):
+    """Block until url answers or timeout elapses"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def start_servers(api_port: int, stub_port: int, latency_ms: float):
+    """Start the stub provider and one API worker pointed at it"""
+    db_path = Path(tempfile.mkdtemp()) / "bench.db"
+    stub = subprocess.Popen(
+        [sys.executable, str(ROOT / "benchmarks" / "stub_provider.py"),
+         "--port", str(stub_port), "--latency-ms", str(latency_ms)],
+        cwd=ROOT,
+    )
+    env = {
+        **os.environ,
+        "GROQ_API_KEY": "stub",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{stub_port}",
+        "GROQ_MODEL": "stub-model",
+        "DATABASE_URL": f"sqlite:///{db_path}",
+    }
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app",
+         "--port", str(api_port), "--workers", "1", "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    _wait_for(f"http://127.0.0.1:{stub_port}/stats")
+    _wait_for(f"http://127.0.0.1:{api_port}/")
+    return [stub, api]
+
+
+async def run_level(client: httpx.AsyncClient, url: str, concurrency: int, total: int):
+    """Fire `total` requests with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    f"{url}/api/generate",
+                    json={"prompt": f"add two numbers #{i}", "language": "python"},
+                )
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    async def probe_health():
+        """Measure /health latency while generations are in flight"""
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        await client.get(f"{url}/")
+        return (time.perf_counter() - start) * 1000
+
+    started = time.perf_counter()
+    health_task = asyncio.create_task(probe_health())
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    health_ms = await health_task
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": total / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "probe_ms": health_ms,
+    }
+
+
+async def main_async(args):
+    limits = httpx.Limits(max_connections=max(args.levels) * 2)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        print(f"{'conc':>6} {'reqs':>6} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'probe ms':>9}")
+        for level in args.levels:
+            total = max(level * args.rounds, args.min_requests)
+            r = await run_level(client, args.url, level, total)
+            print(f"{r['concurrency']:>6} {r['requests']:>6} {r['errors']:>5} "
+                  f"{r['throughput_rps']:>9.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['probe_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark for /api/generate")
+    parser.add_argument("--url", help="Benchmark an already running API instead of spawning one")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64, 256])
+    parser.add_argument("--rounds", type=int, default=4, help="Requests per level = level * rounds")
+    parser.add_argument("--min-requests", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=200, help="Stub provider latency")
+    parser.add_argument("--api-port", type=int, default=8765)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    args = parser.parse_args()
+
+    processes = []
+    if not args.url:
+        processes = start_servers(args.api_port, args.stub_port, args.latency_ms)
+        args.url = f"http://127.0.0.1:{args.api_port}"
+
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Query Plan Regression Check
+Seeds a synthetic database, runs the hot read paths of
+backend/database/query_plans.py (statistics, patterns, learning engine
+queries), captures every SELECT they issue and checks its EXPLAIN QUERY
+PLAN. Exits non-zero if any query scans a table without an index or a
+path exceeds its time budget. tests/test_query_plans.py runs the same
+paths on a small database as part of the test suite.
+
+Run from the project root:
+    python benchmarks/query_plans.py                  # 1M outputs
+    python benchmarks/query_plans.py --rows 100000 --budget-scale 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.database.query_plans import collect_plans, full_scans, seed  # noqa: E402
+
+# Hot read paths: (name, time budget in ms at 1M rows)
+BUDGETS_MS = {
+    "statistics": 20,
+    "patterns": 250,
+    "successful_patterns": 150,
+    "problematic_patterns": 150,
+    "language_suggestions": 50,
+    "feedback_trends": 50,
+    "feedback_trend_buckets": 50,
+    "learning_batch": 100,
+}
+
+
+async def main_async(args):
+    from backend.database.connection import close_async_engines
+
+    failures = []
+    for name, elapsed_ms, plans in await collect_plans(args.db_path):
+        budget_ms = BUDGETS_MS[name] * args.budget_scale
+        status = "ok" if elapsed_ms <= budget_ms else "SLOW"
+        print(f"\n== {name}: {elapsed_ms:.1f} ms (budget {budget_ms:.0f} ms) {status}")
+        if status != "ok":
+            failures.append(f"{name}: {elapsed_ms:.1f} ms > {budget_ms:.0f} ms")
+
+        for statement, plan in plans:
+            print("   " + " ".join(statement.split())[:110])
+            for *_, detail in plan:
+                print(f"     {detail}")
+            for detail in full_scans(statement, plan):
+                failures.append(f"{name}: full scan ({detail})")
+    await close_async_engines()
+
+    print()
+    if failures:
+        print("❌ Query plan check failed:")
+        for failure in failures:
+            print(f"   - {failure}")
+        return 1
+    print("✅ No full scans, all paths within budget")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN regression check")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Prompts/outputs to seed")
+    parser.add_argument("--pattern-rows", type=int, default=5_000)
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="Multiply all time budgets")
+    args = parser.parse_args()
+
+    args.db_path = Path(tempfile.mkdtemp()) / "plans.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db_path}"
+
+    from backend.database.connection import init_database
+    init_database()
+
+    start = time.perf_counter()
+    seed(args.db_path, args.rows, args.pattern_rows)
+    print(f"🌱 Seeded {args.rows:,} prompts/outputs in {time.perf_counter() - start:.1f}s")
+
+    # Bulk SQL bypasses the ORM hooks: backfill the materialized statistics
+    from backend.database.connection import reconcile_statistics
+    start = time.perf_counter()
+    reconcile_statistics()
+    print(f"🔧 Rebuilt statistics in {time.perf_counter() - start:.1f}s")
+
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
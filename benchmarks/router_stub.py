@@ -0,0 +1,127 @@
+"""
+Provider Router Scenario Run
+Drives ProviderRouter against two local stub providers (Groq-compatible and
+OpenAI-compatible) and prints how traffic is distributed while their latency
+and error rate change.
+
+Run from the project root:
+    python benchmarks/router_stub.py
+"""
+
+import asyncio
+import collections
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+GROQ_PORT = 9201
+OPENAI_PORT = 9202
+
+
+def start_stub(port: int, latency_ms: float) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, str(ROOT / "benchmarks" / "stub_provider.py"),
+         "--port", str(port), "--latency-ms", str(latency_ms)],
+        cwd=ROOT,
+    )
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/stats", timeout=1.0)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Stub on port {port} did not start")
+
+
+def configure(port: int, **settings):
+    httpx.post(f"http://127.0.0.1:{port}/settings", json=settings)
+
+
+async def run_phase(router, title: str, requests: int, concurrency: int = 8):
+    semaphore = asyncio.Semaphore(concurrency)
+    served = collections.Counter()
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await router.generate_code_async(f"task {i}", "python")
+            latencies.append((time.perf_counter() - start) * 1000)
+            served[result["provider"] if result["success"] else "FAILED"] += 1
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    latencies.sort()
+    print(f"\n== {title}")
+    print(f"   served: {dict(served)}")
+    print(f"   p50 {latencies[len(latencies) // 2]:.0f} ms, p99 {latencies[int(len(latencies) * 0.99) - 1]:.0f} ms")
+    for stats in router.get_stats()["providers"]:
+        print(f"   {stats}")
+
+
+async def main_async():
+    os.environ.update({
+        "GROQ_API_KEY": "stub",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{GROQ_PORT}",
+        "GROQ_MODEL": "stub-model",
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{OPENAI_PORT}/v1",
+        "OPENAI_MODEL": "stub-model",
+        "ROUTER_PROVIDERS": "groq,openai",
+        "ROUTER_COOLDOWN_SECONDS": "2",
+    })
+    from backend.services.provider_router import create_provider_router
+
+    router = create_provider_router()
+
+    await run_phase(router, "groq fast (50ms), openai slow (250ms)", 100)
+
+    configure(GROQ_PORT, latency_ms=400)
+    await run_phase(router, "groq degrades to 400ms", 100)
+
+    configure(GROQ_PORT, latency_ms=50)
+    await run_phase(router, "groq back to 50ms -> exploration wins traffic back", 200)
+
+    configure(GROQ_PORT, error_rate=1.0)
+    await run_phase(router, "groq fails every call -> failover, circuit opens", 60)
+
+    configure(GROQ_PORT, error_rate=0.0)
+    await asyncio.sleep(2.1)
+    await run_phase(router, "groq recovers after cooldown -> half-open probe closes circuit", 100)
+
+    configure(GROQ_PORT, latency_ms=50, jitter_ms=0)
+    configure(OPENAI_PORT, latency_ms=50)
+    router.providers.pop("openai")
+    await run_phase(router, "single provider, 50ms", 100)
+
+    # Long tail: 5% of calls take 10x the median
+    configure(GROQ_PORT, latency_ms=50, tail_ratio=0.05, tail_ms=500)
+    await run_phase(router, "long tail, no hedging", 200)
+
+    router.hedging = True
+    router.hedge_percentile = 90
+    # Speech and guard models in the list must never be picked as the hedge target
+    router.providers["groq"].available_models = ["whisper-large-v3", "llama-guard-3-8b", "llama-3.1-8b-instant"]
+    await run_phase(router, "long tail, hedging at p90 to a second model", 200)
+    print(f"   {router.get_stats()['hedging']}")
+
+
+def main():
+    processes = [start_stub(GROQ_PORT, 50), start_stub(OPENAI_PORT, 250)]
+    try:
+        asyncio.run(main_async())
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+SSE Streaming Benchmark
+Streams generations through /api/generate/stream from the stub provider
+and reports time to first token and tokens/sec (client- and server-side),
+then drops the connection mid-stream, reconnects with Last-Event-ID and
+checks that the resumed stream finishes the same generation: the code
+matches an uninterrupted run and the provider saw no second request.
+
+Run from the project root:
+    python benchmarks/sse_stream.py
+    python benchmarks/sse_stream.py --lines 3000 --chunks 3000 --chunk-delay-ms 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from load_generate import _wait_for  # noqa: E402
+
+
+async def read_events(response: httpx.Response, limit: int = 0):
+    """Yield (id, event, data) from an SSE response; stop after `limit` frames if set"""
+    event_id, event, data, frames = None, None, None, 0
+    async for line in response.aiter_lines():
+        if line.startswith("id: "):
+            event_id = line[4:]
+        elif line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: "):
+            data = json.loads(line[6:])
+        elif not line and event:
+            yield event_id, event, data
+            if event != "start":
+                frames += 1
+            if limit and frames >= limit:
+                return
+            event_id, event, data = None, None, None
+
+
+def apply(code: str, event: str, data: dict) -> str:
+    if event == "content":
+        return code + data["content"]
+    if event == "replace":
+        return data["content"]
+    return code
+
+
+async def stream(client, url: str, body: dict, last_event_id: str = None, limit: int = 0, code: str = ""):
+    """Follow one connection from `code`: (code, last event id, final frame, first-frame seconds)"""
+    headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+    last_id, final, first = last_event_id, None, None
+    start = time.perf_counter()
+    async with client.stream("POST", url, json=body, headers=headers) as response:
+        response.raise_for_status()
+        async for event_id, event, data in read_events(response, limit):
+            if event == "start":
+                continue
+            if first is None:
+                first = time.perf_counter() - start
+            code = apply(code, event, data)
+            last_id = event_id or last_id
+            if event in ("complete", "error", "cancelled"):
+                final = data
+    return code, last_id, final, first
+
+
+async def run(args, api: str, stub: str):
+    url = f"{api}/api/generate/stream"
+    async with httpx.AsyncClient(timeout=60) as client:
+        await client.post(f"{stub}/settings", json={
+            "stream_lines": args.lines, "chunk_count": args.chunks,
+            "chunk_delay_ms": args.chunk_delay_ms, "latency_ms": 100
+        })
+
+        full_code, _, final, first = await stream(client, url, {"prompt": "stream a python module", "language": "python"})
+        print(f"\n📡 Full stream: {len(full_code):,} chars")
+        print(f"   client first frame {first * 1000:7.1f} ms")
+        print(f"   server ttft {final['ttft_ms']} ms, {final['tokens']} tokens at "
+              f"{final['tokens_per_second']} tokens/s, output_id {final.get('output_id')}")
+
+        async def upstream_streams():
+            stats = (await client.get(f"{stub}/stats")).json()
+            return stats["streams_completed"] + stats["streams_aborted"]
+
+        streams_before = await upstream_streams()
+        body = {"prompt": "stream a python module, resumed", "language": "python"}
+        partial, last_id, _, _ = await stream(client, url, body, limit=args.drop_after)
+        print(f"\n🔌 Dropped after {args.drop_after} frames ({len(partial):,} chars), last id {last_id}")
+
+        await asyncio.sleep(args.reconnect_delay_ms / 1000)
+        code, _, final, first = await stream(client, url, body, last_event_id=last_id, code=partial)
+        streams_after = await upstream_streams()
+        print(f"   reconnected with Last-Event-ID: first frame {first * 1000:.1f} ms, final {final['type']}, "
+              f"output_id {final.get('output_id')}")
+        print(f"   resumed code matches an uninterrupted run: {code == full_code}")
+        print(f"   upstream streams for the dropped + resumed generation: {streams_after - streams_before}")
+
+        expired = await client.post(url, json=body, headers={"Last-Event-ID": "unknown:3"})
+        print(f"   unknown Last-Event-ID -> HTTP {expired.status_code}")
+        print(f"   sse_replay: {(await client.get(f'{api}/api/metrics')).json()['sse_replay']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE streaming: TTFT, tokens/sec and Last-Event-ID resume")
+    parser.add_argument("--lines", type=int, default=1000, help="Code lines in the streamed answer")
+    parser.add_argument("--chunks", type=int, default=1000, help="Upstream deltas per answer")
+    parser.add_argument("--chunk-delay-ms", type=float, default=1)
+    parser.add_argument("--drop-after", type=int, default=5, help="Frames read before dropping the connection")
+    parser.add_argument("--reconnect-delay-ms", type=float, default=300)
+    parser.add_argument("--api-port", type=int, default=8034)
+    parser.add_argument("--stub-port", type=int, default=9134)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp()) / "bench.db"
+    stub = subprocess.Popen(
+        [sys.executable, str(ROOT / "benchmarks" / "stub_provider.py"), "--port", str(args.stub_port)],
+        cwd=ROOT,
+    )
+    env = {
+        **os.environ,
+        "GROQ_API_KEY": "stub",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{args.stub_port}",
+        "DATABASE_URL": f"sqlite:///{db_path}",
+    }
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app",
+         "--port", str(args.api_port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for(f"http://127.0.0.1:{args.stub_port}/stats")
+        _wait_for(f"http://127.0.0.1:{args.api_port}/health/live")
+        asyncio.run(run(args, f"http://127.0.0.1:{args.api_port}", f"http://127.0.0.1:{args.stub_port}"))
+    finally:
+        for process in (api, stub):
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
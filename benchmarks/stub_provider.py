@@ -0,0 +1,231 @@
+"""
+Stub LLM Provider
+Minimal OpenAI/Groq/Ollama-compatible server with configurable latency.
+Used by the benchmarks to exercise the API without calling a real provider.
+
+Run: python benchmarks/stub_provider.py --port 9100 --latency-ms 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STUB_MODEL = os.getenv("STUB_MODEL", "stub-model")
+STUB_CODE = "def add(a, b):\n    return a + b\n"
+
+# Latency and failure knobs (overridable per process via env)
+settings = {
+    "latency_ms": float(os.getenv("STUB_LATENCY_MS", "200")),
+    "jitter_ms": float(os.getenv("STUB_JITTER_MS", "0")),
+    "error_rate": float(os.getenv("STUB_ERROR_RATE", "0")),
+    "chunk_count": int(os.getenv("STUB_CHUNK_COUNT", "20")),
+    # Share of calls that take tail_ms instead of latency_ms
+    "tail_ratio": float(os.getenv("STUB_TAIL_RATIO", "0")),
+    "tail_ms": float(os.getenv("STUB_TAIL_MS", "0")),
+    # Server-side requests-per-minute quota (0 = unlimited); over quota -> 429
+    "rpm": float(os.getenv("STUB_RPM", "0")),
+    # Latency of the model listing endpoints (/v1/models, /api/tags)
+    "models_latency_ms": float(os.getenv("STUB_MODELS_LATENCY_MS", "0")),
+    # Streaming: extra code lines in the answer and delay between stream chunks
+    "stream_lines": int(os.getenv("STUB_STREAM_LINES", "0")),
+    "chunk_delay_ms": float(os.getenv("STUB_CHUNK_DELAY_MS", "0")),
+}
+
+app = FastAPI(title="Stub LLM Provider")
+stats = {
+    "requests": 0, "in_flight": 0, "max_in_flight": 0, "throttled": 0, "models_requests": 0,
+    "streams_completed": 0, "streams_aborted": 0,
+}
+quota = {"tokens": None, "updated": time.monotonic()}
+
+
+def _take_quota():
+    """Server-side token bucket. Returns (allowed, rate-limit headers)"""
+    rpm = settings["rpm"]
+    if not rpm:
+        return True, {}
+
+    now = time.monotonic()
+    if quota["tokens"] is None:
+        quota["tokens"] = rpm
+    quota["tokens"] = min(rpm, quota["tokens"] + (now - quota["updated"]) * rpm / 60)
+    quota["updated"] = now
+
+    allowed = quota["tokens"] >= 1
+    if allowed:
+        quota["tokens"] -= 1
+    reset = (rpm - quota["tokens"]) * 60 / rpm
+    headers = {
+        "x-ratelimit-limit-requests": str(int(rpm)),
+        "x-ratelimit-remaining-requests": str(int(quota["tokens"])),
+        "x-ratelimit-reset-requests": f"{reset:.2f}s",
+    }
+    if not allowed:
+        stats["throttled"] += 1
+        headers["retry-after"] = f"{60 / rpm:.2f}"
+    return allowed, headers
+
+
+async def _simulate_latency():
+    """Sleep for the configured latency (plus jitter) and maybe fail"""
+    delay = settings["latency_ms"] + random.uniform(0, settings["jitter_ms"])
+    if random.random() < settings["tail_ratio"]:
+        delay = settings["tail_ms"]
+    await asyncio.sleep(delay / 1000)
+    return random.random() < settings["error_rate"]
+
+
+def _completion_payload(model: str) -> dict:
+    return {
+        "id": f"stub-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": f"```python\n{STUB_CODE}```"},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+    }
+
+
+def _chunks():
+    """Split the stub answer into roughly chunk_count pieces"""
+    extra = "".join(f"    # step {i}\n" for i in range(settings["stream_lines"]))
+    text = f"```python\n{STUB_CODE}{extra}```"
+    size = max(1, len(text) // settings["chunk_count"])
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@app.middleware("http")
+async def track_in_flight(request: Request, call_next):
+    stats["requests"] += 1
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        return await call_next(request)
+    finally:
+        stats["in_flight"] -= 1
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+@app.post("/settings")
+async def update_settings(request: Request):
+    settings.update(await request.json())
+    return settings
+
+
+# ---------------------------------------------------------------------------
+# OpenAI / Groq compatible endpoints
+# ---------------------------------------------------------------------------
+
+@app.get("/v1/models")
+@app.get("/openai/v1/models")
+async def list_models():
+    stats["models_requests"] += 1
+    await asyncio.sleep(settings["models_latency_ms"] / 1000)
+    return {"object": "list", "data": [{"id": STUB_MODEL, "object": "model", "owned_by": "stub"}]}
+
+
+@app.post("/v1/chat/completions")
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model") or STUB_MODEL
+
+    allowed, headers = _take_quota()
+    if not allowed:
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+            headers=headers
+        )
+
+    if await _simulate_latency():
+        return JSONResponse(status_code=500, content={"error": {"message": "stub failure"}})
+
+    if not body.get("stream"):
+        return JSONResponse(_completion_payload(model), headers=headers)
+
+    async def event_stream():
+        completed = False
+        try:
+            for piece in _chunks():
+                if settings["chunk_delay_ms"]:
+                    await asyncio.sleep(settings["chunk_delay_ms"] / 1000)
+                chunk = {
+                    "id": "stub",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+            completed = True
+        finally:
+            # Client closed the stream early (e.g. a cancelled generation)
+            stats["streams_completed" if completed else "streams_aborted"] += 1
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=headers)
+
+
+# ---------------------------------------------------------------------------
+# Ollama compatible endpoints
+# ---------------------------------------------------------------------------
+
+@app.get("/api/tags")
+async def ollama_tags():
+    stats["models_requests"] += 1
+    await asyncio.sleep(settings["models_latency_ms"] / 1000)
+    return {"models": [{"name": STUB_MODEL}]}
+
+
+@app.post("/api/chat")
+async def ollama_chat(request: Request):
+    body = await request.json()
+    model = body.get("model") or STUB_MODEL
+
+    if await _simulate_latency():
+        return JSONResponse(status_code=500, content={"error": "stub failure"})
+
+    if not body.get("stream", True):
+        return {
+            "model": model,
+            "message": {"role": "assistant", "content": f"```python\n{STUB_CODE}```"},
+            "done": True,
+        }
+
+    async def ndjson_stream():
+        for piece in _chunks():
+            if settings["chunk_delay_ms"]:
+                await asyncio.sleep(settings["chunk_delay_ms"] / 1000)
+            yield json.dumps({"model": model, "message": {"role": "assistant", "content": piece}, "done": False}) + "\n"
+        yield json.dumps({"model": model, "message": {"role": "assistant", "content": ""}, "done": True}) + "\n"
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Stub LLM provider")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=settings["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=settings["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=settings["error_rate"])
+    args = parser.parse_args()
+
+    settings.update(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,115 @@
+"""
+Write-Behind Persistence Benchmark
+Simulates the persistence part of /api/generate (one Prompt and one
+ModelOutput row per request) under concurrency and compares:
+  - direct:      each row in its own transaction (WRITE_BEHIND_ENABLED=false)
+  - durable:     batched flushes, request waits for its commit
+  - write-behind batched flushes, request returns with its IDs immediately
+
+Run from the project root:
+    python benchmarks/write_behind.py
+    python benchmarks/write_behind.py --requests 5000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODES = {
+    "direct": {"WRITE_BEHIND_ENABLED": "false"},
+    "durable": {"WRITE_BEHIND_DURABLE": "true"},
+    "write-behind": {},
+}
+
+
+async def run_child(args):
+    sys.path.insert(0, str(ROOT))
+    from datetime import datetime
+    from sqlalchemy import func, select
+    from backend.database.connection import AsyncSessionLocal, init_database, close_async_engines
+    from backend.database.write_behind import write_behind
+    from backend.models.database_models import Prompt, ModelOutput
+
+    init_database()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def one_request(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            prompt_id, = await write_behind.allocate(Prompt)
+            await write_behind.add(
+                Prompt(id=prompt_id, prompt_text=f"bench {i}", detected_language="python",
+                       created_at=datetime.utcnow()),
+                durable=False
+            )
+            output_id, = await write_behind.allocate(ModelOutput)
+            await write_behind.add(
+                ModelOutput(id=output_id, prompt_id=prompt_id, model_name="bench",
+                            generated_code="x", language="python", created_at=datetime.utcnow())
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request(i) for i in range(args.requests)))
+    await write_behind.close()
+    elapsed = time.perf_counter() - start
+
+    async with AsyncSessionLocal() as db:
+        rows = await db.scalar(select(func.count()).select_from(ModelOutput))
+    await close_async_engines()
+
+    latencies.sort()
+    print(json.dumps({
+        "requests_per_s": args.requests / elapsed,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1],
+        "rows": rows,
+        "flushes": write_behind.flushes,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write-behind persistence benchmark")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--database-mode", default="production")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(run_child(args))
+        return
+
+    print(f"{'mode':<14} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'rows':>7} {'flushes':>8}")
+    for mode, overrides in MODES.items():
+        db_path = Path(tempfile.mkdtemp()) / "bench.db"
+        env = {
+            **os.environ, **overrides,
+            "DATABASE_MODE": args.database_mode,
+            "DATABASE_URL": f"sqlite:///{db_path}",
+        }
+        output = subprocess.run(
+            [sys.executable, __file__, "--child",
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=env, capture_output=True, text=True, cwd=ROOT
+        )
+        lines = [line for line in output.stdout.splitlines() if line.startswith("{")]
+        if not lines:
+            print(f"{mode:<14} failed:\n{output.stderr[-2000:]}")
+            continue
+        r = json.loads(lines[-1])
+        print(f"{mode:<14} {r['requests_per_s']:>8.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['rows']:>7} {r['flushes']:>8}")
+
+
+if __name__ == "__main__":
+    main()
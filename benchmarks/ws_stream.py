@@ -0,0 +1,136 @@
+"""
+WebSocket Streaming Benchmark
+Streams a long answer through /ws/generate from a stub provider that emits
+thousands of tiny deltas and reports time to first frame, total time,
+upstream events per frame (delta coalescing), and how quickly a cancel
+message ends the stream and aborts the upstream call. A slow reader shows
+frames growing instead of the server buffering without limit.
+
+Run from the project root:
+    python benchmarks/ws_stream.py
+    python benchmarks/ws_stream.py --lines 4000 --chunks 4000 --coalesce-ms 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import websockets
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from load_generate import _wait_for  # noqa: E402
+
+
+async def stream_once(ws_url: str, prompt: str, read_delay: float = 0, cancel_after: int = 0):
+    """Run one generation; returns timings, frame count and the final frame"""
+    async with websockets.connect(ws_url, max_size=None) as ws:
+        start = time.perf_counter()
+        await ws.send(json.dumps({"prompt": prompt, "language": "python"}))
+        first, frames, cancel_sent = None, 0, None
+        while True:
+            frame = json.loads(await ws.recv())
+            frames += 1
+            if first is None:
+                first = time.perf_counter() - start
+            if frame["type"] in ("complete", "error", "cancelled"):
+                return {
+                    "first_ms": first * 1000,
+                    "total_ms": (time.perf_counter() - start) * 1000,
+                    "cancel_ms": (time.perf_counter() - cancel_sent) * 1000 if cancel_sent else None,
+                    "frames": frames,
+                    "final": frame,
+                }
+            if cancel_after and frames == cancel_after and cancel_sent is None:
+                cancel_sent = time.perf_counter()
+                await ws.send(json.dumps({"type": "cancel"}))
+            if read_delay:
+                await asyncio.sleep(read_delay)
+
+
+async def run(args, api: str, stub: str):
+    ws_url = api.replace("http://", "ws://") + "/ws/generate"
+    async with httpx.AsyncClient(timeout=30) as client:
+        async def metrics():
+            return (await client.get(f"{api}/api/metrics")).json()["streams"]
+
+        await client.post(f"{stub}/settings", json={
+            "stream_lines": args.lines, "chunk_count": args.chunks, "chunk_delay_ms": 0, "latency_ms": 50
+        })
+        before = await metrics()
+        result = await stream_once(ws_url, "write a long python module")
+        after = await metrics()
+        events = after["events"] - before["events"]
+        print(f"\n📡 Full stream ({args.chunks} upstream deltas)")
+        print(f"   first frame {result['first_ms']:7.1f} ms   complete {result['total_ms']:7.1f} ms   "
+              f"{result['frames']} frames for {events} events "
+              f"({events / result['frames']:.0f} per frame)")
+        print(f"   the old 10 ms sleep per chunk alone would add {args.chunks * 10 / 1000:.1f} s")
+        print(f"   final frame: {result['final']['type']}, output_id {result['final'].get('output_id')}")
+
+        before = await metrics()
+        result = await stream_once(ws_url, "write a long python module slowly", read_delay=args.slow_read_ms / 1000)
+        after = await metrics()
+        events = after["events"] - before["events"]
+        print(f"\n🐢 Slow reader ({args.slow_read_ms:.0f} ms per frame)")
+        print(f"   {result['frames']} frames for {events} events, "
+              f"producer waited on a full queue {after['backpressure_waits'] - before['backpressure_waits']} times")
+
+        await client.post(f"{stub}/settings", json={"chunk_delay_ms": args.chunk_delay_ms})
+        aborted = (await client.get(f"{stub}/stats")).json()["streams_aborted"]
+        result = await stream_once(ws_url, "write a long python module then cancel", cancel_after=3)
+        await asyncio.sleep(0.5)
+        aborted = (await client.get(f"{stub}/stats")).json()["streams_aborted"] - aborted
+        print(f"\n🛑 Cancel after 3 frames ({args.chunk_delay_ms:.0f} ms between upstream deltas)")
+        print(f"   final frame {result['final']['type']} {result['cancel_ms']:.1f} ms after the cancel, "
+              f"upstream streams aborted: {aborted}, output_id {result['final'].get('output_id')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket streaming: coalescing, backpressure, cancel")
+    parser.add_argument("--lines", type=int, default=2000, help="Code lines in the streamed answer")
+    parser.add_argument("--chunks", type=int, default=2000, help="Upstream deltas per answer")
+    parser.add_argument("--chunk-delay-ms", type=float, default=20, help="Delta spacing for the cancel run")
+    parser.add_argument("--slow-read-ms", type=float, default=50)
+    parser.add_argument("--coalesce-ms", type=float, default=20, help="STREAM_COALESCE_MS for the API")
+    parser.add_argument("--api-port", type=int, default=8033)
+    parser.add_argument("--stub-port", type=int, default=9133)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp()) / "bench.db"
+    stub = subprocess.Popen(
+        [sys.executable, str(ROOT / "benchmarks" / "stub_provider.py"), "--port", str(args.stub_port)],
+        cwd=ROOT,
+    )
+    env = {
+        **os.environ,
+        "GROQ_API_KEY": "stub",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{args.stub_port}",
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "STREAM_COALESCE_MS": str(args.coalesce_ms),
+    }
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app",
+         "--port", str(args.api_port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for(f"http://127.0.0.1:{args.stub_port}/stats")
+        _wait_for(f"http://127.0.0.1:{args.api_port}/health/live")
+        asyncio.run(run(args, f"http://127.0.0.1:{args.api_port}", f"http://127.0.0.1:{args.stub_port}"))
+    finally:
+        for process in (api, stub):
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
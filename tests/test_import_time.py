@@ -0,0 +1,21 @@
+"""
+Cold start regression test: runs benchmarks/import_time.py, which fails
+when `import backend.main` is over its import time budget or loads a
+module that should be deferred to first use (provider SDKs, httpx).
+
+    python -m pytest tests/test_import_time.py
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_cold_import_within_budget():
+    result = subprocess.run(
+        [sys.executable, str(ROOT / "benchmarks" / "import_time.py"), "--runs", "3"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,52 @@
+"""
+Query plan regression test: every SELECT issued by the hot read paths of
+backend/database/query_plans.py must be answered from an index, never by
+a `SCAN <table>`. Runs on a small seeded database (the timing budgets are
+only checked by benchmarks/query_plans.py at full size).
+
+    python -m pytest tests/test_query_plans.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# The database engines are created on import: point them at a scratch file first
+DB_PATH = Path(tempfile.mkdtemp()) / "plans.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from backend.database.query_plans import collect_plans, full_scans, hot_read_paths, seed  # noqa: E402
+
+ROWS = 20_000
+PATTERN_ROWS = 1_000
+
+
+def test_hot_queries_use_indexes():
+    from backend.database.connection import close_async_engines, init_database, reconcile_statistics
+
+    init_database()
+    seed(DB_PATH, ROWS, PATTERN_ROWS)
+    reconcile_statistics()
+
+    async def run():
+        try:
+            return await collect_plans(DB_PATH)
+        finally:
+            await close_async_engines()
+
+    results = asyncio.run(run())
+    assert [name for name, _, _ in results] == list(hot_read_paths())
+
+    scans = [
+        f"{name}: {detail} in {' '.join(statement.split())[:120]}"
+        for name, _, plans in results
+        for statement, plan in plans
+        for detail in full_scans(statement, plan)
+    ]
+    assert all(plans for _, _, plans in results), "a hot path issued no SELECT"
+    assert not scans, "full table scans:\n" + "\n".join(scans)